@@ -0,0 +1,853 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Offline benchmarks for c3po converters. Run all of them with:
+    python -m c3po.benchmarks
+or pick some by name:
+    python -m c3po.benchmarks merge
+"""
+
+import codecs
+import cStringIO
+import csv
+import gc
+import multiprocessing
+import os
+import resource
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import atom.http_core
+import gdata.client
+import polib
+
+from c3po.conf import settings
+from c3po.converters.catalog import catalog_cache, get_catalog
+from c3po.converters.metadata import dump_metadata
+from c3po.converters.mo import mo_path
+from c3po.converters.po_csv import csv_to_po, po_to_csv_merge
+from c3po.converters.ods import ODSWriter
+from c3po.converters.po_ods import csv_to_ods, po_to_ods
+from c3po.converters.unicode import UnicodeReader, UnicodeWriter
+from c3po.mod.backend import LocalHttpServer, LocalSpreadsheetBackend
+from c3po.mod.batch import run_batch
+from c3po.mod.communicator import Communicator
+from c3po.mod.http_pool import PooledHttpClient, connection_pool
+from c3po.profiler import profiler
+
+
+LANGUAGES = ['en', 'pl', 'jp']
+PO_FILENAMES = ['django.po', 'djangojs.po', 'custom.po']
+PO_FILES_PATH = 'LC_MESSAGES'
+MERGE_SIZES = (2000, 4000, 8000, 16000)
+CATALOG_CACHE_SIZE = 30000
+DOWNLOAD_SIZE = 20000
+UPLOAD_SIZES = (5000, 10000, 20000, 40000)
+ODS_STYLES_SIZE = 40000
+UNICODE_CSV_SIZE = 1000000
+PARALLEL_PARSE_SIZE = 40000
+PARALLEL_WRITE_SIZES = (10000, 40000)
+STREAMING_MERGE_SIZES = (20000, 100000)
+COMPACT_ENTRIES_SIZE = 100000
+COMMANDS_SIZES = (1000, 10000, 100000)
+COMPILE_MO_SIZES = (10000, 40000)
+COMMANDS_LATENCY = 0.1
+COMMANDS_BANDWIDTH = 10 * 1024 * 1024
+COMMANDS_URL = 'https://docs.google.com/spreadsheet/ccc?key=benchmark'
+BATCH_PROJECTS = 16
+BATCH_SIZE = 2000
+HTTP_POOL_COMMANDS = 50
+HTTP_POOL_CONTENT_SIZE = 64 * 1024
+COMPRESSION_SIZES = (10000, 100000)
+
+PO_HEADER = r'''msgid ""
+msgstr ""
+"MIME-Version: 1.0\n"
+"Content-Type: text/plain; charset=UTF-8\n"
+"Content-Transfer-Encoding: 8bit\n"
+"Language: %s\n"
+
+'''
+
+PO_ENTRY = r'''#: tpl/base_site.html:%(no)d
+msgid "Message %(no)d"
+msgstr "%(lang)s translation %(no)d"
+
+'''
+
+
+def _make_locale(locale_root, msgids_count):
+    """
+    Generate locale tree with msgids_count messages spread evenly
+    across PO_FILENAMES for every language in LANGUAGES.
+    """
+    for lang in LANGUAGES:
+        lang_path = os.path.join(locale_root, lang, PO_FILES_PATH)
+        os.makedirs(lang_path)
+        for f, po_filename in enumerate(PO_FILENAMES):
+            with open(os.path.join(lang_path, po_filename), 'wb') as po_file:
+                po_file.write(PO_HEADER % lang)
+                for no in xrange(f, msgids_count, len(PO_FILENAMES)):
+                    po_file.write(PO_ENTRY % {'no': no, 'lang': lang})
+
+
+def _repr_metadata(entry):
+    """
+    Metadata format written by older c3po versions.
+    """
+    meta = dict(entry.__dict__)
+    for field in ('msgid', 'msgstr', 'tcomment'):
+        meta.pop(field)
+    return unicode(meta)
+
+
+def _make_gdocs_csv(trans_csv_path, meta_csv_path, msgids_count,
+                    step=2, metadata=_repr_metadata):
+    """
+    Generate spreadsheet csv files containing every step-th message
+    from the tree generated by _make_locale.
+    """
+    trans_writer = UnicodeWriter(trans_csv_path)
+    meta_writer = UnicodeWriter(meta_csv_path)
+    trans_writer.writerow(['file', 'comment', 'msgid'] +
+                          [lang + ':msgstr' for lang in LANGUAGES])
+    meta_writer.writerow(['metadata'])
+    for no in xrange(0, msgids_count, step):
+        po_filename = PO_FILENAMES[no % len(PO_FILENAMES)]
+        trans_writer.writerow([po_filename, u'', u'Message %d' % no] +
+                              [u'%s translation %d' % (lang, no)
+                               for lang in LANGUAGES])
+        entry = polib.POEntry(
+            occurrences=[(u'tpl/base_site.html', unicode(no))])
+        meta_writer.writerow([metadata(entry)])
+    trans_writer.close()
+    meta_writer.close()
+
+
+def bench_merge(sizes=MERGE_SIZES):
+    """
+    Time po_to_csv_merge for growing number of msgids. Time per msgid
+    should stay roughly constant.
+    """
+    print 'po_to_csv_merge'
+    print '%10s %10s %14s' % ('msgids', 'seconds', 'us per msgid')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            locale_root = os.path.join(temp_dir, 'locale')
+            gdocs_trans = os.path.join(temp_dir, 'gdocs_trans.csv')
+            gdocs_meta = os.path.join(temp_dir, 'gdocs_meta.csv')
+            _make_locale(locale_root, msgids_count)
+            _make_gdocs_csv(gdocs_trans, gdocs_meta, msgids_count)
+
+            start = time.time()
+            po_to_csv_merge(LANGUAGES, locale_root, PO_FILES_PATH,
+                            os.path.join(temp_dir, 'local_trans.csv'),
+                            os.path.join(temp_dir, 'local_meta.csv'),
+                            gdocs_trans, gdocs_meta)
+            elapsed = time.time() - start
+        finally:
+            shutil.rmtree(temp_dir)
+        print '%10d %10.3f %14.1f' % (msgids_count, elapsed,
+                                      elapsed * 1e6 / msgids_count)
+
+
+def bench_catalog_cache(msgids_count=CATALOG_CACHE_SIZE):
+    """
+    Compare parsing whole locale tree with polib against loading it
+    from persistent catalog cache.
+    """
+    print 'persistent catalog cache, %d msgids' % msgids_count
+    temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+    cache_path = settings.CATALOG_CACHE_PATH
+    try:
+        locale_root = os.path.join(temp_dir, 'locale')
+        _make_locale(locale_root, msgids_count)
+        po_paths = [os.path.join(locale_root, lang, PO_FILES_PATH, po_filename)
+                    for lang in LANGUAGES for po_filename in PO_FILENAMES]
+        settings.CATALOG_CACHE_PATH = os.path.join(temp_dir, 'catalogs')
+
+        for label in ('cold', 'warm'):
+            catalog_cache.clear()
+            start = time.time()
+            for po_path in po_paths:
+                get_catalog(po_path)
+            print '%10s %10.3f s' % (label, time.time() - start)
+    finally:
+        settings.CATALOG_CACHE_PATH = cache_path
+        catalog_cache.clear()
+        shutil.rmtree(temp_dir)
+
+
+def bench_download(msgids_count=DOWNLOAD_SIZE):
+    """
+    Time csv_to_po for spreadsheet with metadata in old repr format
+    and in current compact format.
+    """
+    print 'csv_to_po, %d msgids' % msgids_count
+    for label, metadata in (('repr', _repr_metadata),
+                            ('compact', dump_metadata)):
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            trans_csv = os.path.join(temp_dir, 'trans.csv')
+            meta_csv = os.path.join(temp_dir, 'meta.csv')
+            _make_gdocs_csv(trans_csv, meta_csv, msgids_count,
+                            step=1, metadata=metadata)
+
+            start = time.time()
+            csv_to_po(trans_csv, meta_csv, os.path.join(temp_dir, 'locale'),
+                      PO_FILES_PATH, header='# bench\n')
+            elapsed = time.time() - start
+            print '%10s %10.3f s %10d bytes of metadata' % (
+                label, elapsed, os.path.getsize(meta_csv))
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def _run_in_process(func, *args):
+    """
+    Run func in separate process, so its peak memory usage can be measured.
+    Returns tuple with wall time in seconds and peak RSS in MB.
+    """
+    def target(queue):
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        queue.put((elapsed,
+                   resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.))
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=(queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def bench_upload(sizes=UPLOAD_SIZES):
+    """
+    Time po_to_ods and measure its peak memory for growing number of
+    msgids. Parsed catalogs are held in memory, but memory used by ods
+    generation itself shouldn't grow with number of rows.
+    """
+    print 'po_to_ods'
+    print '%10s %10s %10s %10s' % ('msgids', 'seconds', 'peak MB', 'ods KB')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            locale_root = os.path.join(temp_dir, 'locale')
+            ods_path = os.path.join(temp_dir, 'local.ods')
+            _make_locale(locale_root, msgids_count)
+            elapsed, peak = _run_in_process(po_to_ods, LANGUAGES, locale_root,
+                                            PO_FILES_PATH, ods_path)
+            print '%10d %10.3f %10.1f %10d' % (
+                msgids_count, elapsed, peak, os.path.getsize(ods_path) / 1024)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def bench_ods_styles(rows_count=ODS_STYLES_SIZE):
+    """
+    Compare ods written with style set on every cell against ods with
+    styles defined once for whole columns.
+    """
+    print 'ods formatting, %d rows' % rows_count
+    print '%10s %10s %14s %10s' % ('styles', 'seconds', 'content KB',
+                                   'ods KB')
+    title = ['file', 'comment', 'msgid'] + [lang + ':msgstr'
+                                            for lang in LANGUAGES]
+    columns = [('1.5in', 'odd' if j % 2 == 0 else 'even')
+               for j in range(len(title))]
+    cell_styles = [style for width, style in columns]
+    for label, styles in (('per cell', cell_styles), ('per column', None)):
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            ods_path = os.path.join(temp_dir, 'local.ods')
+            start = time.time()
+            ods = ODSWriter(ods_path)
+            ods.add_style('odd', bg_color='#FFFFFF')
+            ods.add_style('even', bg_color='#F9F9F9')
+            ods.add_sheet('Translations', columns)
+            ods.writerow(0, title, styles)
+            for no in xrange(rows_count):
+                ods.writerow(0, [u'django.po', u'', u'Message %d' % no] +
+                             [u'%s translation %d' % (lang, no)
+                              for lang in LANGUAGES], styles)
+            ods.close()
+            elapsed = time.time() - start
+            content_size = zipfile.ZipFile(ods_path).getinfo(
+                'content.xml').file_size
+            print '%10s %10.3f %14d %10d' % (label, elapsed,
+                                             content_size / 1024,
+                                             os.path.getsize(ods_path) / 1024)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class _RecodingUnicodeReader(object):
+    """
+    UnicodeReader of older c3po versions: every line is decoded and
+    encoded again by codecs reader before csv parsing.
+    """
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'rb')
+        recoder = (line.encode('utf-8')
+                   for line in codecs.getreader('utf-8')(self.file))
+        self.reader = csv.reader(recoder)
+
+    def next(self):
+        return [unicode(s, 'utf-8') for s in self.reader.next()]
+
+    def __iter__(self):
+        return self
+
+    def close(self):
+        self.file.close()
+
+
+class _QueueUnicodeWriter(object):
+    """
+    UnicodeWriter of older c3po versions: every row goes through a queue
+    which is decoded and encoded again.
+    """
+
+    def __init__(self, file_path):
+        self.queue = cStringIO.StringIO()
+        self.writer = csv.writer(self.queue)
+        self.stream = open(file_path, 'wb')
+        self.encoder = codecs.getincrementalencoder('utf-8')()
+
+    def writerow(self, row):
+        self.writer.writerow([s.encode('utf-8') for s in row])
+        data = self.queue.getvalue().decode('utf-8')
+        self.stream.write(self.encoder.encode(data))
+        self.queue.truncate(0)
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        self.stream.close()
+
+
+def bench_unicode_csv(rows_count=UNICODE_CSV_SIZE):
+    """
+    Compare csv codec classes of older versions against current
+    UnicodeWriter and UnicodeReader on file with rows_count rows.
+    """
+    print 'unicode csv, %d rows' % rows_count
+    print '%10s %10s %12s %12s' % ('classes', 'write', 'writerows', 'read')
+    rows = [[u'django.po', u'', u'Message %d' % no] +
+            [u'%s tłumaczenie %d' % (lang, no) for lang in LANGUAGES]
+            for no in xrange(rows_count)]
+    temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+    try:
+        csv_path = os.path.join(temp_dir, 'trans.csv')
+        contents = []
+        for label, writer_class, reader_class in (
+                ('old', _QueueUnicodeWriter, _RecodingUnicodeReader),
+                ('new', UnicodeWriter, UnicodeReader)):
+            start = time.time()
+            writer = writer_class(csv_path)
+            for row in rows:
+                writer.writerow(row)
+            writer.close()
+            write_time = time.time() - start
+
+            start = time.time()
+            writer = writer_class(csv_path)
+            writer.writerows(rows)
+            writer.close()
+            writerows_time = time.time() - start
+
+            start = time.time()
+            reader = reader_class(csv_path)
+            read_rows = sum(1 for row in reader)
+            reader.close()
+            read_time = time.time() - start
+            assert read_rows == rows_count
+
+            with open(csv_path, 'rb') as csv_file:
+                contents.append(csv_file.read())
+            print '%10s %9.3fs %11.3fs %11.3fs' % (label, write_time,
+                                                   writerows_time, read_time)
+        assert contents[0] == contents[1]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_parallel_parse(msgids_count=PARALLEL_PARSE_SIZE):
+    """
+    Time po_to_ods with po files parsed in main process and in pool of
+    processes, one per CPU. Both have to produce the same content.
+    """
+    jobs = multiprocessing.cpu_count()
+    print 'po_to_ods with parallel parsing, %d msgids, %d CPUs' % (
+        msgids_count, jobs)
+    temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+    try:
+        locale_root = os.path.join(temp_dir, 'locale')
+        _make_locale(locale_root, msgids_count)
+        contents = []
+        for label, jobs in (('serial', 1), ('parallel', max(jobs, 2))):
+            ods_path = os.path.join(temp_dir, '%s.ods' % label)
+            settings.JOBS = jobs
+            catalog_cache.clear()
+            start = time.time()
+            po_to_ods(LANGUAGES, locale_root, PO_FILES_PATH, ods_path)
+            elapsed = time.time() - start
+            contents.append(zipfile.ZipFile(ods_path).read('content.xml'))
+            print '%10s %10d jobs %10.3f s' % (label, jobs, elapsed)
+        assert contents[0] == contents[1]
+    finally:
+        settings.JOBS = 1
+        catalog_cache.clear()
+        shutil.rmtree(temp_dir)
+
+
+def _csv_to_po_with_jobs(jobs, *args):
+    settings.JOBS = jobs
+    csv_to_po(*args)
+
+
+def bench_parallel_write(sizes=PARALLEL_WRITE_SIZES):
+    """
+    Time csv_to_po and measure peak memory of main process with po files
+    written in main process and in pool of processes, one per CPU.
+    """
+    jobs = max(multiprocessing.cpu_count(), 2)
+    print 'csv_to_po with parallel writing'
+    print '%10s %10s %10s %10s' % ('msgids', 'jobs', 'seconds', 'peak MB')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            trans_csv = os.path.join(temp_dir, 'trans.csv')
+            meta_csv = os.path.join(temp_dir, 'meta.csv')
+            _make_gdocs_csv(trans_csv, meta_csv, msgids_count,
+                            step=1, metadata=dump_metadata)
+            for jobs_count in (1, jobs):
+                elapsed, peak = _run_in_process(
+                    _csv_to_po_with_jobs, jobs_count, trans_csv, meta_csv,
+                    os.path.join(temp_dir, 'locale'), PO_FILES_PATH,
+                    '# bench\n')
+                print '%10d %10d %10.3f %10.1f' % (msgids_count, jobs_count,
+                                                   elapsed, peak)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def _csv_to_po_and_mo(trans_csv, meta_csv, locale_root, compile_mo):
+    """
+    Write po files and compile mo files, either in csv_to_po or in
+    second pass parsing written po files like msgfmt does.
+    """
+    written = csv_to_po(trans_csv, meta_csv, locale_root, PO_FILES_PATH,
+                        '# bench\n', compile_mo=compile_mo)
+    if not compile_mo:
+        for po_path in written:
+            polib.pofile(po_path).save_as_mofile(mo_path(po_path))
+
+
+def bench_compile_mo(sizes=COMPILE_MO_SIZES):
+    """
+    Time csv_to_po followed by separate mo compilation pass and csv_to_po
+    compiling mo files from po files built in memory.
+    """
+    print 'csv_to_po with mo files'
+    print '%10s %10s %10s' % ('msgids', 'one pass', 'seconds')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            trans_csv = os.path.join(temp_dir, 'trans.csv')
+            meta_csv = os.path.join(temp_dir, 'meta.csv')
+            _make_gdocs_csv(trans_csv, meta_csv, msgids_count,
+                            step=1, metadata=dump_metadata)
+            for compile_mo in (False, True):
+                start = time.time()
+                _csv_to_po_and_mo(trans_csv, meta_csv,
+                                  os.path.join(temp_dir, 'locale'),
+                                  compile_mo)
+                print '%10d %10s %10.3f' % (msgids_count, compile_mo,
+                                            time.time() - start)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def bench_streaming_merge(sizes=STREAMING_MERGE_SIZES):
+    """
+    Time po_to_csv_merge and measure its peak memory with catalogs parsed
+    by polib and with streaming merge. Half of msgids are new, so msgstrs
+    of most messages have to be looked up.
+    """
+    print 'po_to_csv_merge with streaming'
+    print '%10s %10s %10s %10s' % ('msgids', 'streaming', 'seconds',
+                                   'peak MB')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            locale_root = os.path.join(temp_dir, 'locale')
+            gdocs_trans = os.path.join(temp_dir, 'gdocs_trans.csv')
+            gdocs_meta = os.path.join(temp_dir, 'gdocs_meta.csv')
+            _make_locale(locale_root, msgids_count)
+            _make_gdocs_csv(gdocs_trans, gdocs_meta, msgids_count,
+                            metadata=dump_metadata)
+            for streaming in (False, True):
+                elapsed, peak = _run_in_process(
+                    po_to_csv_merge, LANGUAGES, locale_root, PO_FILES_PATH,
+                    os.path.join(temp_dir, 'local_trans.csv'),
+                    os.path.join(temp_dir, 'local_meta.csv'),
+                    gdocs_trans, gdocs_meta, streaming)
+                print '%10d %10s %10.3f %10.1f' % (msgids_count, streaming,
+                                                   elapsed, peak)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def _load_catalogs(po_paths, compact):
+    """
+    Parse po files into compact catalogs or polib POFile objects and
+    return them with number of objects tracked by garbage collector which
+    were allocated for them.
+    """
+    gc.collect()
+    objects_count = len(gc.get_objects())
+    if compact:
+        catalogs = [get_catalog(po_path) for po_path in po_paths]
+    else:
+        catalogs = [polib.pofile(po_path) for po_path in po_paths]
+    gc.collect()
+    return catalogs, len(gc.get_objects()) - objects_count
+
+
+def bench_compact_entries(msgids_count=COMPACT_ENTRIES_SIZE):
+    """
+    Measure memory held by parsed catalogs of all languages: polib POFile
+    with POEntry objects against catalogs of compact entries kept by
+    catalog cache. Peak RSS includes memory used during parsing.
+    """
+    print 'parsed catalogs, %d msgids in %d languages' % (msgids_count,
+                                                         len(LANGUAGES))
+    print '%10s %10s %10s %16s' % ('compact', 'seconds', 'peak MB',
+                                   'objects/entry')
+    temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+    try:
+        locale_root = os.path.join(temp_dir, 'locale')
+        _make_locale(locale_root, msgids_count)
+        po_paths = [os.path.join(locale_root, lang, PO_FILES_PATH, f)
+                    for lang in LANGUAGES for f in PO_FILENAMES]
+        # peak memory is measured before this process grows, forked
+        # processes would inherit its heap
+        results = [_run_in_process(_load_catalogs, po_paths, compact)
+                   for compact in (False, True)]
+        for compact, (elapsed, peak) in zip((False, True), results):
+            catalogs, objects_count = _load_catalogs(po_paths, compact)
+            entries_count = sum(len(catalog) for catalog in catalogs)
+            del catalogs
+            catalog_cache.clear()
+            print '%10s %10.3f %10.1f %16.2f' % (
+                compact, elapsed, peak, float(objects_count) / entries_count)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_commands(sizes=COMMANDS_SIZES, latency=COMMANDS_LATENCY,
+                   bandwidth=COMMANDS_BANDWIDTH):
+    """
+    Time Communicator commands against local spreadsheet backend with
+    given latency of requests and bandwidth in bytes per second. Network
+    time also includes processing of requests by the backend, like
+    parsing of uploaded ods.
+    """
+    print 'communicator commands, %.0f ms latency, %.1f MB/s' % (
+        latency * 1000, bandwidth / 1024. / 1024.)
+    print '%10s %12s %10s %10s %10s' % ('msgids', 'command', 'seconds',
+                                        'network s', 'requests')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            locale_root = os.path.join(temp_dir, 'locale')
+            _make_locale(locale_root, msgids_count)
+            backend = LocalSpreadsheetBackend(latency=latency,
+                                              bandwidth=bandwidth)
+            com = Communicator(url=COMMANDS_URL, languages=LANGUAGES,
+                               temp_path=os.path.join(temp_dir, 'temp'),
+                               locale_root=locale_root,
+                               po_files_path=PO_FILES_PATH,
+                               header='# bench\n', backend=backend)
+            for command in ('upload', 'synchronize', 'download', 'clear'):
+                catalog_cache.clear()
+                backend.requests = []
+                start = time.time()
+                getattr(com, command)()
+                print '%10d %12s %10.3f %10.3f %10d' % (
+                    msgids_count, command, time.time() - start,
+                    com.network_wall_time(), len(backend.requests))
+        finally:
+            catalog_cache.clear()
+            shutil.rmtree(temp_dir)
+
+
+def bench_unchanged_synchronize(sizes=COMMANDS_SIZES,
+                                latency=COMMANDS_LATENCY,
+                                bandwidth=COMMANDS_BANDWIDTH):
+    """
+    Time synchronize run again when nothing changed, without and with
+    SYNC_STATE_PATH fingerprints.
+    """
+    print 'unchanged synchronize, %.0f ms latency, %.1f MB/s' % (
+        latency * 1000, bandwidth / 1024. / 1024.)
+    print '%10s %10s %10s %10s' % ('msgids', 'state', 'seconds', 'requests')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            locale_root = os.path.join(temp_dir, 'locale')
+            _make_locale(locale_root, msgids_count)
+            backend = LocalSpreadsheetBackend(latency=latency,
+                                              bandwidth=bandwidth)
+            com = Communicator(url=COMMANDS_URL, languages=LANGUAGES,
+                               temp_path=os.path.join(temp_dir, 'temp'),
+                               locale_root=locale_root,
+                               po_files_path=PO_FILES_PATH,
+                               header='# bench\n', backend=backend)
+            com.upload()
+            for state_path in (None, os.path.join(temp_dir, 'state')):
+                settings.SYNC_STATE_PATH = state_path
+                com.synchronize()
+                catalog_cache.clear()
+                backend.requests = []
+                start = time.time()
+                com.synchronize()
+                print '%10d %10s %10.3f %10d' % (
+                    msgids_count, state_path is not None,
+                    time.time() - start, len(backend.requests))
+        finally:
+            settings.SYNC_STATE_PATH = None
+            catalog_cache.clear()
+            shutil.rmtree(temp_dir)
+
+
+def bench_repeated_download(sizes=COMMANDS_SIZES, latency=COMMANDS_LATENCY,
+                            bandwidth=COMMANDS_BANDWIDTH):
+    """
+    Time download of unchanged spreadsheet, without and with
+    EXPORT_CACHE_PATH conditional requests.
+    """
+    print 'repeated download, %.0f ms latency, %.1f MB/s' % (
+        latency * 1000, bandwidth / 1024. / 1024.)
+    print '%10s %10s %10s %10s' % ('msgids', 'cache', 'seconds', 'MB sent')
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        try:
+            locale_root = os.path.join(temp_dir, 'locale')
+            _make_locale(locale_root, msgids_count)
+            backend = LocalSpreadsheetBackend(latency=latency,
+                                              bandwidth=bandwidth)
+            com = Communicator(url=COMMANDS_URL, languages=LANGUAGES,
+                               temp_path=os.path.join(temp_dir, 'temp'),
+                               locale_root=locale_root,
+                               po_files_path=PO_FILES_PATH,
+                               header='# bench\n', backend=backend)
+            com.upload()
+            for cache_path in (None, os.path.join(temp_dir, 'exports')):
+                settings.EXPORT_CACHE_PATH = cache_path
+                com.download()
+                bytes_sent = backend.bytes_sent
+                start = time.time()
+                com.download()
+                print '%10d %10s %10.3f %10.2f' % (
+                    msgids_count, cache_path is not None,
+                    time.time() - start,
+                    (backend.bytes_sent - bytes_sent) / 1024. / 1024.)
+        finally:
+            settings.EXPORT_CACHE_PATH = None
+            catalog_cache.clear()
+            shutil.rmtree(temp_dir)
+
+
+def bench_batch(projects=BATCH_PROJECTS, msgids_count=BATCH_SIZE,
+                latency=COMMANDS_LATENCY, bandwidth=COMMANDS_BANDWIDTH):
+    """
+    Time batch synchronization of many projects, one by one and in pool
+    of worker threads.
+    """
+    print 'batch synchronize, %d projects, %d msgids, %.0f ms latency' % (
+        projects, msgids_count, latency * 1000)
+    print '%10s %10s %10s' % ('workers', 'seconds', 'failed')
+    temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+    try:
+        jobs = []
+        for i in range(projects):
+            locale_root = os.path.join(temp_dir, 'locale%d' % i)
+            _make_locale(locale_root, msgids_count)
+            jobs.append({'url': COMMANDS_URL, 'locale_root': locale_root,
+                         'po_files_path': PO_FILES_PATH,
+                         'languages': LANGUAGES, 'header': '# bench\n'})
+        for workers in (1, 4, 8):
+            backends = [LocalSpreadsheetBackend(latency=latency,
+                                                bandwidth=bandwidth)
+                        for job in jobs]
+            start = time.time()
+            results = run_batch(jobs, workers, backends)
+            print '%10d %10.3f %10d' % (
+                workers, time.time() - start,
+                len([r for r in results if r['status'] != 'ok']))
+    finally:
+        catalog_cache.clear()
+        shutil.rmtree(temp_dir)
+
+
+def _make_certificate(temp_dir):
+    """
+    Generate self-signed certificate for local HTTPS server with openssl,
+    return path to PEM file with certificate and key.
+    """
+    key_path = os.path.join(temp_dir, 'key.pem')
+    cert_path = os.path.join(temp_dir, 'cert.pem')
+    with open(os.devnull, 'wb') as devnull:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+             '-days', '1', '-subj', '/CN=127.0.0.1', '-keyout', key_path,
+             '-out', cert_path], stdout=devnull, stderr=devnull)
+    pem_path = os.path.join(temp_dir, 'server.pem')
+    with open(pem_path, 'wb') as pem_file:
+        for path in (key_path, cert_path):
+            with open(path, 'rb') as part_file:
+                pem_file.write(part_file.read())
+    return pem_path
+
+
+def _http_commands(url, commands, content):
+    """
+    Send requests of commands communicators would make: resource entry,
+    two worksheets exports and upload, every command with new client.
+    """
+    for i in range(commands):
+        client = gdata.client.GDClient(http_client=PooledHttpClient())
+        client.request('GET', url + 'resource').read()
+        client.request('GET', url + 'export?gid=0').read()
+        client.request('GET', url + 'export?gid=1').read()
+        upload = atom.http_core.HttpRequest()
+        upload.add_body_part(content, 'text/csv')
+        client.request('PUT', url + 'resource', http_request=upload).read()
+
+
+def bench_http_pool(commands=HTTP_POOL_COMMANDS,
+                    content_size=HTTP_POOL_CONTENT_SIZE):
+    """
+    Count TLS handshakes and time requests of commands sent to local
+    HTTPS server with new connection for every request and with pooled
+    keep-alive connections.
+    """
+    print 'https requests of %d commands, %d kB responses' % (
+        commands, content_size / 1024)
+    print '%10s %10s %10s %10s' % ('pool size', 'requests', 'handshakes',
+                                   'seconds')
+    temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+    # local server has self-signed certificate
+    default_context = ssl._create_default_https_context
+    ssl._create_default_https_context = ssl._create_unverified_context
+    pool_size = settings.HTTP_POOL_SIZE
+    content = 'x' * content_size
+    server = LocalHttpServer(content,
+                             certfile=_make_certificate(temp_dir))
+    try:
+        for size in (0, pool_size):
+            settings.HTTP_POOL_SIZE = size
+            connection_pool.clear()
+            connections = server.connections
+            start = time.time()
+            _http_commands(server.url, commands, content)
+            print '%10d %10d %10d %10.3f' % (
+                size, commands * 4, server.connections - connections,
+                time.time() - start)
+    finally:
+        server.stop()
+        connection_pool.clear()
+        settings.HTTP_POOL_SIZE = pool_size
+        ssl._create_default_https_context = default_context
+        shutil.rmtree(temp_dir)
+
+
+def bench_compression(sizes=COMPRESSION_SIZES, latency=COMMANDS_LATENCY,
+                      bandwidth=COMMANDS_BANDWIDTH):
+    """
+    Measure bytes on the wire and time of csv export download with and
+    without gzip transfer, and size of ods upload compared to csv files
+    with the same content.
+    """
+    print 'csv export download, %.0f ms latency, %.1f MB/s' % (
+        latency * 1000, bandwidth / 1024. / 1024.)
+    print '%10s %10s %10s %10s %10s %10s' % (
+        'msgids', 'gzip', 'seconds', 'wire KB', 'csv KB', 'ods KB')
+    gzip_transfer = settings.GZIP_TRANSFER
+    for msgids_count in sizes:
+        temp_dir = tempfile.mkdtemp(prefix='c3po-bench-')
+        server = None
+        try:
+            trans_csv = os.path.join(temp_dir, 'trans.csv')
+            meta_csv = os.path.join(temp_dir, 'meta.csv')
+            ods_path = os.path.join(temp_dir, 'upload.ods')
+            _make_gdocs_csv(trans_csv, meta_csv, msgids_count, step=1,
+                            metadata=dump_metadata)
+            csv_to_ods(trans_csv, meta_csv, ods_path)
+            csv_size = os.path.getsize(trans_csv) + os.path.getsize(meta_csv)
+            with open(trans_csv, 'rb') as csv_file:
+                server = LocalHttpServer(csv_file.read(), latency=latency,
+                                         gzip=True, bandwidth=bandwidth)
+            client = gdata.client.GDClient(http_client=PooledHttpClient())
+            for gzip in (False, True):
+                settings.GZIP_TRANSFER = gzip
+                profiler.reset()
+                start = time.time()
+                client.request('GET', server.url + 'export?gid=0').read()
+                print '%10d %10s %10.3f %10d %10d %10d' % (
+                    msgids_count, gzip, time.time() - start,
+                    profiler.report()['counters']['wire_bytes_received']
+                    / 1024, csv_size / 1024,
+                    os.path.getsize(ods_path) / 1024)
+        finally:
+            settings.GZIP_TRANSFER = gzip_transfer
+            if server is not None:
+                server.stop()
+            connection_pool.clear()
+            shutil.rmtree(temp_dir)
+
+
+BENCHMARKS = [
+    ('merge', bench_merge),
+    ('catalog_cache', bench_catalog_cache),
+    ('download', bench_download),
+    ('upload', bench_upload),
+    ('ods_styles', bench_ods_styles),
+    ('unicode_csv', bench_unicode_csv),
+    ('parallel_parse', bench_parallel_parse),
+    ('parallel_write', bench_parallel_write),
+    ('compile_mo', bench_compile_mo),
+    ('streaming_merge', bench_streaming_merge),
+    ('compact_entries', bench_compact_entries),
+    ('commands', bench_commands),
+    ('unchanged_synchronize', bench_unchanged_synchronize),
+    ('repeated_download', bench_repeated_download),
+    ('batch', bench_batch),
+    ('http_pool', bench_http_pool),
+    ('compression', bench_compression),
+]
+
+
+def main():
+    names = sys.argv[1:]
+    for name, benchmark in BENCHMARKS:
+        if not names or name in names:
+            benchmark()
+            print
+
+
+if __name__ == '__main__':
+    main()
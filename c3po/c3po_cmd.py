@@ -1,10 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import sys
+
 from mod import initializer
 from mod import communicator
 from mod.communicator import git_push, git_checkout
 from mod.initializer import ALLOWED_COMMANDS
+from c3po.conf import settings
+from c3po.mod.batch import format_results, load_manifest, run_batch
+from c3po.profiler import profiler
 
 
 def main():
@@ -14,9 +19,19 @@ def main():
         git_push(command[1])
     elif command[0] == 'checkout':
         git_checkout()
+    elif command[0] == 'batch':
+        results = run_batch(load_manifest(settings.BATCH_MANIFEST))
+        print(format_results(results))
+        if settings.PROFILE:
+            profiler.write_report(settings.PROFILE, command=command[0],
+                                  jobs=results)
+        if any(result['status'] != 'ok' for result in results):
+            sys.exit(1)
     elif command[0] in ALLOWED_COMMANDS:
         com = communicator.Communicator()
         getattr(com, command[0])()
+        if settings.PROFILE:
+            profiler.write_report(settings.PROFILE, command=command[0])
 
 
 if __name__ == '__main__':
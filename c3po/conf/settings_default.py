@@ -12,6 +12,19 @@ LANGUAGES = ['en', 'pl', 'jp']
 EMAIL = 'ttestt123321@gmail.com'
 PASSWORD = 'zxcasdqwe.'
 URL = 'https://docs.google.com/spreadsheet/ccc?key=0AnVOHClWGpLZdFdNVVJJLUZkbkh1bGFOWUZqRnYxbGc#gid=0'
+# File where GDocs login tokens are kept between runs, None disables it
+SESSION_TOKEN_PATH = os.path.join(os.path.expanduser('~'), '.c3po', 'token')
+# Number of seconds after which login token is renewed
+SESSION_EXPIRY = 24 * 60 * 60
+# File with fingerprints of last synchronized po files and spreadsheet,
+# synchronize does nothing if both are unchanged. None disables it
+# For example: os.path.join(os.path.expanduser('~'), '.c3po', 'sync_state')
+SYNC_STATE_PATH = None
+
+# Directory keeping csv exports of worksheets with their ETag validators,
+# unchanged worksheets are not downloaded again. None disables it
+# For example: os.path.join(os.path.expanduser('~'), '.c3po', 'exports')
+EXPORT_CACHE_PATH = None
 
 # Header which will be attached on top of every po file
 HEADER = '# translated with c3po\n'
@@ -20,8 +33,42 @@ HEADER = '# translated with c3po\n'
 LOCALE_ROOT = os.path.join(ROOT_DIR, 'conf', 'locale')
 # Path from lang folder to po file
 PO_FILES_PATH = 'LC_MESSAGES'
+# Rewrite only po files whose content changed when writing translations
+INCREMENTAL_WRITE = False
+# Compile mo file next to every written po file, so msgfmt or
+# compilemessages doesn't have to parse po files again
+COMPILE_MO = False
 # Temporary directory where csv file and temp lines.txt will be saved
 TEMP_PATH = os.path.join(ROOT_DIR, 'temp')
+# Directory where parsed po files are cached between runs, None disables it.
+# For example: os.path.join(os.path.expanduser('~'), '.c3po', 'catalogs')
+CATALOG_CACHE_PATH = None
+# Number of parsed po files kept in CATALOG_CACHE_PATH, least recently used
+# ones are removed
+CATALOG_CACHE_SIZE = 1000
+# Number of processes parsing po files, 1 parses them in main process
+JOBS = 1
+# Keep downloaded sheets, merged csv and ods in memory instead of TEMP_PATH
+IN_MEMORY = False
+# Send only changed cells to GDocs instead of uploading whole spreadsheet
+DELTA_UPLOAD = False
+# Merge po files entry by entry with msgids index of hashes, lowers memory
+# used by synchronize on big catalogs
+STREAMING_MERGE = False
+# Path of JSON report with time and counters of command stages, '-' prints
+# it to standard output, None disables profiling report
+PROFILE = None
+# JSON manifest with list of jobs run by batch command, see c3po.mod.batch
+BATCH_MANIFEST = None
+# Number of batch jobs run at once in worker threads
+BATCH_WORKERS = 4
+# Number of worker threads running commands of AsyncCommunicator objects
+ASYNC_WORKERS = 8
+# Number of idle keep-alive connections to GDocs kept for next requests of
+# all communicators, 0 opens new connection for every request
+HTTP_POOL_SIZE = 4
+# Ask GDocs for gzip compressed responses, e.g. exported csv files
+GZIP_TRANSFER = True
 
 # Git information
 GIT_REPOSITORY = 'git@git.hiddendata.co:mnogacki/testpo.git'
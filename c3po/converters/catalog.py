@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+
+import polib
+
+from c3po.conf import settings
+from c3po.converters.parallel import parallel_map
+from c3po.converters.po_reader import POReader
+from c3po.profiler import profiler
+
+
+# Bump when layout of persistent catalogs changes
+CATALOG_FORMAT_VERSION = 1
+
+ENTRY_FIELDS = ('msgid', 'msgstr', 'msgid_plural', 'msgstr_plural',
+                'msgctxt', 'obsolete', 'encoding', 'comment', 'tcomment',
+                'occurrences', 'flags', 'previous_msgctxt', 'previous_msgid',
+                'previous_msgid_plural')
+
+
+class Entry(object):
+    """
+    Compact read-only po entry kept in catalogs instead of polib.POEntry.
+    Fields are stored in slots, occurrences and flags as tuples and empty
+    msgstr_plural as None, so entries without them don't allocate empty
+    containers. Use to_po_entry() to get editable polib entry.
+    """
+
+    __slots__ = ENTRY_FIELDS
+
+    def __init__(self, msgid, msgstr, msgid_plural, msgstr_plural, msgctxt,
+                 obsolete, encoding, comment, tcomment, occurrences, flags,
+                 previous_msgctxt, previous_msgid, previous_msgid_plural):
+        self.msgid = msgid
+        self.msgstr = msgstr
+        self.msgid_plural = msgid_plural
+        self.msgstr_plural = msgstr_plural or None
+        self.msgctxt = msgctxt
+        self.obsolete = obsolete
+        self.encoding = encoding
+        self.comment = comment
+        self.tcomment = tcomment
+        self.occurrences = tuple(occurrences)
+        self.flags = tuple(flags)
+        self.previous_msgctxt = previous_msgctxt
+        self.previous_msgid = previous_msgid
+        self.previous_msgid_plural = previous_msgid_plural
+
+    @classmethod
+    def from_po_entry(cls, entry):
+        return cls(*[getattr(entry, field) for field in ENTRY_FIELDS])
+
+    def to_po_entry(self):
+        entry = polib.POEntry()
+        for field in ENTRY_FIELDS:
+            setattr(entry, field, getattr(self, field))
+        entry.occurrences = list(self.occurrences)
+        entry.flags = list(self.flags)
+        entry.msgstr_plural = dict(self.msgstr_plural or {})
+        return entry
+
+
+class Catalog(list):
+    """
+    Parsed po file: list of Entry objects with attributes of po file.
+    """
+
+    __slots__ = ('fpath', 'encoding', 'header', 'metadata',
+                 'metadata_is_fuzzy')
+
+    def __init__(self, fpath, encoding, header, metadata, metadata_is_fuzzy,
+                 entries=()):
+        list.__init__(self, entries)
+        self.fpath = fpath
+        self.encoding = encoding
+        self.header = header
+        self.metadata = metadata
+        self.metadata_is_fuzzy = metadata_is_fuzzy
+
+    @classmethod
+    def read(cls, po_file_path):
+        """
+        Parse po file entry by entry, so polib entries of the whole file
+        are never kept in memory together.
+        """
+        reader = POReader(po_file_path)
+        entries = [Entry.from_po_entry(entry) for entry in reader]
+        return cls(po_file_path, reader.encoding, reader.header,
+                   reader.metadata, reader.metadata_is_fuzzy, entries)
+
+    def to_po_file(self):
+        po_file = polib.POFile(pofile=self.fpath, encoding=self.encoding)
+        po_file.header = self.header
+        po_file.metadata = dict(self.metadata)
+        po_file.metadata_is_fuzzy = self.metadata_is_fuzzy
+        po_file.extend(entry.to_po_entry() for entry in self)
+        return po_file
+
+    def __unicode__(self):
+        return unicode(self.to_po_file())
+
+
+def _dump_catalog(po_file):
+    """
+    Convert parsed po file into structure of builtin types which can be
+    stored with marshal.
+    """
+    entries = [tuple(getattr(entry, field) for field in ENTRY_FIELDS)
+               for entry in po_file]
+    return (CATALOG_FORMAT_VERSION, po_file.encoding, po_file.header,
+            po_file.metadata, po_file.metadata_is_fuzzy, entries)
+
+
+def _load_catalog(data, po_file_path):
+    """
+    Rebuild catalog from structure returned by _dump_catalog.
+    Returns None if data was stored in different format version.
+    """
+    if data[0] != CATALOG_FORMAT_VERSION:
+        return None
+    version, encoding, header, metadata, metadata_is_fuzzy, entries = data
+    return Catalog(po_file_path, encoding, header, metadata,
+                   metadata_is_fuzzy, [Entry(*values) for values in entries])
+
+
+class PersistentCatalogCache(object):
+    """
+    Cache of parsed po files stored on disk between runs. Catalogs are kept
+    in marshal format in files named after sha1 of po file content, so
+    changed files are never served from cache. Cache files are touched
+    when used and at most CATALOG_CACHE_SIZE least recently used ones are
+    kept.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+
+    def _get_cached_path(self, po_file_path):
+        with open(po_file_path, 'rb') as po_file:
+            digest = hashlib.sha1(po_file.read()).hexdigest()
+        return os.path.join(self.cache_path, digest + '.cat')
+
+    def get(self, po_file_path):
+        """
+        Return catalog of po file, read from disk cache if possible.
+        """
+        cached_path = self._get_cached_path(po_file_path)
+        try:
+            with open(cached_path, 'rb') as cached_file:
+                po_file = _load_catalog(marshal.load(cached_file),
+                                        po_file_path)
+            if po_file is not None:
+                os.utime(cached_path, None)
+                return po_file
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            pass
+
+        po_file = Catalog.read(po_file_path)
+        self._store(cached_path, po_file)
+        return po_file
+
+    def _store(self, cached_path, po_file):
+        """
+        Write parsed po file into cache. Temporary file is renamed to its
+        final name, so concurrent runs never read partially written data.
+        """
+        try:
+            if not os.path.exists(self.cache_path):
+                os.makedirs(self.cache_path)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_path)
+            try:
+                with os.fdopen(fd, 'wb') as temp_file:
+                    marshal.dump(_dump_catalog(po_file), temp_file)
+                if os.name == 'nt' and os.path.exists(cached_path):
+                    os.remove(cached_path)
+                os.rename(temp_path, cached_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self._prune()
+        except (IOError, OSError, ValueError):
+            # cache is only an optimization
+            pass
+
+    def _prune(self):
+        """
+        Remove least recently used catalogs above CATALOG_CACHE_SIZE.
+        """
+        cached = []
+        for name in os.listdir(self.cache_path):
+            if not name.endswith('.cat'):
+                continue
+            path = os.path.join(self.cache_path, name)
+            try:
+                cached.append((os.path.getmtime(path), path))
+            except OSError:
+                # removed by concurrent run
+                continue
+        cached.sort(reverse=True)
+        for mtime, path in cached[settings.CATALOG_CACHE_SIZE:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _parse_catalog(po_file_path):
+    """
+    Parse po file into catalog, using persistent cache if
+    CATALOG_CACHE_PATH is set.
+    """
+    if settings.CATALOG_CACHE_PATH:
+        return PersistentCatalogCache(
+            settings.CATALOG_CACHE_PATH).get(po_file_path)
+    return Catalog.read(po_file_path)
+
+
+def _parse_catalog_data(po_file_path):
+    """
+    Parse po file in worker process and return it marshalled, which is
+    much cheaper to send back to parent process than pickled entries.
+    """
+    return marshal.dumps(_dump_catalog(_parse_catalog(po_file_path)))
+
+
+class CatalogCache(object):
+    """
+    In-process cache of parsed po files shared by all converters, so every
+    file is parsed at most once per communicator operation. Catalogs are
+    keyed by path and reparsed when file modification time or size change.
+    If CATALOG_CACHE_PATH setting is set, parsed files are also kept there
+    between runs. Returned catalogs are shared, so don't modify them.
+    Cache is used by communicators running in many threads.
+    """
+
+    def __init__(self):
+        self.catalogs = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def _signature(cls, path):
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+
+    def _is_cached(self, path, signature):
+        with self.lock:
+            cached = self.catalogs.get(path)
+        return cached is not None and cached[0] == signature
+
+    def _store(self, path, signature, po_file):
+        with self.lock:
+            self.catalogs[path] = (signature, po_file)
+
+    def get(self, po_file_path):
+        """
+        Return catalog of po file from cache or parse it if needed.
+        """
+        path = os.path.abspath(po_file_path)
+        signature = self._signature(path)
+        with self.lock:
+            cached = self.catalogs.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with profiler.stage('parse'):
+            po_file = _parse_catalog(path)
+        profiler.count('po_files_parsed')
+        self._store(path, signature, po_file)
+        return po_file
+
+    def prefetch(self, po_file_paths, jobs=None):
+        """
+        Parse po files which aren't cached yet in pool of jobs worker
+        processes and put them into cache, so following get() calls don't
+        parse them again. Does nothing when jobs is 1.
+        :param jobs: number of processes, defaults to JOBS setting
+        """
+        if jobs is None:
+            jobs = settings.JOBS
+        if jobs <= 1:
+            return
+        signatures = {}
+        for po_file_path in po_file_paths:
+            path = os.path.abspath(po_file_path)
+            if path in signatures or not os.path.exists(path):
+                continue
+            signature = self._signature(path)
+            if not self._is_cached(path, signature):
+                signatures[path] = signature
+        if len(signatures) < 2:
+            return
+
+        paths = sorted(signatures)
+        with profiler.stage('parse'):
+            results = parallel_map(_parse_catalog_data, paths, jobs)
+            for path, data in zip(paths, results):
+                self._store(path, signatures[path],
+                            _load_catalog(marshal.loads(data), path))
+        profiler.count('po_files_parsed', len(paths))
+
+    def invalidate(self, po_file_path):
+        """
+        Remove po file from cache, used after it was rewritten.
+        """
+        with self.lock:
+            self.catalogs.pop(os.path.abspath(po_file_path), None)
+
+    def invalidate_tree(self, root):
+        """
+        Remove catalogs of all po files under root directory, used when
+        operation on locale tree is finished.
+        """
+        prefix = os.path.join(os.path.abspath(root), '')
+        with self.lock:
+            for path in [path for path in self.catalogs
+                         if path.startswith(prefix)]:
+                del self.catalogs[path]
+
+    def clear(self):
+        """
+        Remove all catalogs from cache.
+        """
+        with self.lock:
+            self.catalogs = {}
+
+
+catalog_cache = CatalogCache()
+
+
+def get_catalog(po_file_path):
+    """
+    Return catalog of po file using shared catalog cache.
+    """
+    return catalog_cache.get(po_file_path)
+
+
+def prefetch_catalogs(po_file_paths, jobs=None):
+    """
+    Parse po files in parallel into shared catalog cache.
+    """
+    catalog_cache.prefetch(po_file_paths, jobs)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from itertools import izip_longest
+
+
+def sheet_delta(old_rows, new_rows):
+    """
+    Compare rows of spreadsheet worksheet with its new content. Missing
+    cells are treated as empty, so cells which aren't present in new rows
+    are cleared.
+    :param old_rows: rows currently stored in worksheet
+    :param new_rows: rows which should be stored in worksheet
+    :return: tuple with list of changed cells as (row, col, value) tuples
+             numbered from 1 and size of new content as (rows, cols) tuple
+    """
+    changes = []
+    rows_count = 0
+    cols_count = 0
+    for i, (old_row, new_row) in enumerate(izip_longest(old_rows, new_rows)):
+        if new_row is None:
+            new_row = []
+        else:
+            rows_count = i + 1
+            cols_count = max(cols_count, len(new_row))
+        for j, (old_value, new_value) in enumerate(
+                izip_longest(old_row or [], new_row, fillvalue=u'')):
+            if old_value != new_value:
+                changes.append((i + 1, j + 1, new_value))
+    return changes, (rows_count, cols_count)
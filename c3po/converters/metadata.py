@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import ast
+import json
+
+import polib
+
+
+# Metadata written by current version start with this prefix, older
+# spreadsheets contain repr of entry's __dict__
+METADATA_VERSION = 2
+METADATA_PREFIX = 'v%d:' % METADATA_VERSION
+
+# Fields stored in metadata with values which are left out when encoding
+METADATA_DEFAULTS = dict(polib.POEntry().__dict__)
+for _field in ('msgid', 'msgstr', 'tcomment'):
+    METADATA_DEFAULTS.pop(_field)
+
+METADATA_EMPTY = METADATA_PREFIX + '{}'
+
+# Fields whose default is an empty container
+EMPTY_FIELDS = frozenset(field for field, default
+                         in METADATA_DEFAULTS.iteritems()
+                         if default in ([], {}))
+
+
+def dump_metadata(entry):
+    """
+    Encode entry's metadata (all fields except msgid, msgstr and tcomment)
+    into compact string. Fields with default values are omitted, empty
+    tuples and None of compact catalog entries are the same as default
+    empty lists and dicts.
+    """
+    meta = {}
+    for field, default in METADATA_DEFAULTS.iteritems():
+        value = getattr(entry, field)
+        if value == default or (field in EMPTY_FIELDS and not value):
+            continue
+        meta[field] = value
+    return METADATA_PREFIX + json.dumps(meta, ensure_ascii=False,
+                                        separators=(',', ':'), sort_keys=True)
+
+
+def load_metadata(metadata):
+    """
+    Decode metadata string into dict which can be passed to POEntry.
+    Both current and old repr format are accepted.
+    """
+    metadata = metadata.strip() if metadata else ''
+    if not metadata:
+        return {}
+    if not metadata.startswith(METADATA_PREFIX):
+        return ast.literal_eval(metadata)
+
+    meta = json.loads(metadata[len(METADATA_PREFIX):])
+    if 'occurrences' in meta:
+        meta['occurrences'] = [tuple(o) for o in meta['occurrences']]
+    if 'msgstr_plural' in meta:
+        # json turns integer plural indexes into strings
+        meta['msgstr_plural'] = dict((int(index), msgstr) for index, msgstr
+                                     in meta['msgstr_plural'].iteritems())
+    return meta
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import array
+
+
+# Magic number written in byte order of the file
+MO_MAGIC = 0x950412de
+# Magic number, revision, number of strings, offsets of original and
+# translated strings tables, size and offset of hashing table
+MO_HEADER_SIZE = 7 * 4
+
+
+def _mo_messages(po_file):
+    """
+    Get list of encoded (msgid, msgstr) pairs which msgfmt compiles from
+    po file: metadata entry and translated entries, without fuzzy and
+    obsolete ones.
+    """
+    encoding = po_file.encoding
+
+    def encode(value):
+        return value.encode(encoding) if isinstance(value, unicode) \
+            else value
+
+    messages = [('', encode(po_file.metadata_as_entry().msgstr))]
+    for entry in po_file:
+        if not entry.translated():
+            continue
+        msgid = entry.msgid
+        if entry.msgid_plural:
+            msgid += '\0' + entry.msgid_plural
+            msgstr = '\0'.join(entry.msgstr_plural[index] for index
+                               in sorted(entry.msgstr_plural.keys()))
+        else:
+            msgstr = entry.msgstr
+        if entry.msgctxt:
+            msgid = entry.msgctxt + '\4' + msgid
+        messages.append((encode(msgid), encode(msgstr)))
+    return messages
+
+
+def mo_content(po_file):
+    """
+    Compile po file object into content of mo file, the same as written by
+    msgfmt without hashing table. Originals are sorted by bytes, as
+    gettext looks them up by binary search.
+    :param po_file: polib.POFile or compatible object with entries
+    """
+    messages = sorted(_mo_messages(po_file))
+    keys_start = MO_HEADER_SIZE + len(messages) * 16
+    values_start = keys_start + sum(len(msgid) + 1 for msgid, _ in messages)
+
+    offsets = array.array('I')
+    keys_offsets = array.array('I')
+    position = values_start
+    for msgid, msgstr in messages:
+        offsets.extend((len(msgstr), position))
+        position += len(msgstr) + 1
+    position = keys_start
+    for msgid, msgstr in messages:
+        keys_offsets.extend((len(msgid), position))
+        position += len(msgid) + 1
+
+    header = array.array('I', (
+        MO_MAGIC, 0, len(messages), MO_HEADER_SIZE,
+        MO_HEADER_SIZE + len(messages) * 8, 0, keys_start))
+    return ''.join([
+        header.tostring(),
+        keys_offsets.tostring(),
+        offsets.tostring(),
+        ''.join(msgid + '\0' for msgid, _ in messages),
+        ''.join(msgstr + '\0' for _, msgstr in messages),
+    ])
+
+
+def mo_path(po_path):
+    """
+    Get path of mo file compiled from po file.
+    """
+    return (po_path[:-3] if po_path.endswith('.po') else po_path) + '.mo'
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from xml.etree import cElementTree
+from xml.sax.saxutils import escape
+
+
+ODS_MIMETYPE = 'application/vnd.oasis.opendocument.spreadsheet'
+
+NAMESPACES = {
+    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
+    'style': 'urn:oasis:names:tc:opendocument:xmlns:style:1.0',
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+    'fo': 'urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0',
+}
+
+XML_ENTITIES = {'"': '&quot;', "'": '&apos;'}
+
+MANIFEST_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest \
+xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" \
+manifest:version="1.2">\
+<manifest:file-entry manifest:media-type="%s" manifest:version="1.2" \
+manifest:full-path="/"/>\
+<manifest:file-entry manifest:media-type="text/xml" \
+manifest:full-path="content.xml"/>\
+<manifest:file-entry manifest:media-type="text/xml" \
+manifest:full-path="styles.xml"/>\
+</manifest:manifest>''' % ODS_MIMETYPE
+
+DOCUMENT_ATTRS = ' '.join('xmlns:%s="%s"' % ns
+                          for ns in sorted(NAMESPACES.items()))
+
+STYLES_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<office:document-styles %s office:version="1.2"/>''' % DOCUMENT_ATTRS
+
+
+def _xml_escape(value):
+    return escape(value, XML_ENTITIES)
+
+
+def _zip_info(name, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, time.localtime(time.time())[:6])
+    info.compress_type = compress_type
+    info.external_attr = 0644 << 16
+    return info
+
+
+class ODSWriter(object):
+    """
+    Writes ods spreadsheet row by row. Rows of every sheet are kept in
+    temporary files until close(), so memory usage doesn't depend on number
+    of rows. Formatting is defined once with named styles (add_style())
+    assigned to whole columns, so regular cells carry no formatting at all.
+    """
+
+    def __init__(self, file_path):
+        """
+        :param file_path: path or file object where ods will be written
+        """
+        self.file_path = file_path
+        self.styles = []
+        self.sheets = []
+
+    def add_style(self, name, bg_color=None, font_color=None, bold=False):
+        """
+        Define named cell style which can be used for columns and cells.
+        """
+        self.styles.append((name, bg_color, font_color, bold))
+
+    def add_sheet(self, name, columns):
+        """
+        Add new sheet.
+        :param columns: list of (width, style name) tuples, cells in column
+                        use its style unless other style is given in writerow
+        :return: sheet number used when writing rows
+        """
+        self.sheets.append((name, columns, tempfile.TemporaryFile()))
+        return len(self.sheets) - 1
+
+    def writerow(self, sheet_no, row, styles=None):
+        """
+        Append row of string values to sheet. Empty cells are collapsed.
+        :param styles: list of style names for cells in a row, if not given
+                       cells use style of their columns
+        """
+        cells = []
+        empty = 0
+        for i, value in enumerate(row):
+            if not value and styles is None:
+                empty += 1
+                continue
+            if empty:
+                cells.append(_empty_cells(empty))
+                empty = 0
+            style = ''
+            if styles is not None:
+                style = u' table:style-name="%s"' % \
+                    styles[min(i, len(styles) - 1)]
+            if value:
+                cells.append(
+                    u'<table:table-cell%s office:value-type="string">'
+                    u'<text:p>%s</text:p></table:table-cell>'
+                    % (style, _xml_escape(value)))
+            else:
+                cells.append(u'<table:table-cell%s/>' % style)
+        if not cells:
+            cells.append(_empty_cells(1))
+        self.sheets[sheet_no][2].write(
+            (u'<table:table-row>%s</table:table-row>'
+             % u''.join(cells)).encode('utf-8'))
+
+    def writerows(self, sheet_no, rows, styles=None):
+        for row in rows:
+            self.writerow(sheet_no, row, styles)
+
+    def _write_automatic_styles(self, stream):
+        stream.write(
+            '<office:automatic-styles>'
+            '<style:style style:name="ta1" style:family="table">'
+            '<style:table-properties table:display="true" '
+            'style:writing-mode="lr-tb"/></style:style>')
+        widths = sorted(set(width for name, columns, rows in self.sheets
+                            for width, style in columns))
+        for width in widths:
+            stream.write(
+                '<style:style style:name="%s" style:family="table-column">'
+                '<style:table-column-properties style:column-width="%s"/>'
+                '</style:style>' % (self._column_style(width), width))
+        for name, bg_color, font_color, bold in self.styles:
+            stream.write('<style:style style:name="%s" '
+                         'style:family="table-cell">' % name)
+            if bg_color:
+                stream.write('<style:table-cell-properties '
+                             'fo:background-color="%s"/>' % bg_color)
+            if font_color or bold:
+                stream.write('<style:text-properties')
+                if font_color:
+                    stream.write(' fo:color="%s"' % font_color)
+                if bold:
+                    stream.write(' fo:font-weight="bold"'
+                                 ' style:font-weight-asian="bold"'
+                                 ' style:font-weight-complex="bold"')
+                stream.write('/>')
+            stream.write('</style:style>')
+        stream.write('</office:automatic-styles>')
+
+    def _column_style(self, width):
+        return 'co' + width.replace('.', '_')
+
+    def _write_content(self, stream):
+        stream.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                     '<office:document-content %s office:version="1.2">'
+                     % DOCUMENT_ATTRS)
+        self._write_automatic_styles(stream)
+        stream.write('<office:body><office:spreadsheet>')
+        for name, columns, rows in self.sheets:
+            stream.write('<table:table table:name="%s" table:style-name="ta1">'
+                         % _xml_escape(name).encode('utf-8'))
+            for width, style in columns:
+                stream.write('<table:table-column table:style-name="%s" '
+                             'table:default-cell-style-name="%s"/>'
+                             % (self._column_style(width), style))
+            rows.seek(0)
+            shutil.copyfileobj(rows, stream)
+            rows.close()
+            stream.write('</table:table>')
+        stream.write('</office:spreadsheet></office:body>'
+                     '</office:document-content>')
+
+    def close(self):
+        """
+        Assemble all sheets and write ods file.
+        """
+        fd, content_path = tempfile.mkstemp(suffix='.xml')
+        try:
+            with os.fdopen(fd, 'wb') as content:
+                self._write_content(content)
+
+            ods = zipfile.ZipFile(self.file_path, 'w', zipfile.ZIP_DEFLATED)
+            # mimetype has to be first and uncompressed
+            ods.writestr(_zip_info('mimetype', zipfile.ZIP_STORED),
+                         ODS_MIMETYPE)
+            ods.writestr(_zip_info('META-INF/manifest.xml'), MANIFEST_XML)
+            ods.writestr(_zip_info('styles.xml'), STYLES_XML)
+            ods.write(content_path, 'content.xml')
+            ods.close()
+        finally:
+            os.remove(content_path)
+
+
+def _empty_cells(count):
+    if count == 1:
+        return u'<table:table-cell/>'
+    return u'<table:table-cell table:number-columns-repeated="%d"/>' % count
+
+
+def _cell_text(cell):
+    """
+    Get text of ods cell, repeated spaces (text:s) are expanded.
+    """
+    parts = []
+    for p in cell.iter('{%s}p' % NAMESPACES['text']):
+        text = [p.text or '']
+        for child in p:
+            if child.tag == '{%s}s' % NAMESPACES['text']:
+                text.append(' ' * int(child.get(
+                    '{%s}c' % NAMESPACES['text'], 1)))
+            text.append(child.tail or '')
+        parts.append(''.join(text))
+    return u'\n'.join(parts)
+
+
+def read_ods(file_path):
+    """
+    Read all sheets from ods file.
+    :param file_path: path or file object with ods content
+    :return: list of (sheet name, rows) tuples, rows are lists of strings
+    """
+    ods = zipfile.ZipFile(file_path)
+    content = ods.open('content.xml')
+    table_ns = '{%s}' % NAMESPACES['table']
+    sheets = []
+    for event, element in cElementTree.iterparse(content):
+        if element.tag != table_ns + 'table':
+            continue
+        rows = []
+        for row in element.iter(table_ns + 'table-row'):
+            values = []
+            for cell in row.iter(table_ns + 'table-cell'):
+                repeat = int(cell.get(table_ns + 'number-columns-repeated', 1))
+                values.extend([_cell_text(cell)] * repeat)
+            while values and not values[-1]:
+                values.pop()
+            rows.append(values)
+        sheets.append((element.get(table_ns + 'name'), rows))
+        element.clear()
+    content.close()
+    ods.close()
+    return sheets
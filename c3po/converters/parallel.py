@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+
+from c3po.conf import settings
+
+
+def parallel_map(func, items, jobs=None):
+    """
+    Apply func to every item in pool of jobs worker processes and return
+    list of results in order of items. With one job or one item, func is
+    called in current process. func has to be module level function.
+    :param jobs: number of processes, defaults to JOBS setting
+    """
+    if jobs is None:
+        jobs = settings.JOBS
+    items = list(items)
+    if jobs <= 1 or len(items) < 2:
+        return map(func, items)
+
+    pool = multiprocessing.Pool(min(jobs, len(items)))
+    try:
+        return pool.map(func, items, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
@@ -1,22 +1,34 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import ast
+import hashlib
+import marshal
 import os
 import re
+import shutil
+import struct
+import tempfile
 from itertools import izip_longest
 
 import polib
 
 from c3po.conf import settings
+from c3po.converters.catalog import (catalog_cache, get_catalog,
+                                     prefetch_catalogs)
+from c3po.converters.metadata import (METADATA_EMPTY, dump_metadata,
+                                      load_metadata)
+from c3po.converters.mo import mo_content, mo_path
+from c3po.converters.parallel import parallel_map
+from c3po.converters.po_reader import iter_po_entries
 from c3po.converters.unicode import UnicodeWriter, UnicodeReader
+from c3po.profiler import profiler
 
 
-METADATA_EMPTY = "{'comment': '', 'previous_msgctxt': None, " + \
-                 "'encoding': 'utf-8', 'obsolete': 0, 'msgid_plural': '', " + \
-                 "'msgstr_plural': {}, 'occurrences': [], 'msgctxt': None, " + \
-                 "'flags': [], 'previous_msgid': None, " + \
-                 "'previous_msgid_plural': None}"
+START_WHITESPACE = re.compile(r'^[\s]+')
+END_WHITESPACE = re.compile(r'[\s]+$')
+# Number of entries kept in memory for every partition file before they
+# are appended to it, so partition files don't have to stay open
+PARTITION_BUFFER_SIZE = 1000
 
 
 def _get_all_po_filenames(locale_root, lang, po_files_path):
@@ -58,155 +70,348 @@ def _prepare_locale_dirs(languages, locale_root):
     return trans_languages
 
 
-def _prepare_polib_files(files_dict, filename, languages,
-                         locale_root, po_files_path, header):
+def _prepare_partitions(partitions, filename, languages,
+                        locale_root, po_files_path, partitions_dir):
     """
-    Prepare polib file object for writing/reading from them.
-    Create directories and write header if needed. For each language,
-    ensure there's a translation file named "filename" in the correct place.
+    Prepare partition files collecting entries of po file named "filename"
+    for each language, with empty buffers of entries waiting to be written.
+    Create directories for po files if needed.
     Assumes (and creates) a directory structure:
     <locale_root>/<lang>/<po_files_path>/<filename>.
     """
-    files_dict[filename] = {}
+    partitions[filename] = []
     for lang in languages:
         file_path = os.path.join(locale_root, lang, po_files_path)
         if not os.path.exists(file_path):
             os.makedirs(file_path)
 
-        if header is not None:
-            _write_header(os.path.join(file_path, filename), lang, header)
+        fd, partition_path = tempfile.mkstemp(dir=partitions_dir)
+        os.close(fd)
+        partitions[filename].append((os.path.join(file_path, filename), lang,
+                                     partition_path, []))
 
-        files_dict[filename][lang] = polib.pofile(
-            os.path.join(file_path, filename), encoding="UTF-8")
+
+def _flush_partition(partition):
+    """
+    Append buffered entries to partition file and empty the buffer.
+    """
+    with open(partition[2], 'ab') as partition_file:
+        partition_file.write(''.join(partition[3]))
+    del partition[3][:]
+
+
+def _new_po_file(po_path, lang, header):
+    """
+    Prepare polib file object with header for specific lang. File is only
+    built in memory, it is written by _save_po_file.
+    """
+    po_file = polib.POFile(encoding='UTF-8')
+    po_file.fpath = po_path
+    if header is not None:
+        po_file.header, po_file.metadata = _get_header(lang, header)
+    return po_file
 
 
-def _write_entries(po_files, languages, msgid, msgstrs, metadata, comment):
+def _write_file(path, content):
     """
-    Write msgstr for every language with all needed metadata and comment.
-    Metadata are parser from string into dict, so read them only from gdocs.
+    Write file atomically: content goes into temporary file which is
+    then renamed.
     """
-    start = re.compile(r'^[\s]+')
-    end = re.compile(r'[\s]+$')
-    for i, lang in enumerate(languages):
-        meta = ast.literal_eval(metadata)
-        entry = polib.POEntry(**meta)
-        entry.tcomment = comment
-        entry.msgid = msgid
-        if msgstrs[i]:
-            start_ws = start.search(msgid)
-            end_ws = end.search(msgid)
-            entry.msgstr = str(start_ws.group() if start_ws else '') + \
-                unicode(msgstrs[i].strip()) + \
-                str(end_ws.group() if end_ws else '')
-        else:
-            entry.msgstr = ''
-        po_files[lang].append(entry)
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp_path, 'wb') as temp_file:
+        temp_file.write(content)
+    if os.path.exists(path):
+        shutil.copymode(path, temp_path)
+        if os.name == 'nt':
+            os.remove(path)
+    os.rename(temp_path, path)
+
+
+def _save_po_file(po_file, incremental=False):
+    """
+    Save po file atomically. In incremental mode file isn't touched if its
+    content didn't change. Returns tuple of flags telling if file was
+    written and if its content changed.
+    """
+    po_path = po_file.fpath
+    content = unicode(po_file).encode(po_file.encoding)
+
+    changed = True
+    if os.path.exists(po_path):
+        with open(po_path, 'rb') as current_file:
+            changed = current_file.read() != content
+    if incremental and not changed:
+        return False, False
+
+    _write_file(po_path, content)
+    catalog_cache.invalidate(po_path)
+    return True, changed
 
 
-def _write_header(po_path, lang, header):
+def _mo_outdated(po_path):
     """
-    Write header into po file for specific lang.
-    Metadata are read from settings file.
+    Check if mo file compiled from po file is missing or older than it.
     """
-    po_file = open(po_path, 'w')
-    po_file.write(header + '\n')
-    po_file.write(
-        'msgid ""' +
-        '\nmsgstr ""' +
-        '\n"MIME-Version: ' + settings.METADATA['MIME-Version'] + r'\n"'
-        '\n"Content-Type: ' + settings.METADATA['Content-Type'] + r'\n"'
-        '\n"Content-Transfer-Encoding: ' +
-        settings.METADATA['Content-Transfer-Encoding'] + r'\n"'
-        '\n"Language: ' + lang + r'\n"' + '\n')
-    po_file.close()
+    mo_file_path = mo_path(po_path)
+    if not os.path.exists(mo_file_path):
+        return True
+    return (os.path.exists(po_path) and
+            os.path.getmtime(mo_file_path) < os.path.getmtime(po_path))
+
+
+def _write_entries(partitions, msgid, msgstrs, metadata, comment):
+    """
+    Write msgstr for every language with all needed metadata and comment
+    into partitions of po file. Metadata are parsed from string into dict
+    once for all languages, so read them only from gdocs.
+    """
+    meta = load_metadata(metadata)
+    for i, partition in enumerate(partitions):
+        partition[3].append(marshal.dumps((meta, comment, msgid, msgstrs[i])))
+        if len(partition[3]) >= PARTITION_BUFFER_SIZE:
+            _flush_partition(partition)
+
+
+def _make_entry(meta, comment, msgid, msgstr):
+    """
+    Create po entry from values stored in partition. Whitespace
+    surrounding msgid is copied into msgstr.
+    """
+    entry = polib.POEntry(**meta)
+    entry.tcomment = comment
+    entry.msgid = msgid
+    if msgstr:
+        start_ws = START_WHITESPACE.search(msgid)
+        end_ws = END_WHITESPACE.search(msgid)
+        entry.msgstr = str(start_ws.group() if start_ws else '') + \
+            unicode(msgstr.strip()) + \
+            str(end_ws.group() if end_ws else '')
+    else:
+        entry.msgstr = ''
+    return entry
+
+
+def _write_partition(task):
+    """
+    Build po file from entries stored in partition file and save it.
+    Compiled mo file is saved from the same po file object if po content
+    changed or mo file is missing or older than po file. Runs in worker
+    process, returns tuple of flags telling if po and mo files were
+    written.
+    """
+    po_path, lang, partition_path, header, incremental, compile_mo = task
+    po_file = _new_po_file(po_path, lang, header)
+    with open(partition_path, 'rb') as partition_file:
+        while True:
+            try:
+                values = marshal.load(partition_file)
+            except EOFError:
+                break
+            po_file.append(_make_entry(*values))
+    # checked before po file is rewritten and becomes newer than mo file
+    mo_outdated = compile_mo and _mo_outdated(po_path)
+    po_written, po_changed = _save_po_file(po_file, incremental)
+    mo_written = False
+    if compile_mo and (po_changed or mo_outdated):
+        _write_file(mo_path(po_path), mo_content(po_file))
+        mo_written = True
+    return po_written, mo_written
+
+
+def _get_header(lang, header):
+    """
+    Get header comment and metadata of new po file for specific lang.
+    Comment lines are taken from header like polib does when parsing,
+    metadata are read from settings file.
+    """
+    if not isinstance(header, unicode):
+        header = header.decode('utf-8')
+    comments = []
+    for line in header.splitlines():
+        line = line.strip()
+        tokens = line.split(None, 1)
+        if tokens and (tokens[0] == '#' or tokens[0].startswith('##')):
+            comments.append(line[2:])
+    metadata = dict((key, unicode(settings.METADATA[key])) for key in
+                    ('MIME-Version', 'Content-Type',
+                     'Content-Transfer-Encoding'))
+    metadata['Language'] = unicode(lang)
+    return u'\n'.join(comments), metadata
+
+
+def _entry_key(po_filename, msgctxt, msgid):
+    """
+    Return key identifying message in the whole locale tree. Identical
+    msgids placed in different files or contexts don't collide.
+    """
+    return po_filename, msgctxt, msgid
+
+
+def _decode_key(key):
+    """
+    Return message key with byte strings decoded, so it's equal to the
+    same key with unicode values.
+    """
+    return tuple(value.decode('utf-8') if isinstance(value, str) else value
+                 for value in key)
+
+
+def _key_digest(key):
+    """
+    Return 64-bit hash of decoded message key.
+    """
+    digest = hashlib.md5(marshal.dumps(key)).digest()
+    return struct.unpack('<q', digest[:8])[0]
+
+
+class _KeyIndex(object):
+    """
+    Set of message keys used by streaming merge, which keeps only 64-bit
+    hashes of keys in memory. Keys are written into temporary file and
+    every key found by its hash is compared with the stored one, so
+    colliding keys are still told apart. Keys colliding with stored ones
+    are kept in memory.
+    """
+
+    def __init__(self):
+        fd, self.store_path = tempfile.mkstemp(prefix='c3po-')
+        self.store = os.fdopen(fd, 'w+b')
+        self.offsets = {}
+        self.colliding = set()
+
+    def _stored_key(self, offset):
+        self.store.seek(offset)
+        return marshal.load(self.store)
+
+    def __contains__(self, key):
+        key = _decode_key(key)
+        offset = self.offsets.get(_key_digest(key))
+        if offset is None:
+            return False
+        return self._stored_key(offset) == key or key in self.colliding
+
+    def add(self, key):
+        key = _decode_key(key)
+        digest = _key_digest(key)
+        offset = self.offsets.get(digest)
+        if offset is None:
+            self.store.seek(0, os.SEEK_END)
+            self.offsets[digest] = self.store.tell()
+            marshal.dump(key, self.store)
+        elif self._stored_key(offset) != key:
+            profiler.count('msgid_hash_collisions')
+            self.colliding.add(key)
+
+    def close(self):
+        self.store.close()
+        os.remove(self.store_path)
+
+
+def _get_msgctxt(metadata):
+    """
+    Get msgctxt value from metadata string read from spreadsheet.
+    """
+    return load_metadata(metadata).get('msgctxt')
 
 
 def _write_new_messages(po_file_path, trans_writer, meta_writer,
                         msgids, msgstrs, languages):
     """
     Write new msgids which appeared in po files with empty msgstrs values
-    and metadata. Look for all new msgids which are diffed with msgids list
+    and metadata. Look for all new msgids which are diffed with msgids index
     provided as an argument.
     """
     po_filename = os.path.basename(po_file_path)
-    po_file = polib.pofile(po_file_path)
+    po_file = get_catalog(po_file_path)
 
     new_trans = 0
     for entry in po_file:
-        if entry.msgid not in msgids:
+        key = _entry_key(po_filename, entry.msgctxt, entry.msgid)
+        if key not in msgids:
             new_trans += 1
             trans = [po_filename, entry.tcomment, entry.msgid, entry.msgstr]
             for lang in languages[1:]:
-                trans.append(msgstrs[lang].get(entry.msgid, ''))
-
-            meta = dict(entry.__dict__)
-            meta.pop('msgid', None)
-            meta.pop('msgstr', None)
-            meta.pop('tcomment', None)
+                trans.append(msgstrs[lang].get(key, ''))
 
             trans_writer.writerow(trans)
-            meta_writer.writerow([str(meta)])
+            meta_writer.writerow([dump_metadata(entry)])
 
+    profiler.count('csv_rows_written', new_trans)
     return new_trans
 
 
 def _get_new_msgstrs(po_file_path, msgids):
     """
-    Write new msgids which appeared in po files with empty msgstrs values
-    and metadata. Look for all new msgids which are diffed with msgids list
-    provided as an argument.
+    Get msgstrs of all messages from po file which are not present in msgids
+    index provided as an argument. Returns dict keyed same as the index.
     """
-    po_file = polib.pofile(po_file_path)
+    po_filename = os.path.basename(po_file_path)
+    po_file = get_catalog(po_file_path)
 
     msgstrs = {}
 
     for entry in po_file:
-        if entry.msgid not in msgids:
-            msgstrs[entry.msgid] = entry.msgstr
+        key = _entry_key(po_filename, entry.msgctxt, entry.msgid)
+        if key not in msgids:
+            msgstrs[key] = entry.msgstr
 
     return msgstrs
 
 
-def po_to_csv_merge(languages, locale_root, po_files_path,
-                    local_trans_csv, local_meta_csv,
-                    gdocs_trans_csv, gdocs_meta_csv):
+def _store_new_msgstrs(po_file_path, msgids, store):
     """
-    Converts po file to csv GDocs spreadsheet readable format.
-    Merges them if some msgid aren't in the spreadsheet.
-    :param languages: list of language codes
-    :param locale_root: path to locale root folder containing directories
-                        with languages
-    :param po_files_path: path from lang directory to po file
-    :param local_trans_csv: path where local csv with translations
-                            will be created
-    :param local_meta_csv: path where local csv with metadata will be created
-    :param gdocs_trans_csv: path to gdoc csv with translations
+    Stream entries of po file and write msgstrs of messages not present in
+    msgids index into store file. Returns dict mapping their keys to
+    offsets of msgstrs in store.
     """
-    msgids = []
-
-    trans_reader = UnicodeReader(gdocs_trans_csv)
-    meta_reader = UnicodeReader(gdocs_meta_csv)
-
-    try:
-        trans_title = trans_reader.next()
-        meta_title = meta_reader.next()
-    except StopIteration:
-        trans_title = ['file', 'comment', 'msgid']
-        trans_title += map(lambda s: s + ':msgstr', languages)
-        meta_title = ['metadata']
-
-    trans_writer, meta_writer = _get_new_csv_writers(
-        trans_title, meta_title, local_trans_csv, local_meta_csv)
-
-    for trans_row, meta_row in izip_longest(trans_reader, meta_reader):
-        msgids.append(trans_row[2])
-        trans_writer.writerow(trans_row)
-        meta_writer.writerow(meta_row if meta_row else [METADATA_EMPTY])
+    po_filename = os.path.basename(po_file_path)
+    offsets = {}
+    for entry in iter_po_entries(po_file_path):
+        key = _entry_key(po_filename, entry.msgctxt, entry.msgid)
+        if key not in msgids:
+            offsets[key] = store.tell()
+            marshal.dump(entry.msgstr, store)
+    profiler.count('po_files_parsed')
+    return offsets
+
+
+def _stream_new_messages(po_file_path, trans_writer, meta_writer,
+                         msgids, offsets, store):
+    """
+    Stream entries of po file and write messages not present in msgids
+    index, with msgstrs of other languages read back from store.
+    """
+    po_filename = os.path.basename(po_file_path)
+    new_trans = 0
+    for entry in iter_po_entries(po_file_path):
+        key = _entry_key(po_filename, entry.msgctxt, entry.msgid)
+        if key in msgids:
+            continue
+        new_trans += 1
+        trans = [po_filename, entry.tcomment, entry.msgid, entry.msgstr]
+        for lang_offsets in offsets:
+            offset = lang_offsets.get(key)
+            if offset is None:
+                trans.append('')
+            else:
+                store.seek(offset)
+                trans.append(marshal.load(store))
+        trans_writer.writerow(trans)
+        meta_writer.writerow([dump_metadata(entry)])
+
+    profiler.count('po_files_parsed')
+    profiler.count('csv_rows_written', new_trans)
+    return new_trans
 
-    trans_reader.close()
-    meta_reader.close()
 
-    po_files = _get_all_po_filenames(locale_root, languages[0], po_files_path)
+def _merge_po_files(languages, locale_root, po_files_path, po_files,
+                    trans_writer, meta_writer, msgids):
+    """
+    Append messages which aren't in spreadsheet yet, using catalogs parsed
+    by polib. Returns True if any message was appended.
+    """
+    prefetch_catalogs([os.path.join(locale_root, lang, po_files_path, f)
+                       for f in po_files for lang in languages])
 
     new_trans = False
     for po_filename in po_files:
@@ -224,28 +429,152 @@ def po_to_csv_merge(languages, locale_root, po_files_path,
                                         po_files_path, po_filename)
             _write_new_messages(po_file_path, trans_writer, meta_writer,
                                 msgids, new_msgstrs, languages)
+    return new_trans
 
-    trans_writer.close()
-    meta_writer.close()
 
+def _stream_po_files(languages, locale_root, po_files_path, po_files,
+                     trans_writer, meta_writer, msgids):
+    """
+    Append messages which aren't in spreadsheet yet, parsing po files
+    entry by entry. Msgstrs of other languages are kept in temporary file,
+    only their offsets are in memory. Returns True if any message was
+    appended.
+    """
+    new_trans = False
+    for po_filename in po_files:
+        fd, store_path = tempfile.mkstemp(prefix='c3po-')
+        store = os.fdopen(fd, 'w+b')
+        try:
+            offsets = []
+            for lang in languages[1:]:
+                po_file_path = os.path.join(locale_root, lang,
+                                            po_files_path, po_filename)
+                if not os.path.exists(po_file_path):
+                    open(po_file_path, 'a').close()
+                offsets.append(_store_new_msgstrs(po_file_path, msgids,
+                                                  store))
+
+            if offsets[0]:
+                new_trans = True
+                po_file_path = os.path.join(locale_root, languages[0],
+                                            po_files_path, po_filename)
+                _stream_new_messages(po_file_path, trans_writer,
+                                     meta_writer, msgids, offsets, store)
+        finally:
+            store.close()
+            os.remove(store_path)
     return new_trans
 
 
-def csv_to_po(trans_csv_path, meta_csv_path, locale_root,
-              po_files_path, header=None):
+@profiler.profiled('po_to_csv_merge')
+def po_to_csv_merge(languages, locale_root, po_files_path,
+                    local_trans_csv, local_meta_csv,
+                    gdocs_trans_csv, gdocs_meta_csv, streaming=False):
     """
-    Converts GDocs spreadsheet generated csv file into po file.
-    :param trans_csv_path: path to temporary file with translations
-    :param meta_csv_path: path to temporary file with meta information
+    Converts po file to csv GDocs spreadsheet readable format.
+    Merges them if some msgid aren't in the spreadsheet.
+    :param languages: list of language codes
     :param locale_root: path to locale root folder containing directories
                         with languages
     :param po_files_path: path from lang directory to po file
+    :param local_trans_csv: path or file object where local csv with
+                            translations will be created
+    :param local_meta_csv: path or file object where local csv with
+                           metadata will be created
+    :param gdocs_trans_csv: path or file object with gdoc csv
+                            with translations
+    :param gdocs_meta_csv: path or file object with gdoc csv with metadata
+    :param streaming: if True, po files are parsed entry by entry and only
+                      hashes of spreadsheet msgids are kept in memory,
+                      instead of whole catalogs, while msgids themselves
+                      are kept in temporary file
+    """
+    msgids = _KeyIndex() if streaming else set()
+    try:
+        trans_reader = UnicodeReader(gdocs_trans_csv)
+        meta_reader = UnicodeReader(gdocs_meta_csv)
+
+        try:
+            trans_title = trans_reader.next()
+            meta_title = meta_reader.next()
+        except StopIteration:
+            trans_title = ['file', 'comment', 'msgid']
+            trans_title += map(lambda s: s + ':msgstr', languages)
+            meta_title = ['metadata']
+
+        trans_writer, meta_writer = _get_new_csv_writers(
+            trans_title, meta_title, local_trans_csv, local_meta_csv)
+
+        rows = 0
+        for trans_row, meta_row in izip_longest(trans_reader, meta_reader):
+            msgids.add(_entry_key(
+                trans_row[0].rstrip(),
+                _get_msgctxt(meta_row[0] if meta_row else None),
+                trans_row[2]))
+            trans_writer.writerow(trans_row)
+            meta_writer.writerow(meta_row if meta_row else [METADATA_EMPTY])
+            rows += 1
+        profiler.count('csv_rows_read', rows)
+        profiler.count('csv_rows_written', rows)
+
+        trans_reader.close()
+        meta_reader.close()
+
+        po_files = _get_all_po_filenames(locale_root, languages[0],
+                                         po_files_path)
+        merge = _stream_po_files if streaming else _merge_po_files
+        new_trans = merge(languages, locale_root, po_files_path, po_files,
+                          trans_writer, meta_writer, msgids)
+
+        trans_writer.close()
+        meta_writer.close()
+
+        return new_trans
+    finally:
+        if streaming:
+            msgids.close()
+
+
+def _remove_po_files(locale_root, keep=(), with_mo=False):
+    """
+    Remove all po files found in locale_root except paths listed in keep.
+    If with_mo is True, mo files compiled from removed po files are
+    removed too.
     """
     pattern = "^\w+.*po$"
+    keep = set(os.path.abspath(path) for path in keep)
     for root, dirs, files in os.walk(locale_root):
         for f in filter(lambda x: re.match(pattern, x), files):
-            os.remove(os.path.join(root, f))
+            po_path = os.path.join(root, f)
+            if os.path.abspath(po_path) not in keep:
+                os.remove(po_path)
+                if with_mo and os.path.exists(mo_path(po_path)):
+                    os.remove(mo_path(po_path))
+
 
+@profiler.profiled('csv_to_po')
+def csv_to_po(trans_csv_path, meta_csv_path, locale_root,
+              po_files_path, header=None, incremental=False,
+              compile_mo=False):
+    """
+    Converts GDocs spreadsheet generated csv file into po file.
+    :param trans_csv_path: path or file object with translations csv
+    :param meta_csv_path: path or file object with meta information csv
+    :param locale_root: path to locale root folder containing directories
+                        with languages
+    :param po_files_path: path from lang directory to po file
+    :param header: header which will be put on top of every po file
+    :param incremental: if True, only po files whose content changed are
+                        rewritten and other po files are left untouched
+    :param compile_mo: if True, mo file is compiled next to every po file
+                       whose content changed or whose mo file is missing
+                       or outdated, without parsing po file again
+    :return: list of paths to written po files
+
+    Rows are split into partition files, one for every po file, which are
+    then turned into po files by JOBS worker processes. Only one po file
+    per process is kept in memory.
+    """
     # read title row and prepare descriptors for po files in each lang
     trans_reader = UnicodeReader(trans_csv_path)
     meta_reader = UnicodeReader(meta_csv_path)
@@ -253,29 +582,65 @@ def csv_to_po(trans_csv_path, meta_csv_path, locale_root,
         title_row = trans_reader.next()
     except StopIteration:
         # empty file
-        return
+        trans_reader.close()
+        meta_reader.close()
+        _remove_po_files(locale_root, with_mo=compile_mo)
+        return []
 
     trans_languages = _prepare_locale_dirs(title_row[3:], locale_root)
 
-    po_files = {}
-
-    meta_reader.next()
-    # go through every row in downloaded csv file
-    for trans_row, meta_row in izip_longest(trans_reader, meta_reader):
-        filename = trans_row[0].rstrip()
-        metadata = meta_row[0].rstrip() if meta_row else METADATA_EMPTY
-        comment = trans_row[1]
-        msgid = trans_row[2]
-
-        if filename not in po_files:
-            _prepare_polib_files(po_files, filename, trans_languages,
-                                 locale_root, po_files_path, header)
-
-        _write_entries(po_files[filename], trans_languages, msgid,
-                       trans_row[3:], metadata, comment)
-    for filename in po_files:
-        for lang in po_files[filename]:
-            po_files[filename][lang].save()
-
-    trans_reader.close()
-    meta_reader.close()
+    filenames = []
+    partitions = {}
+    rows = 0
+    partitions_dir = tempfile.mkdtemp(prefix='c3po-')
+    try:
+        meta_reader.next()
+        # go through every row in downloaded csv file
+        for trans_row, meta_row in izip_longest(trans_reader, meta_reader):
+            filename = trans_row[0].rstrip()
+            metadata = meta_row[0].rstrip() if meta_row else METADATA_EMPTY
+            comment = trans_row[1]
+            msgid = trans_row[2]
+
+            if filename not in partitions:
+                filenames.append(filename)
+                _prepare_partitions(partitions, filename, trans_languages,
+                                    locale_root, po_files_path,
+                                    partitions_dir)
+
+            _write_entries(partitions[filename], msgid,
+                           trans_row[3:], metadata, comment)
+            rows += 1
+
+        profiler.count('csv_rows_read', rows)
+
+        tasks = []
+        for filename in filenames:
+            for partition in partitions[filename]:
+                _flush_partition(partition)
+                tasks.append((partition[0], partition[1], partition[2],
+                              header, incremental, compile_mo))
+        results = parallel_map(_write_partition, tasks)
+    finally:
+        trans_reader.close()
+        meta_reader.close()
+        shutil.rmtree(partitions_dir)
+
+    written = []
+    po_paths = []
+    mo_written = 0
+    for task, (po_written, mo_was_written) in zip(tasks, results):
+        po_paths.append(task[0])
+        if po_written:
+            catalog_cache.invalidate(task[0])
+            written.append(task[0])
+        mo_written += mo_was_written
+    profiler.count('po_files_written', len(written))
+    if compile_mo:
+        profiler.count('mo_files_written', mo_written)
+
+    # stale po files are removed only now, so mo files of po files which
+    # are rewritten with the same content aren't compiled again
+    _remove_po_files(locale_root, keep=po_paths, with_mo=compile_mo)
+
+    return written
@@ -4,163 +4,165 @@
 import os
 from itertools import izip
 
-import polib
-from odslib import ODS
 from c3po.conf import settings
+from c3po.converters.catalog import get_catalog, prefetch_catalogs
+from c3po.converters.metadata import dump_metadata
+from c3po.converters.ods import ODSWriter
 from c3po.converters.po_csv import _get_all_po_filenames
 from c3po.converters.unicode import UnicodeReader
+from c3po.profiler import profiler
+
+
+TRANS_SHEET = 0
+META_SHEET = 1
+
+TITLE_STYLE = 'title'
+ODD_STYLE = 'odd'
+EVEN_STYLE = 'even'
 
 
 def _escape_apostrophe(entry):
     return ("'" if entry.startswith("'") else "") + entry
 
 
-def _prepare_ods_columns(ods, trans_title_row):
+def _get_columns(widths):
+    """
+    Get column definitions with given widths and alternating background
+    styles.
     """
-    Prepare columns in new ods file, create new sheet for metadata,
-    set columns color and width. Set formatting style info in your
-    settings.py file in ~/.c3po/ folder.
+    return [(width, EVEN_STYLE if j % 2 == 1 else ODD_STYLE)
+            for j, width in enumerate(widths)]
+
+
+def _prepare_ods_columns(ods_path, trans_title_row):
     """
-    ods.content.getSheet(0).setSheetName('Translations')
-    ods.content.makeSheet('Meta options')
-    ods.content.getColumn(0).setWidth('5.0in')
-    ods.content.getCell(0, 0).stringValue('metadata')\
-        .setCellColor(settings.TITLE_ROW_BG_COLOR) \
-        .setBold(True).setFontColor(settings.TITLE_ROW_FONT_COLOR)
-
-    ods.content.getSheet(0)
-    ods.content.getColumn(0).setWidth('1.5in')
-    ods.content.getCell(0, 0) \
-        .setCellColor(settings.TITLE_ROW_BG_COLOR) \
-        .setBold(True).setFontColor(settings.TITLE_ROW_FONT_COLOR)
-    for i, title in enumerate(trans_title_row):
-        ods.content.getColumn(i).setWidth(settings.MSGSTR_COLUMN_WIDTH)
-        ods.content.getCell(i, 0).stringValue(title)\
-            .setCellColor(settings.TITLE_ROW_BG_COLOR) \
-            .setBold(True).setFontColor(settings.TITLE_ROW_FONT_COLOR)
-    ods.content.getColumn(0).setWidth(settings.NOTES_COLUMN_WIDTH)
-
-
-def _write_trans_into_ods(ods, languages, locale_root,
-                          po_files_path, po_filename, start_row):
+    Prepare new ods writer with translations and metadata sheets, define
+    styles, set columns width and write title rows. Set formatting style
+    info in your settings.py file in ~/.c3po/ folder.
     """
-    Write translations from po files into ods one file.
+    ods = ODSWriter(ods_path)
+    ods.add_style(TITLE_STYLE, bg_color=settings.TITLE_ROW_BG_COLOR,
+                  font_color=settings.TITLE_ROW_FONT_COLOR, bold=True)
+    ods.add_style(ODD_STYLE, bg_color=settings.ODD_COLUMN_BG_COLOR)
+    ods.add_style(EVEN_STYLE, bg_color=settings.EVEN_COLUMN_BG_COLOR)
+
+    ods.add_sheet('Translations', _get_columns(
+        [settings.NOTES_COLUMN_WIDTH] +
+        [settings.MSGSTR_COLUMN_WIDTH] * (len(trans_title_row) - 1)))
+    ods.add_sheet('Meta options', _get_columns(['5.0in']))
+
+    ods.writerow(TRANS_SHEET, trans_title_row, [TITLE_STYLE])
+    ods.writerow(META_SHEET, ['metadata'], [TITLE_STYLE])
+    return ods
+
+
+def _get_trans_msgstrs(languages, locale_root, po_files_path, po_filename):
+    """
+    Get msgstrs from po files of all languages except the first one,
+    in order of entries in files. Missing files give empty lists.
     Assumes a directory structure:
     <locale_root>/<lang>/<po_files_path>/<filename>.
     """
-    ods.content.getSheet(0)
-    for i, lang in enumerate(languages[1:]):
+    msgstrs = []
+    for lang in languages[1:]:
         lang_po_path = os.path.join(locale_root, lang,
                                     po_files_path, po_filename)
         if os.path.exists(lang_po_path):
-            po_file = polib.pofile(lang_po_path)
-            for j, entry in enumerate(po_file):
-                # start from 4th column, 1st row
-                row = j+start_row
-                ods.content.getCell(i+4, row).stringValue(
-                    _escape_apostrophe(entry.msgstr))
-                if i % 2 == 1:
-                    ods.content.getCell(i+4, row).setCellColor(
-                        settings.ODD_COLUMN_BG_COLOR)
-                else:
-                    ods.content.getCell(i+4, row).setCellColor(
-                        settings.EVEN_COLUMN_BG_COLOR)
-
-
-def _write_row_into_ods(ods, sheet_no, row_no, row):
+            msgstrs.append(
+                [entry.msgstr for entry in get_catalog(lang_po_path)])
+        else:
+            msgstrs.append([])
+    return msgstrs
+
+
+def _write_row_into_ods(ods, sheet_no, row):
     """
-    Write row with translations to ods file into specified sheet and row_no.
+    Write row with translations to ods file into specified sheet.
     """
-    ods.content.getSheet(sheet_no)
-    for j, col in enumerate(row):
-        cell = ods.content.getCell(j, row_no+1)
-        cell.stringValue(_escape_apostrophe(col))
-        if j % 2 == 1:
-            cell.setCellColor(settings.EVEN_COLUMN_BG_COLOR)
-        else:
-            cell.setCellColor(settings.ODD_COLUMN_BG_COLOR)
+    ods.writerow(sheet_no, [_escape_apostrophe(col) for col in row])
 
 
-def po_to_ods(languages, locale_root, po_files_path, temp_file_path):
+def po_to_rows(languages, locale_root, po_files_path):
     """
-    Converts po file to csv GDocs spreadsheet readable format.
+    Generate spreadsheet content from po files: pairs of translations row
+    and metadata row, starting with title rows.
     :param languages: list of language codes
     :param locale_root: path to locale root folder containing directories
                         with languages
     :param po_files_path: path from lang directory to po file
-    :param temp_file_path: path where temporary files will be saved
     """
     title_row = ['file', 'comment', 'msgid']
     title_row += map(lambda s: s + ':msgstr', languages)
-
-    ods = ODS()
-
-    _prepare_ods_columns(ods, title_row)
+    yield title_row, ['metadata']
 
     po_files = _get_all_po_filenames(locale_root, languages[0], po_files_path)
+    prefetch_catalogs([os.path.join(locale_root, lang, po_files_path, f)
+                       for f in po_files for lang in languages])
 
-    i = 1
     for po_filename in po_files:
         po_file_path = os.path.join(locale_root, languages[0],
                                     po_files_path, po_filename)
+        trans_msgstrs = _get_trans_msgstrs(languages, locale_root,
+                                           po_files_path, po_filename)
 
-        start_row = i
+        po = get_catalog(po_file_path)
+        for j, entry in enumerate(po):
+            row = [po_filename, entry.tcomment, entry.msgid, entry.msgstr]
+            row += [msgstrs[j] if j < len(msgstrs) else ''
+                    for msgstrs in trans_msgstrs]
+            yield row, [dump_metadata(entry)]
 
-        po = polib.pofile(po_file_path)
-        for entry in po:
-            meta = dict(entry.__dict__)
-            meta.pop('msgid', None)
-            meta.pop('msgstr', None)
-            meta.pop('tcomment', None)
 
-            ods.content.getSheet(1)
-            ods.content.getCell(0, i).stringValue(
-                str(meta)).setCellColor(settings.EVEN_COLUMN_BG_COLOR)
-
-            ods.content.getSheet(0)
-            ods.content.getCell(0, i) \
-                .stringValue(po_filename) \
-                .setCellColor(settings.ODD_COLUMN_BG_COLOR)
-            ods.content.getCell(1, i) \
-                .stringValue(_escape_apostrophe(entry.tcomment)) \
-                .setCellColor(settings.ODD_COLUMN_BG_COLOR)
-            ods.content.getCell(2, i) \
-                .stringValue(_escape_apostrophe(entry.msgid)) \
-                .setCellColor(settings.EVEN_COLUMN_BG_COLOR)
-            ods.content.getCell(3, i) \
-                .stringValue(_escape_apostrophe(entry.msgstr))\
-                .setCellColor(settings.ODD_COLUMN_BG_COLOR)
+@profiler.profiled('po_to_ods')
+def po_to_ods(languages, locale_root, po_files_path, temp_file_path):
+    """
+    Converts po file to csv GDocs spreadsheet readable format.
+    :param languages: list of language codes
+    :param locale_root: path to locale root folder containing directories
+                        with languages
+    :param po_files_path: path from lang directory to po file
+    :param temp_file_path: path or file object where ods will be written
+    """
+    rows = po_to_rows(languages, locale_root, po_files_path)
+    title_row, meta_title_row = rows.next()
 
-            i += 1
+    ods = _prepare_ods_columns(temp_file_path, title_row)
 
-        _write_trans_into_ods(ods, languages, locale_root,
-                              po_files_path, po_filename, start_row)
+    count = 0
+    for trans_row, meta_row in rows:
+        _write_row_into_ods(ods, TRANS_SHEET, trans_row)
+        _write_row_into_ods(ods, META_SHEET, meta_row)
+        count += 1
 
-    ods.save(temp_file_path)
+    ods.close()
+    profiler.count('ods_rows_written', count)
 
 
+@profiler.profiled('csv_to_ods')
 def csv_to_ods(trans_csv, meta_csv, local_ods):
     """
     Converts csv files to one ods file
-    :param trans_csv: path to csv file with translations
-    :param meta_csv: path to csv file with metadata
-    :param local_ods: path to new ods file
+    :param trans_csv: path or file object with translations csv
+    :param meta_csv: path or file object with metadata csv
+    :param local_ods: path or file object where ods will be written
     """
     trans_reader = UnicodeReader(trans_csv)
     meta_reader = UnicodeReader(meta_csv)
 
-    ods = ODS()
-
     trans_title = trans_reader.next()
     meta_reader.next()
 
-    _prepare_ods_columns(ods, trans_title)
+    ods = _prepare_ods_columns(local_ods, trans_title)
 
-    for i, (trans_row, meta_row) in enumerate(izip(trans_reader, meta_reader)):
-        _write_row_into_ods(ods, 0, i, trans_row)
-        _write_row_into_ods(ods, 1, i, meta_row)
+    count = 0
+    for trans_row, meta_row in izip(trans_reader, meta_reader):
+        _write_row_into_ods(ods, TRANS_SHEET, trans_row)
+        _write_row_into_ods(ods, META_SHEET, meta_row)
+        count += 1
+    profiler.count('csv_rows_read', count)
+    profiler.count('ods_rows_written', count)
 
     trans_reader.close()
     meta_reader.close()
 
-    ods.save(local_ods)
+    ods.close()
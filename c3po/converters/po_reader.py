@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import codecs
+
+import polib
+
+
+# Entry fields set by keyword lines and by '#|' previous value comments
+KEYWORDS = {
+    'msgctxt': 'CT',
+    'msgid': 'MI',
+    'msgid_plural': 'MP',
+    'msgstr': 'MS',
+}
+PREVIOUS_KEYWORDS = {
+    'msgctxt': 'PC',
+    'msgid': 'PM',
+    'msgid_plural': 'PP',
+}
+
+# Fields extended by continuation lines in given state
+CONTINUED_FIELDS = {
+    'CT': 'msgctxt',
+    'MI': 'msgid',
+    'MP': 'msgid_plural',
+    'MS': 'msgstr',
+    'PC': 'previous_msgctxt',
+    'PM': 'previous_msgid',
+    'PP': 'previous_msgid_plural',
+}
+
+# After msgstr any comment or keyword starts next entry
+ENTRY_END_STATES = ('MS', 'MX')
+
+
+def _unquote(token):
+    return polib.unescape(token[1:-1])
+
+
+def _parse_occurrences(token):
+    """
+    Get list of (file, line) tuples from '#:' comment.
+    """
+    occurrences = []
+    for occurrence in token.split():
+        try:
+            fil, line = occurrence.split(':')
+            if not line.isdigit():
+                fil = fil + line
+                line = ''
+            occurrences.append((fil, line))
+        except ValueError:
+            occurrences.append((occurrence, ''))
+    return occurrences
+
+
+class _EntryParser(object):
+    """
+    State machine building entries from lines of po file. States are the
+    same as in polib parser, so parsed values don't differ. Finished
+    entries are collected in entries list, which is emptied by caller
+    after every line.
+    """
+
+    def __init__(self, po_file_path):
+        self.po_file_path = po_file_path
+        self.entries = []
+        self.header = ''
+        self.entry = polib.POEntry()
+        self.state = 'ST'
+        self.obsolete = 0
+        self.msgstr_index = None
+
+    def _syntax_error(self, linenum):
+        return IOError('Syntax error in po file %s (line %s)'
+                       % (self.po_file_path, linenum))
+
+    def _next_entry(self):
+        """
+        Finish current entry if its msgstr was already read.
+        """
+        if self.state in ENTRY_END_STATES:
+            self.entries.append(self.entry)
+            self.entry = polib.POEntry()
+
+    def feed(self, line, linenum):
+        """
+        Process one line of po file.
+        """
+        line = line.strip()
+        if not line:
+            return
+        tokens = line.split(None, 2)
+
+        if tokens[0] == '#~|':
+            return
+        if tokens[0] == '#~' and len(tokens) > 1:
+            line = line[3:].strip()
+            tokens = tokens[1:]
+            self.obsolete = 1
+        else:
+            self.obsolete = 0
+
+        if tokens[0] in KEYWORDS and len(tokens) > 1:
+            self._keyword(KEYWORDS[tokens[0]],
+                          line[len(tokens[0]):].lstrip())
+        elif tokens[0] == '#:':
+            if len(tokens) > 1:
+                self._next_entry()
+                self.entry.occurrences += _parse_occurrences(line[3:])
+                self.state = 'OC'
+        elif line[:1] == '"':
+            self._continuation(_unquote(line), linenum)
+        elif line[:7] == 'msgstr[':
+            if self.state not in ('MI', 'MP', 'MX', 'TC'):
+                raise self._syntax_error(linenum)
+            index, value = line[7:].split(']', 1)
+            self.msgstr_index = index
+            self.entry.msgstr_plural[index] = _unquote(value.strip())
+            self.state = 'MX'
+        elif tokens[0] == '#,':
+            if len(tokens) > 1:
+                self._next_entry()
+                self.entry.flags += line[3:].split(', ')
+                self.state = 'FL'
+        elif tokens[0] == '#' or tokens[0].startswith('##'):
+            self._translator_comment(line)
+        elif tokens[0] == '#.':
+            if len(tokens) > 1:
+                self._next_entry()
+                if self.entry.comment != '':
+                    self.entry.comment += '\n'
+                self.entry.comment += line[3:]
+                self.state = 'GC'
+        elif tokens[0] == '#|':
+            self._previous(line[2:].lstrip(), tokens, linenum)
+        else:
+            raise self._syntax_error(linenum)
+
+    def _keyword(self, state, token):
+        if state in ('MP', 'MS'):
+            # plural and translation belong to msgid read before
+            setattr(self.entry, CONTINUED_FIELDS[state], _unquote(token))
+        else:
+            self._next_entry()
+            if state == 'MI':
+                self.entry.obsolete = self.obsolete
+            setattr(self.entry, CONTINUED_FIELDS[state], _unquote(token))
+        self.state = state
+
+    def _continuation(self, token, linenum):
+        if self.state == 'MX':
+            self.entry.msgstr_plural[self.msgstr_index] += token
+        elif self.state in CONTINUED_FIELDS:
+            if self.state in ('PC', 'PM', 'PP'):
+                # polib drops three first characters of continued previous
+                # values, keep values the same as it parses them
+                token = token[3:]
+            field = CONTINUED_FIELDS[self.state]
+            setattr(self.entry, field, getattr(self.entry, field) + token)
+        else:
+            raise self._syntax_error(linenum)
+
+    def _translator_comment(self, line):
+        if self.state in ('ST', 'HE'):
+            # comments on top of the file are header of po file
+            if self.header != '':
+                self.header += '\n'
+            self.header += line[2:]
+            self.state = 'HE'
+            return
+        self._next_entry()
+        tcomment = line.lstrip('#')
+        if tcomment.startswith(' '):
+            tcomment = tcomment[1:]
+        if self.entry.tcomment != '':
+            self.entry.tcomment += '\n'
+        self.entry.tcomment += tcomment
+        self.state = 'TC'
+
+    def _previous(self, line, tokens, linenum):
+        if len(tokens) < 2:
+            raise self._syntax_error(linenum)
+        if tokens[1].startswith('"'):
+            self._continuation(_unquote(line), linenum)
+            return
+        if len(tokens) == 2 or tokens[1] not in PREVIOUS_KEYWORDS:
+            raise self._syntax_error(linenum)
+        self._next_entry()
+        state = PREVIOUS_KEYWORDS[tokens[1]]
+        setattr(self.entry, CONTINUED_FIELDS[state],
+                _unquote(line[len(tokens[1]):].lstrip()))
+        self.state = state
+
+    def close(self):
+        """
+        Finish last entry of the file.
+        """
+        if self.state not in ('ST', 'HE'):
+            self.entries.append(self.entry)
+
+
+def _parse_metadata(msgstr):
+    """
+    Get dict of po file metadata from msgstr of header entry.
+    """
+    metadata = {}
+    key = None
+    for line in msgstr.splitlines():
+        try:
+            key, value = line.split(':', 1)
+            metadata[key] = value.strip()
+        except ValueError:
+            if key is not None:
+                metadata[key] += '\n' + line.strip()
+    return metadata
+
+
+class POReader(object):
+    """
+    Po file parsed line by line while its entries are iterated, only entry
+    being parsed is kept in memory. Header entry isn't yielded. Attributes
+    of po file (encoding, header, metadata) are the same as on polib.POFile
+    once all entries were iterated.
+    """
+
+    def __init__(self, po_file_path):
+        self.fpath = po_file_path
+        self.encoding = polib.detect_encoding(po_file_path)
+        self.header = ''
+        self.metadata = {}
+        self.metadata_is_fuzzy = 0
+
+    def _open(self):
+        try:
+            return codecs.open(self.fpath, 'rU', self.encoding)
+        except LookupError:
+            self.encoding = polib.default_encoding
+            return codecs.open(self.fpath, 'rU', self.encoding)
+
+    def _iter_entries(self):
+        """
+        Yield all entries of po file as soon as they are parsed.
+        """
+        parser = _EntryParser(self.fpath)
+        po_file = self._open()
+        try:
+            for linenum, line in enumerate(po_file, 1):
+                parser.feed(line, linenum)
+                while parser.entries:
+                    yield parser.entries.pop()
+            parser.close()
+            while parser.entries:
+                yield parser.entries.pop()
+        finally:
+            po_file.close()
+        self.header = parser.header
+
+    def __iter__(self):
+        header_found = False
+        for entry in self._iter_entries():
+            if not header_found and entry.msgid == '' and not entry.obsolete:
+                header_found = True
+                self.metadata = _parse_metadata(entry.msgstr)
+                self.metadata_is_fuzzy = entry.flags
+                continue
+            yield entry
+
+
+def iter_po_entries(po_file_path):
+    """
+    Parse po file line by line and yield its entries in order, without
+    the header entry. Used instead of polib.pofile when whole catalog
+    isn't needed. Entries have the same values as entries of polib.pofile.
+    :param po_file_path: path to po file
+    """
+    return iter(POReader(po_file_path))
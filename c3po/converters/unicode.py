@@ -6,6 +6,46 @@ import cStringIO
 import csv
 
 
+# Size of buffer used for files opened by readers and writers
+BUFFER_SIZE = 64 * 1024
+
+
+def _open(file_path, mode):
+    """
+    Open file at given path or return given file object. Second value says
+    whether the file is owned by caller and should be closed with reader
+    or writer.
+    """
+    if hasattr(file_path, 'read') or hasattr(file_path, 'write'):
+        return file_path, False
+    return open(file_path, mode, BUFFER_SIZE), True
+
+
+def _is_utf8(encoding):
+    return codecs.lookup(encoding).name == 'utf-8'
+
+
+def _encode_row(row):
+    """
+    Encode all cells with one encode call, cells are joined with NUL
+    character which csv module doesn't allow inside values.
+    """
+    cells = u'\0'.join(row).encode("utf-8").split('\0')
+    if len(cells) != len(row):
+        cells = [s.encode("utf-8") for s in row]
+    return cells
+
+
+def _decode_row(row):
+    """
+    Decode all cells with one decode call, see _encode_row.
+    """
+    cells = '\0'.join(row).decode("utf-8").split(u'\0')
+    if len(cells) != len(row):
+        cells = [s.decode("utf-8") for s in row]
+    return cells
+
+
 class UTF8Recoder(object):
     """
     Iterator that reads an encoded stream and reencodes the input to UTF-8
@@ -23,55 +63,75 @@ class UTF8Recoder(object):
 class UnicodeReader(object):
     """
     A CSV reader which will iterate over lines in the CSV file "f",
-    which is encoded in the given encoding.
+    which is encoded in the given encoding. File can be given as path
+    or as file object, which is left open by close().
+    UTF-8 files are parsed directly and every row is decoded at once,
+    other encodings are recoded to UTF-8 first.
     """
 
     def __init__(self, file_path, dialect=csv.excel,
                  encoding="utf-8", **kwargs):
-        self.file = open(file_path, 'rb')
-        recorder = UTF8Recoder(self.file, encoding)
-        self.reader = csv.reader(recorder, dialect=dialect, **kwargs)
+        self.file, self.owns_file = _open(file_path, 'rb')
+        if _is_utf8(encoding):
+            source = self.file
+        else:
+            source = UTF8Recoder(self.file, encoding)
+        self.reader = csv.reader(source, dialect=dialect, **kwargs)
 
     def next(self):
-        row = self.reader.next()
-        return [unicode(s, "utf-8") for s in row]
+        return _decode_row(self.reader.next())
 
     def __iter__(self):
         return self
 
     def close(self):
-        self.file.close()
+        if self.owns_file:
+            self.file.close()
 
 
 class UnicodeWriter(object):
     """
     A CSV writer which will write rows to CSV file "f",
-    which is encoded in the given encoding.
+    which is encoded in the given encoding. File can be given as path
+    or as file object, which is left open by close().
+    UTF-8 rows are written straight into buffered stream. For other
+    encodings rows go through a queue which is recoded once per writerow
+    or writerows call.
     """
 
     def __init__(self, file_path, dialect=csv.excel,
                  encoding="utf-8", **kwargs):
-        # Redirect output to a queue
-        self.queue = cStringIO.StringIO()
-        self.writer = csv.writer(self.queue, dialect=dialect, **kwargs)
-        self.stream = open(file_path, 'wb')
-        self.encoder = codecs.getincrementalencoder(encoding)()
+        self.stream, self.owns_stream = _open(file_path, 'wb')
+        if _is_utf8(encoding):
+            self.queue = None
+            self.writer = csv.writer(self.stream, dialect=dialect, **kwargs)
+        else:
+            # Redirect output to a queue
+            self.queue = cStringIO.StringIO()
+            self.writer = csv.writer(self.queue, dialect=dialect, **kwargs)
+            self.encoder = codecs.getincrementalencoder(encoding)()
+
+    def _flush_queue(self):
+        """
+        Reencode UTF-8 output from the queue into the target encoding,
+        write it to the target stream and empty the queue.
+        """
+        data = self.queue.getvalue().decode("utf-8")
+        self.stream.write(self.encoder.encode(data))
+        self.queue.truncate(0)
 
     def writerow(self, row):
-        self.writer.writerow([s.encode("utf-8") for s in row])
-        # Fetch UTF-8 output from the queue ...
-        data = self.queue.getvalue()
-        data = data.decode("utf-8")
-        # ... and reencode it into the target encoding
-        data = self.encoder.encode(data)
-        # write to the target stream
-        self.stream.write(data)
-        # empty queue
-        self.queue.truncate(0)
+        self.writer.writerow(_encode_row(row))
+        if self.queue is not None:
+            self._flush_queue()
 
     def writerows(self, rows):
-        for row in rows:
-            self.writerow(row)
+        self.writer.writerows(_encode_row(row) for row in rows)
+        if self.queue is not None:
+            self._flush_queue()
 
     def close(self):
-        self.stream.close()
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
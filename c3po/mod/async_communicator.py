@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import threading
+from multiprocessing import TimeoutError
+from multiprocessing.pool import RUN, ThreadPool
+
+from c3po.conf import settings
+from c3po.mod.communicator import Communicator
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return pool of ASYNC_WORKERS threads shared by all async communicators
+    which don't have their own executor. Pool is created on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPool(settings.ASYNC_WORKERS)
+        return _executor
+
+
+def shutdown_executor():
+    """
+    Wait for commands running in shared pool and stop its threads.
+    Commands queued by communicators after them are run in new pool.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.close()
+        executor.join()
+
+
+class CommandResult(object):
+    """
+    Result of command scheduled by AsyncCommunicator, with the interface of
+    multiprocessing.pool.AsyncResult.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.event = threading.Event()
+        self.success = None
+        self.value = None
+
+    def ready(self):
+        return self.event.is_set()
+
+    def successful(self):
+        assert self.ready()
+        return self.success
+
+    def wait(self, timeout=None):
+        self.event.wait(timeout)
+
+    def get(self, timeout=None):
+        """
+        Wait for command and return its result, or raise its exception.
+        :except: raises multiprocessing.TimeoutError if command didn't
+                 finish in timeout seconds
+        """
+        self.wait(timeout)
+        if not self.ready():
+            raise TimeoutError
+        if self.success:
+            return self.value
+        raise self.value
+
+    def _set(self, success, value):
+        self.success = success
+        self.value = value
+        try:
+            if self.callback is not None and success:
+                self.callback(value)
+        finally:
+            self.event.set()
+
+
+class AsyncCommunicator(object):
+    """
+    Non-blocking variant of Communicator. Commands return at once with
+    CommandResult, while login, requests and conversions run in pool of
+    worker threads, so one thread can drive synchronization of many
+    spreadsheets. Commands of one communicator are run one after another
+    in order they were called.
+    """
+
+    def __init__(self, executor=None, **kwargs):
+        """
+        :param executor: multiprocessing.pool.ThreadPool running commands,
+                         by default pool shared by all async communicators
+        :param kwargs: arguments of Communicator, created in worker thread
+                       when first command is run, in in-memory mode unless
+                       in_memory is given
+        """
+        # commands of many communicators run concurrently, so they can't
+        # share files in temp_path
+        kwargs.setdefault('in_memory', True)
+        self.executor = executor
+        self.kwargs = kwargs
+        self.communicator = None
+        self.lock = threading.Lock()
+        self.queue = collections.deque()
+        self.running = False
+
+    def _schedule(self):
+        """
+        Put the oldest queued command into executor.
+        """
+        executor = self.executor or get_executor()
+        error = ValueError('Pool not running')
+        scheduled = False
+        try:
+            # apply_async of closed pool fails only on assertion, which is
+            # skipped with -O, so pool state is checked first
+            if executor._state == RUN:
+                executor.apply_async(self._run_next)
+                scheduled = True
+        except (AssertionError, ValueError) as e:
+            error = e
+        finally:
+            if not scheduled:
+                # queued commands can't be run, fail them so nobody waits
+                with self.lock:
+                    queued, self.queue = self.queue, collections.deque()
+                    self.running = False
+                for command, result in queued:
+                    result._set(False, error)
+
+    def _run_next(self):
+        """
+        Run the oldest queued command. Next command is put into executor
+        only when this one finished, so queued commands don't keep worker
+        threads waiting and commands of other communicators aren't blocked.
+        """
+        with self.lock:
+            command, result = self.queue.popleft()
+        try:
+            if self.communicator is None:
+                self.communicator = Communicator(**self.kwargs)
+            value = getattr(self.communicator, command)()
+        except Exception as e:
+            result._set(False, e)
+        else:
+            result._set(True, value)
+        finally:
+            with self.lock:
+                self.running = bool(self.queue)
+                running = self.running
+            if running:
+                self._schedule()
+
+    def _submit(self, command, callback):
+        """
+        Queue command and return its CommandResult. Result's get() returns
+        None or raises exception of failed command, callback is called with
+        None when command succeeds.
+        """
+        result = CommandResult(callback)
+        with self.lock:
+            self.queue.append((command, result))
+            if self.running:
+                return result
+            self.running = True
+        self._schedule()
+        return result
+
+    def synchronize(self, callback=None):
+        """
+        Schedule Communicator.synchronize and return its CommandResult.
+        """
+        return self._submit('synchronize', callback)
+
+    def download(self, callback=None):
+        """
+        Schedule Communicator.download and return its CommandResult.
+        """
+        return self._submit('download', callback)
+
+    def upload(self, callback=None):
+        """
+        Schedule Communicator.upload and return its CommandResult.
+        """
+        return self._submit('upload', callback)
+
+    def clear(self, callback=None):
+        """
+        Schedule Communicator.clear and return its CommandResult.
+        """
+        return self._submit('clear', callback)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import BaseHTTPServer
+import cStringIO
+import socket
+import SocketServer
+import ssl
+import sys
+import threading
+import time
+import urlparse
+import zlib
+
+import atom.data
+import gdata.client
+import gdata.docs.data
+import gdata.spreadsheets.data
+
+from c3po.converters.ods import read_ods
+from c3po.converters.unicode import UnicodeReader, UnicodeWriter
+
+
+class SpreadsheetBackend(object):
+    """
+    Interface of service storing spreadsheet, used by Communicator. It's
+    the subset of gdata DocsClient and SpreadsheetsClient methods which
+    Communicator calls, so by default real gdata clients are used. Methods
+    raise gdata.client.RequestError when request fails.
+    """
+
+    def GetResourceById(self, resource_id):
+        """
+        Return spreadsheet resource entry.
+        """
+        raise NotImplementedError
+
+    def DownloadResource(self, entry, file_path, extra_params=None):
+        """
+        Save worksheet extra_params['gid'] as csv into file_path.
+        """
+        raise NotImplementedError
+
+    def DownloadResourceToMemory(self, entry, extra_params=None):
+        """
+        Return worksheet extra_params['gid'] as csv.
+        """
+        raise NotImplementedError
+
+    def request(self, method, uri, auth_token=None, http_request=None):
+        """
+        Send HTTP request and return response, used for conditional
+        downloads of worksheets export (entry.content.src) with headers of
+        http_request. auth_token overrides login token of client. Raises
+        gdata.client.NotModified for 304 response.
+        """
+        raise NotImplementedError
+
+    def UpdateResource(self, entry, media=None, update_metadata=True):
+        """
+        Replace spreadsheet content with media (ods or csv) and return
+        updated entry.
+        """
+        raise NotImplementedError
+
+    def get_worksheets(self, spreadsheet_key):
+        """
+        Return gdata.spreadsheets.data.WorksheetsFeed with all worksheets.
+        """
+        raise NotImplementedError
+
+    def update(self, entry, force=False):
+        """
+        Save changed worksheet entry, used to resize worksheet.
+        """
+        raise NotImplementedError
+
+    def batch(self, feed, force=False):
+        """
+        Execute cells batch update feed.
+        """
+        raise NotImplementedError
+
+
+class _LocalResponse(object):
+    """
+    HTTP response returned by LocalSpreadsheetBackend.request.
+    """
+
+    def __init__(self, content, headers, status=200):
+        self.status = status
+        self.content = content
+        self.headers = headers
+
+    def read(self):
+        return self.content
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+
+class LocalSpreadsheetBackend(SpreadsheetBackend):
+    """
+    In-process stand-in for GDocs keeping spreadsheet as lists of rows,
+    so Communicator can be tested and benchmarked offline. Every request
+    waits latency seconds and transfers of content are limited to
+    bandwidth bytes per second, if given. Names of all requests are
+    recorded in requests list and tokens sent with export requests in
+    auth_tokens list. Every change of spreadsheet increases its revision,
+    which is returned as etag of resource entry.
+    """
+    auth_token = None
+    alt_auth_token = None
+
+    def __init__(self, sheets=None, latency=0, bandwidth=None):
+        """
+        :param sheets: list of worksheets, each is a list of rows, by
+                       default spreadsheet has one empty worksheet. Rows
+                       are copied, so given lists are never changed.
+        :param latency: seconds added to every request
+        :param bandwidth: bytes per second for downloaded and uploaded
+                          content, None means unlimited
+        """
+        self.sheets = [[list(row) for row in rows]
+                       for rows in sheets] if sheets is not None else [[]]
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = []
+        self.sizes = {}
+        self.cells_updated = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.revision = 1
+        self.auth_tokens = []
+        self.lock = threading.Lock()
+
+    def _request(self, name, sent=0, received=0):
+        """
+        Record request and wait for its simulated duration.
+        """
+        with self.lock:
+            self.requests.append(name)
+            self.bytes_sent += sent
+            self.bytes_received += received
+        delay = self.latency
+        if self.bandwidth:
+            delay += float(sent + received) / self.bandwidth
+        if delay:
+            time.sleep(delay)
+
+    @classmethod
+    def _error(cls, status, body):
+        error = gdata.client.RequestError(
+            'Server responded with: %d, %s' % (status, body))
+        error.status = status
+        error.body = body
+        return error
+
+    def _resource(self):
+        return gdata.docs.data.Resource(
+            etag='"%d"' % self.revision,
+            content=atom.data.Content(
+                src='local://spreadsheets.local/feeds/download/spreadsheets'
+                    '/Export?key=local'))
+
+    def GetResourceById(self, resource_id):
+        self._request('GetResourceById')
+        return self._resource()
+
+    def _export(self, gid):
+        """
+        Get csv export of worksheet, exported rows have the same number
+        of cells.
+        """
+        rows = self.sheets[gid]
+        width = max([len(row) for row in rows] or [0])
+        content = cStringIO.StringIO()
+        UnicodeWriter(content).writerows(
+            list(row) + [u''] * (width - len(row)) for row in rows)
+        return content.getvalue()
+
+    def DownloadResourceToMemory(self, entry, extra_params=None):
+        gid = int(extra_params['gid'])
+        if gid >= len(self.sheets):
+            self._request('DownloadResource')
+            raise self._error(400, 'Sheet %d not found' % gid)
+        content = self._export(gid)
+        self._request('DownloadResource', sent=len(content))
+        return content
+
+    def request(self, method, uri, auth_token=None, http_request=None):
+        self.auth_tokens.append(auth_token or self.auth_token)
+        query = urlparse.parse_qs(urlparse.urlparse(uri).query)
+        gid = int(query['gid'][0])
+        if gid >= len(self.sheets):
+            self._request('DownloadResource')
+            raise self._error(400, 'Sheet %d not found' % gid)
+        # worksheet changes only together with revision of spreadsheet
+        etag = '"%d-%d"' % (self.revision, gid)
+        headers = http_request.headers if http_request is not None else {}
+        if headers.get('If-None-Match') == etag:
+            self._request('DownloadResource')
+            error = gdata.client.NotModified(
+                'Server responded with: 304, Not Modified')
+            error.status = 304
+            error.body = ''
+            raise error
+        content = self._export(gid)
+        self._request('DownloadResource', sent=len(content))
+        return _LocalResponse(content, {'ETag': etag})
+
+    def DownloadResource(self, entry, file_path, extra_params=None):
+        content = self.DownloadResourceToMemory(entry, extra_params)
+        with open(file_path, 'wb') as csv_file:
+            csv_file.write(content)
+
+    def UpdateResource(self, entry, media=None, update_metadata=True):
+        content = media.file_handle.read()
+        self._request('UpdateResource', received=len(content))
+        if media.content_type == 'text/csv':
+            self.sheets = [list(UnicodeReader(cStringIO.StringIO(content)))]
+        else:
+            self.sheets = [rows for name, rows
+                           in read_ods(cStringIO.StringIO(content))]
+        self.sizes = {}
+        self.revision += 1
+        return self._resource()
+
+    def get_worksheets(self, spreadsheet_key):
+        self._request('GetWorksheets')
+        feed = gdata.spreadsheets.data.WorksheetsFeed()
+        for i, rows in enumerate(self.sheets):
+            worksheet_id = 'ws%d' % i
+            if worksheet_id not in self.sizes:
+                self.sizes[worksheet_id] = (
+                    len(rows), max([len(row) for row in rows] or [0]))
+            rows_count, cols_count = self.sizes[worksheet_id]
+            feed.entry.append(gdata.spreadsheets.data.WorksheetEntry(
+                id=atom.data.Id(
+                    text='https://spreadsheets.google.com/feeds/worksheets/'
+                         '%s/%s' % (spreadsheet_key, worksheet_id)),
+                row_count=gdata.spreadsheets.data.RowCount(
+                    text=str(rows_count)),
+                col_count=gdata.spreadsheets.data.ColCount(
+                    text=str(cols_count))))
+        return feed
+
+    def update(self, entry, force=False):
+        self._request('UpdateWorksheet')
+        self.sizes[entry.get_worksheet_id()] = (int(entry.row_count.text),
+                                                int(entry.col_count.text))
+        return entry
+
+    def batch(self, feed, force=False):
+        self._request('Batch', received=len(feed.to_string()))
+        worksheet_id = feed.id.text.split('/')[-3]
+        rows = self.sheets[int(worksheet_id[2:])]
+        rows_count, cols_count = self.sizes[worksheet_id]
+        for entry in feed.entry:
+            row, col = int(entry.cell.row), int(entry.cell.col)
+            if row > rows_count or col > cols_count:
+                raise self._error(400, 'Cell R%dC%d out of range'
+                                  % (row, col))
+            while len(rows) < row:
+                rows.append([])
+            while len(rows[row - 1]) < col:
+                rows[row - 1].append(u'')
+            value = entry.cell.input_value
+            rows[row - 1][col - 1] = value[1:] if value.startswith("'") \
+                else value
+            self.cells_updated += 1
+        self.revision += 1
+        return gdata.spreadsheets.data.CellsFeed()
+
+
+class _LocalHttpHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        # idle keep-alive connection is closed after timeout
+        self.timeout = self.server.idle_timeout
+        if self.server.certfile:
+            self.request.do_handshake()
+        self.server.opened_connection()
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+    def _respond(self):
+        length = int(self.headers.getheader('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        gzip = self.server.gzip \
+            and 'gzip' in (self.headers.getheader('Accept-Encoding') or '')
+        content = self.server.get_content(gzip)
+        delay = self.server.latency
+        if self.server.bandwidth:
+            delay += float(length + len(content)) / self.server.bandwidth
+        if delay:
+            time.sleep(delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(content)))
+        if gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        if self.server.close_connections:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHttpServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    HTTP/1.1 server running in background thread, which answers every
+    request with the same content. Used to test and benchmark connections
+    of gdata clients offline, opened connections are counted. Given
+    certfile, it's HTTPS server. Transfers of request and response bodies
+    are limited to bandwidth bytes per second, if given.
+    """
+    daemon_threads = True
+
+    def __init__(self, content='', latency=0, certfile=None,
+                 idle_timeout=None, close_connections=False, gzip=False,
+                 bandwidth=None):
+        """
+        :param content: body of every response
+        :param latency: seconds waited before every response
+        :param bandwidth: bytes per second of bodies, None means unlimited
+        :param certfile: path to PEM file with certificate and private key
+        :param idle_timeout: seconds after which idle connection is closed
+        :param close_connections: if True, server closes connection after
+                                  every response
+        :param gzip: if True, content is gzip compressed for clients
+                     accepting it
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           _LocalHttpHandler)
+        self.content = content
+        self.latency = latency
+        self.certfile = certfile
+        self.idle_timeout = idle_timeout
+        self.close_connections = close_connections
+        self.gzip = gzip
+        self.bandwidth = bandwidth
+        self.compressed = None
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def url(self):
+        return '%s://127.0.0.1:%d/' % ('https' if self.certfile else 'http',
+                                       self.server_address[1])
+
+    def get_request(self):
+        connection, address = self.socket.accept()
+        if self.certfile:
+            # handshake is done in thread handling connection
+            connection = ssl.wrap_socket(connection, server_side=True,
+                                         certfile=self.certfile,
+                                         do_handshake_on_connect=False)
+        return connection, address
+
+    def get_content(self, gzip=False):
+        """
+        Get body of response, gzip compressed if needed.
+        """
+        if not gzip:
+            return self.content
+        with self.lock:
+            if self.compressed is None or self.compressed[0] != self.content:
+                compressor = zlib.compressobj(6, zlib.DEFLATED,
+                                              16 + zlib.MAX_WBITS)
+                self.compressed = (self.content,
+                                   compressor.compress(self.content) +
+                                   compressor.flush())
+            return self.compressed[1]
+
+    def opened_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def handle_error(self, request, client_address):
+        # clients can drop connections without closing them cleanly
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(self, request,
+                                                   client_address)
+
+    def stop(self):
+        """
+        Stop serving and close listening socket.
+        """
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+from multiprocessing.pool import ThreadPool
+
+from c3po.conf import settings
+from c3po.mod.communicator import Communicator, PODocsError
+
+
+BATCH_COMMANDS = ('synchronize', 'download', 'upload', 'clear')
+
+# Manifest fields passed to Communicator of a job
+JOB_FIELDS = ('url', 'locale_root', 'po_files_path', 'languages', 'header')
+
+
+def load_manifest(manifest_path):
+    """
+    Read list of jobs from JSON manifest file. Every job is an object with
+    url and optional locale_root, po_files_path, languages, header and
+    command (synchronize by default), missing values are taken from
+    settings. Relative locale_root is relative to manifest directory.
+    :except: raises PODocsError if manifest can't be read
+    """
+    try:
+        with open(manifest_path, 'rb') as manifest_file:
+            jobs = json.load(manifest_file)
+    except (IOError, ValueError) as e:
+        raise PODocsError(e)
+    if not isinstance(jobs, list):
+        raise PODocsError('Manifest %s is not a list of jobs' % manifest_path)
+
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    for i, job in enumerate(jobs):
+        if not isinstance(job, dict) or not job.get('url'):
+            raise PODocsError('Job %d of manifest %s has no url'
+                              % (i, manifest_path))
+        if job.get('command', 'synchronize') not in BATCH_COMMANDS:
+            raise PODocsError('Job %d of manifest %s has unknown command %s'
+                              % (i, manifest_path, job['command']))
+        if job.get('locale_root'):
+            job['locale_root'] = os.path.join(manifest_dir,
+                                              job['locale_root'])
+    return jobs
+
+
+def _run_job(job, backend=None):
+    """
+    Run command of one job and return its result. Errors are stored in
+    result instead of being raised, so other jobs aren't stopped.
+    """
+    command = job.get('command', 'synchronize')
+    result = {'url': job['url'], 'locale_root': job.get('locale_root'),
+              'command': command, 'status': 'ok', 'error': None}
+    start = time.time()
+    com = None
+    try:
+        # jobs run concurrently, so they can't share files in temp_path
+        kwargs = dict((field, job[field]) for field in JOB_FIELDS
+                      if job.get(field) is not None)
+        com = Communicator(in_memory=True, backend=backend, **kwargs)
+        getattr(com, command)()
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = '%s: %s' % (e.__class__.__name__, e)
+    result['wall'] = time.time() - start
+    if com is not None:
+        result['requests'] = len(com.network_timings)
+        result['network_wall'] = com.network_wall_time()
+    return result
+
+
+def run_batch(jobs, workers=None, backends=None):
+    """
+    Run jobs in pool of worker threads and return list of their results in
+    order of jobs. Jobs log in with the same account, so they share one
+    authenticated client. Result of a job is dict with url, locale_root,
+    command, status ('ok' or 'failed'), error, wall time of the job and
+    number and network wall time of its requests.
+    :param jobs: list of jobs, as returned by load_manifest
+    :param workers: number of jobs run at once, defaults to BATCH_WORKERS
+                    setting
+    :param backends: optional list of SpreadsheetBackend objects, one for
+                     every job, used instead of GDocs
+    """
+    if workers is None:
+        workers = settings.BATCH_WORKERS
+    if backends is None:
+        backends = [None] * len(jobs)
+    tasks = zip(jobs, backends)
+    if not tasks:
+        return []
+
+    pool = ThreadPool(max(1, min(workers, len(tasks))))
+    try:
+        return pool.map(lambda task: _run_job(*task), tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def format_results(results):
+    """
+    Get text table with status and timings of every job.
+    """
+    lines = ['%-8s %-12s %8s %8s  %s' % ('status', 'command', 'seconds',
+                                         'requests', 'url')]
+    for result in results:
+        lines.append('%-8s %-12s %8.2f %8s  %s' % (
+            result['status'], result['command'], result['wall'],
+            result.get('requests', '-'), result['url']))
+        if result['error']:
+            lines.append('         %s' % result['error'])
+    return '\n'.join(lines)
@@ -1,21 +1,37 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*
 
+import cStringIO
 import os
 import subprocess
+import threading
+import time
+import urllib
 import urlparse
+from contextlib import contextmanager
 from subprocess import Popen, PIPE
 
+import atom.http_core
 import gdata.spreadsheet.service
 import gdata.docs.client
 import gdata.docs.data
 import gdata.data
 import gdata.docs.service
-from gdata.client import RequestError
+import gdata.spreadsheets.client
+import gdata.spreadsheets.data
+from gdata.client import NotModified, RequestError
 
 from c3po.conf import settings
+from c3po.converters.catalog import catalog_cache
+from c3po.converters.delta import sheet_delta
 from c3po.converters.po_csv import csv_to_po, po_to_csv_merge
-from c3po.converters.po_ods import po_to_ods, csv_to_ods
+from c3po.converters.po_ods import po_to_ods, po_to_rows, csv_to_ods
+from c3po.converters.unicode import UnicodeReader
+from c3po.mod.export_cache import ExportCache
+from c3po.mod.http_pool import PooledHttpClient
+from c3po.mod.session import session_cache
+from c3po.mod.sync_state import local_fingerprint, remote_revision, sync_state
+from c3po.profiler import profiler
 
 
 LOCAL_ODS = 'local.ods'
@@ -24,6 +40,11 @@ GDOCS_META_CSV = 'c3po_gdocs_meta.csv'
 LOCAL_TRANS_CSV = 'c3po_local_trans.csv'
 LOCAL_META_CSV = 'c3po_local_meta.csv'
 
+ODS_CONTENT_TYPE = 'application/x-vnd.oasis.opendocument.spreadsheet'
+
+# Maximal number of cells changed by one batch request in delta upload
+CELLS_BATCH_SIZE = 1000
+
 
 class PODocsError(Exception):
     pass
@@ -53,10 +74,20 @@ class Communicator(object):
     locale_root = None
     po_files_path = None
     header = None
+    incremental_write = None
+    in_memory = None
+    delta_upload = None
+    streaming_merge = None
+    compile_mo = None
+    sheets_client = None
+    resource = None
+    network_timings = None
 
     def __init__(self, email=None, password=None, url=None, source=None,
                  temp_path=None, languages=None, locale_root=None,
-                 po_files_path=None, header=None):
+                 po_files_path=None, header=None, incremental_write=None,
+                 in_memory=None, delta_upload=None, streaming_merge=None,
+                 compile_mo=None, backend=None):
         """
         Initialize object with all necessary client information and log in
         :param email: user gmail account address
@@ -70,28 +101,101 @@ class Communicator(object):
         :param po_files_path: path from lang directory to po file
         :param header: header which will be put on top of every po file when
                        downloading
+        :param incremental_write: if True, only po files whose content
+                                  changed are rewritten when downloading
+        :param in_memory: if True, downloaded sheets, merged csv and ods are
+                          kept in memory buffers instead of temp_path files
+        :param delta_upload: if True, only changed cells are sent to GDocs
+                             instead of uploading whole spreadsheet
+        :param streaming_merge: if True, po files are merged with
+                                spreadsheet entry by entry, without
+                                keeping whole catalogs in memory
+        :param compile_mo: if True, mo files are compiled next to po files
+                           written when downloading
+        :param backend: object implementing SpreadsheetBackend used instead
+                        of logging into GDocs, e.g. LocalSpreadsheetBackend
         """
         construct_vars = ('email', 'password', 'url', 'source', 'temp_path',
-                          'languages', 'locale_root', 'po_files_path', 'header')
+                          'languages', 'locale_root', 'po_files_path', 'header',
+                          'incremental_write', 'in_memory', 'delta_upload',
+                          'streaming_merge', 'compile_mo')
         for cv in construct_vars:
             if locals().get(cv) is None:
                 setattr(self, cv, getattr(settings, cv.upper()))
             else:
                 setattr(self, cv, locals().get(cv))
-        self._login()
+        self._start_operation()
+        if backend is None:
+            self._login()
+        else:
+            self.gd_client = self.sheets_client = backend
         self._get_gdocs_key()
         self._ensure_temp_path_exists()
 
+    def _start_operation(self):
+        """
+        Forget resource entry and timings of previous operation.
+        """
+        self.resource = None
+        self.network_timings = []
+        self.operation_start = time.time()
+
+    @contextmanager
+    def _timed(self, name):
+        """
+        Record start and end of network request, relative to the beginning
+        of current operation, in network_timings list. Time of requests is
+        also summed up in profiler stage named after the request method.
+        """
+        start = time.time()
+        profiler.count('requests')
+        try:
+            with profiler.stage('request:' + name.split()[0]):
+                yield
+        finally:
+            self.network_timings.append((name,
+                                         start - self.operation_start,
+                                         time.time() - self.operation_start))
+
+    def network_wall_time(self):
+        """
+        Return time the last operation spent waiting for network, which is
+        length of its network critical path: requests running concurrently
+        are counted once.
+        """
+        total = 0.0
+        covered_until = None
+        for name, start, end in sorted(self.network_timings,
+                                       key=lambda t: t[1]):
+            if covered_until is not None and start < covered_until:
+                start = covered_until
+            if end > start:
+                total += end - start
+                covered_until = end
+        return total
+
     def _login(self):
         """
         Login into Google Docs with user authentication info.
+        Client already authenticated with the same info is reused.
         """
         try:
-            self.gd_client = gdata.docs.client.DocsClient()
-            self.gd_client.ClientLogin(self.email, self.password, self.source)
+            with profiler.stage('login'):
+                self.gd_client = session_cache.get_client(
+                    self.email, self.password, self.source)
         except RequestError as e:
             raise PODocsError(e)
 
+    def _request_error(self, e):
+        """
+        Convert error of GDocs request into PODocsError. If login token
+        was rejected, it's dropped so next Communicator logs in again.
+        """
+        if getattr(e, 'status', None) in (401, 403):
+            session_cache.invalidate(self.email, self.password,
+                                     self.source)
+        return PODocsError(e)
+
     def _get_gdocs_key(self):
         """
         Parse GDocs key from Spreadsheet url.
@@ -115,8 +219,13 @@ class Communicator(object):
     def _clear_temp(self):
         """
         Clear temp directory from created csv and ods files during
-        communicator operations.
+        communicator operations and drop po files of locale_root parsed by
+        converters. In in-memory mode temp_path isn't touched, it can be
+        used by other communicators at the same time.
         """
+        catalog_cache.invalidate_tree(self.locale_root)
+        if self.in_memory:
+            return
         temp_files = [LOCAL_ODS, GDOCS_TRANS_CSV, GDOCS_META_CSV,
                       LOCAL_TRANS_CSV, LOCAL_META_CSV]
         for temp_file in temp_files:
@@ -124,45 +233,262 @@ class Communicator(object):
             if os.path.exists(file_path):
                 os.remove(file_path)
 
+    def _temp_target(self, filename):
+        """
+        Get place for intermediate file of an operation: memory buffer in
+        in-memory mode, otherwise path of the file in temp_path.
+        """
+        if self.in_memory:
+            return cStringIO.StringIO()
+        return os.path.join(self.temp_path, filename)
+
+    @classmethod
+    def _read_target(cls, target):
+        """
+        Prepare intermediate file written by previous stage for reading.
+        """
+        if isinstance(target, basestring):
+            return target
+        return cStringIO.StringIO(target.getvalue())
+
+    @classmethod
+    def _media_source(cls, target, content_type):
+        """
+        Get MediaSource with content of intermediate file.
+        """
+        if isinstance(target, basestring):
+            media = gdata.data.MediaSource(file_path=target,
+                                           content_type=content_type)
+        else:
+            content = target.getvalue()
+            media = gdata.data.MediaSource(
+                file_handle=cStringIO.StringIO(content),
+                content_type=content_type, content_length=len(content))
+        profiler.count('bytes_uploaded', media.content_length)
+        return media
+
+    def _get_resource(self):
+        """
+        Get spreadsheet resource entry. It's fetched once and reused by all
+        requests made during an operation.
+        """
+        if self.resource is None:
+            with self._timed('GetResourceById'):
+                self.resource = self.gd_client.GetResourceById(self.key)
+        return self.resource
+
+    def _update_resource(self, media):
+        """
+        Replace spreadsheet content with media and keep updated entry.
+        """
+        with self._timed('UpdateResource'):
+            self.resource = self.gd_client.UpdateResource(
+                self._get_resource(), media=media, update_metadata=True)
+
+    def _export_sheet(self, entry, extra_params):
+        """
+        Get csv export of worksheet with conditional request, sending
+        validators of its copy in EXPORT_CACHE_PATH. If server answers
+        that worksheet wasn't modified, cached copy is returned.
+        :return: tuple with csv content and False if it's cached copy
+        """
+        cache = ExportCache(settings.EXPORT_CACHE_PATH)
+        cached = cache.get(self.key, extra_params['gid'])
+        headers = ExportCache.conditional_headers(cached[1]) if cached else {}
+        uri = '%s&%s' % (entry.content.src.replace('&amp;', '&'),
+                         urllib.urlencode(extra_params))
+        # like DocsClient, export of spreadsheet is authorized with token
+        # of spreadsheets service
+        auth_token = None
+        if 'spreadsheets' in uri:
+            auth_token = getattr(self.gd_client, 'alt_auth_token', None)
+        try:
+            response = self.gd_client.request(
+                'GET', uri, auth_token=auth_token,
+                http_request=atom.http_core.HttpRequest(headers=headers))
+        except NotModified:
+            if cached is None:
+                raise
+            profiler.count('exports_not_modified')
+            return cached[0], False
+
+        content = response.read()
+        cache.store(self.key, extra_params['gid'], content,
+                    etag=response.getheader('ETag'),
+                    last_modified=response.getheader('Last-Modified'))
+        return content, True
+
+    def _download_sheet(self, entry, gid, csv_target, errors):
+        """
+        Download one worksheet as csv into file or memory buffer. Errors are
+        put into errors dict under worksheet gid, so it can be run in
+        separate thread.
+        """
+        extra_params = {'gid': gid, 'exportFormat': 'csv'}
+        try:
+            with self._timed('DownloadResource gid=%d' % gid):
+                if settings.EXPORT_CACHE_PATH:
+                    content, modified = self._export_sheet(entry,
+                                                           extra_params)
+                    if isinstance(csv_target, basestring):
+                        with open(csv_target, 'wb') as csv_file:
+                            csv_file.write(content)
+                    else:
+                        csv_target.write(content)
+                    size = len(content) if modified else 0
+                elif isinstance(csv_target, basestring):
+                    self.gd_client.DownloadResource(
+                        entry, csv_target, extra_params=extra_params)
+                    size = os.path.getsize(csv_target)
+                else:
+                    content = self.gd_client.DownloadResourceToMemory(
+                        entry, extra_params=extra_params)
+                    csv_target.write(content)
+                    size = len(content)
+            profiler.count('bytes_downloaded', size)
+        except (RequestError, IOError) as e:
+            errors[gid] = e
+
     def _download_csv_from_gdocs(self, trans_csv_path, meta_csv_path):
         """
-        Download csv from GDoc.
+        Download csv from GDoc into files or memory buffers. Translations
+        and metadata worksheets are downloaded concurrently.
         :return: returns resource if worksheets are present
         :except: raises PODocsError with info if communication
                  with GDocs lead to any errors
         """
         try:
-            entry = self.gd_client.GetResourceById(self.key)
-            self.gd_client.DownloadResource(
-                entry, trans_csv_path,
-                extra_params={'gid': 0, 'exportFormat': 'csv'}
-            )
-            self.gd_client.DownloadResource(
-                entry, meta_csv_path,
-                extra_params={'gid': 1, 'exportFormat': 'csv'}
-            )
-        except (RequestError, IOError) as e:
+            entry = self._get_resource()
+        except RequestError as e:
+            raise self._request_error(e)
+
+        errors = {}
+        threads = [
+            threading.Thread(target=self._download_sheet,
+                             args=(entry, gid, csv_path, errors))
+            for gid, csv_path in enumerate((trans_csv_path, meta_csv_path))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            e = errors[min(errors)]
+            if isinstance(e, RequestError):
+                raise self._request_error(e)
             raise PODocsError(e)
         return entry
 
-    def _upload_file_to_gdoc(
-            self, file_path,
-            content_type='application/x-vnd.oasis.opendocument.spreadsheet'):
+    def _upload_file_to_gdoc(self, file_path, content_type=ODS_CONTENT_TYPE):
         """
-        Uploads file to GDocs spreadsheet.
+        Uploads file or memory buffer to GDocs spreadsheet.
         Content type can be provided as argument, default is ods.
         """
         try:
-            entry = self.gd_client.GetResourceById(self.key)
-            media = gdata.data.MediaSource(
-                file_path=file_path, content_type=content_type)
-            self.gd_client.UpdateResource(
-                entry, media=media, update_metadata=True)
-        except (RequestError, IOError) as e:
+            self._update_resource(self._media_source(file_path, content_type))
+        except RequestError as e:
+            raise self._request_error(e)
+        except IOError as e:
             raise PODocsError(e)
 
-    def _merge_local_and_gdoc(self, entry, local_trans_csv,
-                              local_meta_csv, gdocs_trans_csv, gdocs_meta_csv):
+    def _get_sheets_client(self):
+        """
+        Get Spreadsheets API client using login token of spreadsheets
+        service, which Docs client keeps as alt_auth_token. Returns None if
+        Docs client has no such token, so cells can't be updated.
+        """
+        if self.sheets_client is None:
+            auth_token = getattr(self.gd_client, 'alt_auth_token', None)
+            if auth_token is None:
+                return None
+            self.sheets_client = gdata.spreadsheets.client.SpreadsheetsClient(
+                source=self.source, auth_token=auth_token,
+                http_client=PooledHttpClient())
+        return self.sheets_client
+
+    def _can_upload_delta(self):
+        """
+        Check if only changed cells should be sent. Whole spreadsheet is
+        uploaded if Spreadsheets API client can't be used.
+        """
+        return bool(self.delta_upload) \
+            and self._get_sheets_client() is not None
+
+    @classmethod
+    def _read_rows(cls, target):
+        """
+        Read all rows of csv file or memory buffer.
+        """
+        reader = UnicodeReader(cls._read_target(target))
+        rows = list(reader)
+        reader.close()
+        return rows
+
+    @classmethod
+    def _cell_input(cls, value):
+        """
+        Get input value of cell which is always stored as text, never as
+        number or formula.
+        """
+        return "'" + value if value else ''
+
+    def _resize_worksheet(self, client, worksheet, rows_count, cols_count):
+        """
+        Make worksheet big enough to keep given number of rows and columns.
+        """
+        rows = int(worksheet.row_count.text)
+        cols = int(worksheet.col_count.text)
+        if rows >= rows_count and cols >= cols_count:
+            return
+        worksheet.row_count.text = str(max(rows, rows_count))
+        worksheet.col_count.text = str(max(cols, cols_count))
+        with self._timed('UpdateWorksheet'):
+            client.update(worksheet, force=True)
+
+    def _upload_delta(self, old_sheets, new_sheets):
+        """
+        Send only cells which differ between current and new content of
+        worksheets, in batches of CELLS_BATCH_SIZE cells.
+        :param old_sheets: list with rows of every worksheet stored in GDocs
+        :param new_sheets: list with new rows of every worksheet
+        :return: number of changed cells
+        """
+        client = self._get_sheets_client()
+        with self._timed('GetWorksheets'):
+            worksheets = client.get_worksheets(self.key).entry
+
+        changed = 0
+        for worksheet, old_rows, new_rows in zip(worksheets, old_sheets,
+                                                 new_sheets):
+            changes, (rows_count, cols_count) = sheet_delta(old_rows,
+                                                            new_rows)
+            if not changes:
+                continue
+            self._resize_worksheet(client, worksheet, rows_count, cols_count)
+
+            worksheet_id = worksheet.get_worksheet_id()
+            for start in xrange(0, len(changes), CELLS_BATCH_SIZE):
+                batch = gdata.spreadsheets.data.build_batch_cells_update(
+                    self.key, worksheet_id)
+                for row, col, value in \
+                        changes[start:start + CELLS_BATCH_SIZE]:
+                    batch.add_set_cell(row, col, self._cell_input(value))
+                with self._timed('Batch'):
+                    result = client.batch(batch, force=True)
+                profiler.count('cells_uploaded', len(batch.entry))
+                # revision of spreadsheet changed
+                self.resource = None
+                for entry in result.entry:
+                    status = entry.batch_status
+                    if status is not None and status.code != '200':
+                        raise PODocsError('Cell %s not updated: %s'
+                                          % (entry.get_id(), status.reason))
+            changed += len(changes)
+        return changed
+
+    def _merge_local_and_gdoc(self, local_trans_csv, local_meta_csv,
+                              gdocs_trans_csv, gdocs_meta_csv):
         """
         Download csv from GDoc.
         :return: returns resource if worksheets are present
@@ -173,30 +499,63 @@ class Communicator(object):
             new_translations = po_to_csv_merge(
                 self.languages, self.locale_root, self.po_files_path,
                 local_trans_csv, local_meta_csv,
-                gdocs_trans_csv, gdocs_meta_csv)
-            if new_translations:
-                local_ods = os.path.join(self.temp_path, LOCAL_ODS)
-                csv_to_ods(local_trans_csv, local_meta_csv, local_ods)
-                media = gdata.data.MediaSource(
-                    file_path=local_ods, content_type=
-                    'application/x-vnd.oasis.opendocument.spreadsheet'
-                )
-                self.gd_client.UpdateResource(entry, media=media,
-                                              update_metadata=True)
-        except (IOError, OSError, RequestError) as e:
+                self._read_target(gdocs_trans_csv),
+                self._read_target(gdocs_meta_csv),
+                streaming=self.streaming_merge)
+            if new_translations and self._can_upload_delta():
+                self._upload_delta(
+                    [self._read_rows(gdocs_trans_csv),
+                     self._read_rows(gdocs_meta_csv)],
+                    [self._read_rows(local_trans_csv),
+                     self._read_rows(local_meta_csv)])
+            elif new_translations:
+                local_ods = self._temp_target(LOCAL_ODS)
+                csv_to_ods(self._read_target(local_trans_csv),
+                           self._read_target(local_meta_csv), local_ods)
+                self._update_resource(
+                    self._media_source(local_ods, ODS_CONTENT_TYPE))
+        except RequestError as e:
+            raise self._request_error(e)
+        except (IOError, OSError) as e:
             raise PODocsError(e)
 
+    def _sync_fingerprint(self, revision):
+        """
+        Get fingerprint of given revision of spreadsheet and current state
+        of po files. Returns None if revision of spreadsheet is unknown.
+        """
+        if revision is None:
+            return None
+        return [revision, local_fingerprint(self.languages, self.locale_root,
+                                            self.po_files_path)]
+
+    @profiler.profiled('synchronize')
     def synchronize(self):
         """
         Synchronize local po files with translations on GDocs Spreadsheet.
         Downloads two csv files, merges them and converts into po files
         structure. If new msgids appeared in po files, this method creates
         new ods with appended content and sends it to GDocs.
+        In in-memory mode no files are written into temp_path.
+        If SYNC_STATE_PATH is set and neither po files nor spreadsheet
+        changed since last synchronization, nothing is done.
         """
-        gdocs_trans_csv = os.path.join(self.temp_path, GDOCS_TRANS_CSV)
-        gdocs_meta_csv = os.path.join(self.temp_path, GDOCS_META_CSV)
-        local_trans_csv = os.path.join(self.temp_path, LOCAL_TRANS_CSV)
-        local_meta_csv = os.path.join(self.temp_path, LOCAL_META_CSV)
+        self._start_operation()
+        if settings.SYNC_STATE_PATH:
+            try:
+                revision = remote_revision(self._get_resource())
+            except RequestError as e:
+                raise self._request_error(e)
+            fingerprint = self._sync_fingerprint(revision)
+            if fingerprint is not None and sync_state.is_synchronized(
+                    self.key, self.locale_root, fingerprint):
+                profiler.count('synchronize_skipped')
+                return
+
+        gdocs_trans_csv = self._temp_target(GDOCS_TRANS_CSV)
+        gdocs_meta_csv = self._temp_target(GDOCS_META_CSV)
+        local_trans_csv = self._temp_target(LOCAL_TRANS_CSV)
+        local_meta_csv = self._temp_target(LOCAL_META_CSV)
 
         try:
             entry = self._download_csv_from_gdocs(gdocs_trans_csv,
@@ -204,47 +563,112 @@ class Communicator(object):
         except PODocsError as e:
             if 'Sheet 1 not found' in str(e) \
                     or 'Conversion failed unexpectedly' in str(e):
-                self.upload()
+                self._upload()
             else:
                 raise PODocsError(e)
         else:
-            self._merge_local_and_gdoc(entry, local_trans_csv, local_meta_csv,
+            # revision which translations were merged with
+            revision = remote_revision(entry)
+            self._merge_local_and_gdoc(local_trans_csv, local_meta_csv,
                                        gdocs_trans_csv, gdocs_meta_csv)
 
             try:
-                csv_to_po(local_trans_csv, local_meta_csv,
-                          self.locale_root, self.po_files_path, self.header)
+                csv_to_po(self._read_target(local_trans_csv),
+                          self._read_target(local_meta_csv),
+                          self.locale_root, self.po_files_path, self.header,
+                          incremental=self.incremental_write,
+                          compile_mo=self.compile_mo)
             except IOError as e:
                 raise PODocsError(e)
 
         self._clear_temp()
 
+        if settings.SYNC_STATE_PATH:
+            # Entry returned by upload of whole spreadsheet has its new
+            # revision. Revision after upload of changed cells is unknown,
+            # so the downloaded one is kept and next synchronization isn't
+            # skipped. Spreadsheet isn't fetched again, as it could have
+            # been edited after download.
+            if self.resource is not None:
+                revision = remote_revision(self.resource)
+            fingerprint = self._sync_fingerprint(revision)
+            if fingerprint is not None:
+                sync_state.save(self.key, self.locale_root, fingerprint)
+
+    @profiler.profiled('download')
     def download(self):
         """
         Download csv files from GDocs and convert them into po files structure.
         """
-        trans_csv_path = os.path.realpath(
-            os.path.join(self.temp_path, GDOCS_TRANS_CSV))
-        meta_csv_path = os.path.realpath(
-            os.path.join(self.temp_path, GDOCS_META_CSV))
+        trans_csv_path = self._temp_target(GDOCS_TRANS_CSV)
+        meta_csv_path = self._temp_target(GDOCS_META_CSV)
 
+        self._start_operation()
         self._download_csv_from_gdocs(trans_csv_path, meta_csv_path)
 
         try:
-            csv_to_po(trans_csv_path, meta_csv_path,
-                      self.locale_root, self.po_files_path, header=self.header)
+            csv_to_po(self._read_target(trans_csv_path),
+                      self._read_target(meta_csv_path),
+                      self.locale_root, self.po_files_path, header=self.header,
+                      incremental=self.incremental_write,
+                      compile_mo=self.compile_mo)
         except IOError as e:
             raise PODocsError(e)
 
         self._clear_temp()
 
+    @profiler.profiled('upload')
     def upload(self):
         """
         Upload all po files to GDocs ignoring conflicts.
         This method looks for all msgids in po_files and sends them
-        as ods to GDocs Spreadsheet.
+        as ods to GDocs Spreadsheet. In delta mode current spreadsheet
+        is downloaded and only cells which differ are sent.
+        """
+        self._start_operation()
+        if self._can_upload_delta():
+            self._upload_changed_cells()
+        else:
+            self._upload()
+
+    def _upload_changed_cells(self):
+        """
+        Compare po files with spreadsheet and send changed cells only.
+        Whole ods is uploaded if spreadsheet has no worksheets yet.
         """
-        local_ods_path = os.path.join(self.temp_path, LOCAL_ODS)
+        gdocs_trans_csv = self._temp_target(GDOCS_TRANS_CSV)
+        gdocs_meta_csv = self._temp_target(GDOCS_META_CSV)
+        try:
+            self._download_csv_from_gdocs(gdocs_trans_csv, gdocs_meta_csv)
+        except PODocsError as e:
+            if 'Sheet 1 not found' in str(e) \
+                    or 'Conversion failed unexpectedly' in str(e):
+                self._upload()
+                return
+            raise
+
+        try:
+            trans_rows = []
+            meta_rows = []
+            for trans_row, meta_row in po_to_rows(
+                    self.languages, self.locale_root, self.po_files_path):
+                trans_rows.append(trans_row)
+                meta_rows.append(meta_row)
+            self._upload_delta([self._read_rows(gdocs_trans_csv),
+                                self._read_rows(gdocs_meta_csv)],
+                               [trans_rows, meta_rows])
+        except RequestError as e:
+            raise self._request_error(e)
+        except (IOError, OSError) as e:
+            raise PODocsError(e)
+
+        self._clear_temp()
+
+    def _upload(self):
+        """
+        Convert po files into ods and send it to GDocs Spreadsheet.
+        """
+        local_ods_path = self._temp_target(LOCAL_ODS)
         try:
             po_to_ods(self.languages, self.locale_root,
                       self.po_files_path, local_ods_path)
@@ -255,21 +679,27 @@ class Communicator(object):
 
         self._clear_temp()
 
+    @profiler.profiled('clear')
     def clear(self):
         """
         Clear GDoc Spreadsheet by sending empty csv file.
         """
-        empty_file_path = os.path.join(self.temp_path, 'empty.csv')
+        self._start_operation()
+        empty_file_path = self._temp_target('empty.csv')
         try:
-            empty_file = open(empty_file_path, 'w')
-            empty_file.write(',')
-            empty_file.close()
+            if isinstance(empty_file_path, basestring):
+                empty_file = open(empty_file_path, 'w')
+                empty_file.write(',')
+                empty_file.close()
+            else:
+                empty_file_path.write(',')
         except IOError as e:
             raise PODocsError(e)
 
         self._upload_file_to_gdoc(empty_file_path, content_type='text/csv')
 
-        os.remove(empty_file_path)
+        if isinstance(empty_file_path, basestring):
+            os.remove(empty_file_path)
 
 
 def git_push(git_message=None, git_repository=None, git_branch=None,
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import tempfile
+import threading
+
+
+# Worksheets are downloaded and stored by many threads
+_lock = threading.Lock()
+
+
+class ExportCache(object):
+    """
+    Cache of csv exports of spreadsheet worksheets kept in directory
+    between runs, together with validators (ETag and Last-Modified headers)
+    of responses which returned them. Validators are sent in conditional
+    requests, so unchanged worksheets aren't downloaded again.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+
+    def _get_paths(self, spreadsheet_key, gid):
+        name = '%s_%d' % (spreadsheet_key, gid)
+        return (os.path.join(self.cache_path, name + '.csv'),
+                os.path.join(self.cache_path, name + '.json'))
+
+    def get(self, spreadsheet_key, gid):
+        """
+        Return tuple with cached csv content and dict of its validators,
+        or None if worksheet isn't cached.
+        """
+        csv_path, validators_path = self._get_paths(spreadsheet_key, gid)
+        try:
+            # validators and content are stored together
+            with _lock:
+                with open(validators_path, 'rb') as validators_file:
+                    validators = json.load(validators_file)
+                with open(csv_path, 'rb') as csv_file:
+                    content = csv_file.read()
+        except (IOError, ValueError):
+            return None
+        if len(content) != validators.get('length'):
+            return None
+        return content, validators
+
+    def _write(self, path, content):
+        # name of temp file is unique for every process and thread
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(content)
+            if os.name == 'nt' and os.path.exists(path):
+                os.remove(path)
+            os.rename(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def store(self, spreadsheet_key, gid, content, etag=None,
+              last_modified=None):
+        """
+        Save csv content of worksheet with validators of the response.
+        Content without validators can't be revalidated, so it's dropped.
+        """
+        csv_path, validators_path = self._get_paths(spreadsheet_key, gid)
+        try:
+            with _lock:
+                # old validators must never describe new content
+                if os.path.exists(validators_path):
+                    os.remove(validators_path)
+                if not etag and not last_modified:
+                    return
+                if not os.path.exists(self.cache_path):
+                    os.makedirs(self.cache_path)
+                self._write(csv_path, content)
+                self._write(validators_path, json.dumps({
+                    'etag': etag, 'last_modified': last_modified,
+                    'length': len(content)}))
+        except (IOError, OSError):
+            # cache is only an optimization
+            pass
+
+    @classmethod
+    def conditional_headers(cls, validators):
+        """
+        Get headers of conditional request for content with validators.
+        """
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
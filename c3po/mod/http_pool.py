@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import cStringIO
+import httplib
+import os
+import socket
+import threading
+import zlib
+
+import atom.http_core
+
+from c3po.conf import settings
+from c3po.profiler import profiler
+
+
+class _PooledResponse(httplib.HTTPResponse):
+    """
+    Response which puts its connection back to pool once it is read to
+    the end and closed. Read bytes are counted as received from network.
+    """
+    on_close = None
+
+    def read(self, amt=None):
+        data = httplib.HTTPResponse.read(self, amt)
+        profiler.count('wire_bytes_received', len(data))
+        return data
+
+    def close(self):
+        httplib.HTTPResponse.close(self)
+        if self.on_close is not None:
+            on_close, self.on_close = self.on_close, None
+            on_close()
+
+
+class ConnectionPool(object):
+    """
+    Idle keep-alive connections kept by host, shared by all gdata clients
+    of the process. Connection is put back when its response was read and
+    server didn't ask to close it. At most HTTP_POOL_SIZE idle connections
+    are kept for every host.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.opened = 0
+        self.reused = 0
+
+    @classmethod
+    def _key(cls, uri):
+        return uri.scheme, uri.host, uri.port
+
+    def acquire(self, uri):
+        """
+        Return idle connection to host of uri, or None if there is none.
+        """
+        with self.lock:
+            idle = self.idle.get(self._key(uri))
+            if not idle:
+                return None
+            self.reused += 1
+        profiler.count('connections_reused')
+        return idle.pop()
+
+    def opened_connection(self):
+        """
+        Count new connection, which means TCP (and TLS) handshake.
+        """
+        with self.lock:
+            self.opened += 1
+        profiler.count('connections_opened')
+
+    def release(self, uri, connection, response):
+        """
+        Keep connection for next requests to the same host, if it can be
+        reused after response, otherwise close it.
+        """
+        if connection.sock is not None and not response.will_close:
+            with self.lock:
+                idle = self.idle.setdefault(self._key(uri), [])
+                if len(idle) < settings.HTTP_POOL_SIZE:
+                    idle.append(connection)
+                    return
+        connection.close()
+
+    def clear(self):
+        """
+        Close all idle connections and reset counters.
+        """
+        with self.lock:
+            idle, self.idle = self.idle, {}
+            self.opened = 0
+            self.reused = 0
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+connection_pool = ConnectionPool()
+
+
+class _GzipResponse(object):
+    """
+    Wrapper of response with gzip content encoding, which returns
+    decompressed content. Other attributes are taken from response.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.content = None
+
+    def read(self, amt=None):
+        if self.content is None:
+            self.content = cStringIO.StringIO(zlib.decompress(
+                self.response.read(), 16 + zlib.MAX_WBITS))
+        if amt is None:
+            return self.content.read()
+        return self.content.read(amt)
+
+    def getheader(self, name, default=None):
+        # headers describe compressed content
+        if name.lower() in ('content-encoding', 'content-length'):
+            return default
+        return self.response.getheader(name, default)
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class PooledHttpClient(atom.http_core.ProxiedHttpClient):
+    """
+    gdata http client sending requests over keep-alive connections from
+    shared connection_pool, so clients of all communicators don't open
+    new connection for every request. Requests through proxy and all
+    requests when HTTP_POOL_SIZE is 0 aren't pooled. With GZIP_TRANSFER
+    setting, gzip compressed responses are requested and decompressed.
+    Sizes of sent and received bodies are counted by profiler.
+    """
+
+    def __init__(self):
+        # client is shared by threads of communicators
+        self.local = threading.local()
+
+    @classmethod
+    def _is_pooled(cls, uri):
+        return settings.HTTP_POOL_SIZE > 0 \
+            and not os.environ.get('%s_proxy' % uri.scheme)
+
+    @classmethod
+    def _can_resend(cls, body_parts):
+        """
+        Check if request body can be sent again, file objects were already
+        read.
+        """
+        return not [part for part in body_parts or []
+                    if hasattr(part, 'read')]
+
+    def _get_connection(self, uri, headers=None):
+        connection = None
+        if self._is_pooled(uri):
+            connection = connection_pool.acquire(uri)
+        reused = connection is not None
+        if connection is None:
+            connection = atom.http_core.ProxiedHttpClient._get_connection(
+                self, uri, headers=headers)
+            connection.response_class = _PooledResponse
+            connection_pool.opened_connection()
+        # connection is handed over to _send running in this thread
+        checked_out = getattr(self.local, 'checked_out', None)
+        if checked_out is not None:
+            checked_out.append((connection, reused))
+        return connection
+
+    @classmethod
+    def _accept_gzip(cls, headers):
+        """
+        Add headers asking for gzip compressed response. Google servers
+        compress responses only for user agents containing 'gzip'.
+        """
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        user_agent = headers.get('User-Agent', '')
+        if 'gzip' not in user_agent:
+            headers['User-Agent'] = (user_agent + ' (gzip)').lstrip()
+        return headers
+
+    def _http_request(self, method, uri, headers=None, body_parts=None):
+        if isinstance(uri, basestring):
+            uri = atom.http_core.Uri.parse_uri(uri)
+        if settings.GZIP_TRANSFER:
+            headers = self._accept_gzip(headers)
+        profiler.count('wire_bytes_sent',
+                       int((headers or {}).get('Content-Length', 0)))
+        response = self._send(method, uri, headers, body_parts)
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            return _GzipResponse(response)
+        return response
+
+    def _send(self, method, uri, headers, body_parts):
+        """
+        Send request over pooled connection and return its response.
+        """
+        while True:
+            checked_out = self.local.checked_out = []
+            try:
+                response = atom.http_core.ProxiedHttpClient._http_request(
+                    self, method, uri, headers, body_parts)
+                break
+            except (httplib.HTTPException, socket.error):
+                # server could close idle connection taken from pool
+                for connection, reused in checked_out:
+                    connection.close()
+                if not checked_out or not checked_out[-1][1] \
+                        or not self._can_resend(body_parts):
+                    raise
+            finally:
+                self.local.checked_out = None
+
+        connection = checked_out[-1][0]
+        if not self._is_pooled(uri):
+            return response
+        if response.isclosed():
+            connection_pool.release(uri, connection, response)
+        else:
+            response.on_close = lambda: connection_pool.release(
+                uri, connection, response)
+        return response
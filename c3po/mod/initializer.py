@@ -9,7 +9,7 @@ import sys
 from c3po.conf import settings
 
 
-ALLOWED_COMMANDS = ('synchronize', 'download', 'upload', 'clear', 'checkout', 'push')
+ALLOWED_COMMANDS = ('synchronize', 'download', 'upload', 'clear', 'checkout', 'push', 'batch')
 
 
 def usage():
@@ -20,7 +20,8 @@ def usage():
           'upload\t\tuploads local po files to GDocs overwriting it\n'
           'clear\t\tclears GDoc file\n'
           'push\t\tpush project into git repository\n'
-          'checkout\tcheckout git project\n\n'
+          'checkout\tcheckout git project\n'
+          'batch\t\truns jobs of manifest file for many spreadsheets\n\n'
           'Options are:\n'
           '-e <email>, --email=<email>\tGoogle Docs email address\n'
           '-p <pass>, --password=<pass>\tGoogle Docs password\n'
@@ -28,6 +29,10 @@ def usage():
           '-l <dir>, --locale=<dir>\tLocale directory path\n'
           '-P <dir>, --po-path=<dir>\tPath from concrete lang dir to .po file\n'
           '-m <msg>, --message=<msg>\tSpecify git message\n'
+          '-j <n>, --jobs=<n>\t\tNumber of processes parsing po files\n'
+          '--profile=<file>\t\tWrite JSON timing report, - for stdout\n'
+          '--manifest=<file>\t\tJSON list of batch jobs\n'
+          '--workers=<n>\t\t\tNumber of batch jobs run at once\n'
           '-h, --help\t\t\tShow this help message\n')
 
 
@@ -60,6 +65,22 @@ def _get_params_from_options(opts):
             params['SETTINGS'] = param
         elif option in ('-m', '--message'):
             params['GIT_MESSAGE'] = param
+        elif option in ('-j', '--jobs'):
+            try:
+                params['JOBS'] = int(param)
+            except ValueError:
+                usage()
+                sys.exit()
+        elif option == '--profile':
+            params['PROFILE'] = param
+        elif option == '--manifest':
+            params['BATCH_MANIFEST'] = param
+        elif option == '--workers':
+            try:
+                params['BATCH_WORKERS'] = int(param)
+            except ValueError:
+                usage()
+                sys.exit()
         else:
             usage()
             sys.exit()
@@ -95,9 +116,10 @@ def initialize():
     command = _get_command(sys.argv[1])
 
     try:
-        opts, args = getopt.getopt(sys.argv[2:], 'h:e:p:u:l:P:s:m:',
+        opts, args = getopt.getopt(sys.argv[2:], 'h:e:p:u:l:P:s:m:j:',
                                    ['help', 'email=', 'password=', 'url=', 'locale=',
-                                    'po-path=', 'settings=', 'message='])
+                                    'po-path=', 'settings=', 'message=', 'jobs=',
+                                    'profile=', 'manifest=', 'workers='])
     except getopt.GetoptError:
         usage()
         sys.exit()
@@ -105,6 +127,10 @@ def initialize():
     params = _get_params_from_options(opts)
     _set_settings_file(settings, params)
 
+    if command == 'batch' and not settings.BATCH_MANIFEST:
+        usage()
+        sys.exit()
+
     if command == 'push':
         if 'GIT_MESSAGE' in params:
             return 'push', params['GIT_MESSAGE']
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+import gdata.docs.client
+import gdata.gauth
+
+from c3po.conf import settings
+from c3po.mod.http_pool import PooledHttpClient
+
+
+def _new_secret():
+    return binascii.hexlify(os.urandom(32))
+
+
+class SessionCache(object):
+    """
+    Keeps authenticated GDocs clients, so Communicator objects created with
+    the same credentials share one login. ClientLogin tokens of Docs and
+    Spreadsheets services are also saved in SESSION_TOKEN_PATH file to be
+    reused by other processes, until they are older than SESSION_EXPIRY
+    seconds. Tokens are keyed by HMAC of password with random secret of
+    the file, so password can't be looked up by its hash. Clients send
+    requests over keep-alive connections from c3po.mod.http_pool.
+    """
+
+    def __init__(self):
+        self.clients = {}
+        # secret of keys of clients kept in memory
+        self.secret = _new_secret()
+        # guards clients, key_locks and token file
+        self.lock = threading.Lock()
+        self.key_locks = {}
+
+    @classmethod
+    def _key(cls, secret, email, password, source):
+        """
+        Get key of client or token. Password is included as its HMAC with
+        secret, so token is never reused with different password.
+        """
+        if isinstance(password, unicode):
+            password = password.encode('utf-8')
+        digest = hmac.new(str(secret), password, hashlib.sha256).hexdigest()
+        return '%s|%s|%s' % (email, digest, source)
+
+    def _key_lock(self, key):
+        """
+        Get lock of one account, so different accounts log in at once.
+        """
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _read_tokens(self):
+        """
+        Return tuple with secret of token file and dict of its tokens.
+        Secret is None if there is no valid token file.
+        """
+        token_path = settings.SESSION_TOKEN_PATH
+        if not token_path or not os.path.exists(token_path):
+            return None, {}
+        try:
+            with open(token_path, 'rb') as token_file:
+                content = json.load(token_file)
+        except (IOError, ValueError):
+            return None, {}
+        if not isinstance(content, dict) or not content.get('secret'):
+            return None, {}
+        return content['secret'], content.get('tokens', {})
+
+    def _write_tokens(self, secret, tokens):
+        token_path = settings.SESSION_TOKEN_PATH
+        if not token_path:
+            return
+        try:
+            token_dir = os.path.dirname(token_path)
+            if token_dir and not os.path.exists(token_dir):
+                os.makedirs(token_dir)
+            temp_path = '%s.%d.%d.tmp' % (token_path, os.getpid(),
+                                          threading.current_thread().ident)
+            try:
+                fd = os.open(temp_path,
+                             os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+                with os.fdopen(fd, 'wb') as token_file:
+                    json.dump({'secret': secret, 'tokens': tokens},
+                              token_file)
+                if os.name == 'nt' and os.path.exists(token_path):
+                    os.remove(token_path)
+                os.rename(temp_path, token_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        except (IOError, OSError):
+            # session cache is only an optimization
+            pass
+
+    def _is_valid(self, created):
+        return time.time() - created < settings.SESSION_EXPIRY
+
+    def _restore_token(self, client, email, password, source):
+        """
+        Set tokens saved in token file on client. Returns time when they
+        were created, or None if there are no valid tokens.
+        """
+        with self.lock:
+            secret, tokens = self._read_tokens()
+        if secret is None:
+            return None
+        token = tokens.get(self._key(secret, email, password, source))
+        if token is None or not self._is_valid(token['created']):
+            return None
+        # client without token of spreadsheets service can't export sheets
+        if client.alt_auth_service is not None and not token.get('alt_token'):
+            return None
+        client.auth_token = gdata.gauth.ClientLoginToken(token['token'])
+        if token.get('alt_token'):
+            client.alt_auth_token = gdata.gauth.ClientLoginToken(
+                token['alt_token'])
+        return token['created']
+
+    def _save_token(self, client, email, password, source, created):
+        """
+        Save tokens of client into token file.
+        """
+        alt_token = client.alt_auth_token
+        with self.lock:
+            secret, tokens = self._read_tokens()
+            if secret is None:
+                secret = _new_secret()
+            tokens[self._key(secret, email, password, source)] = {
+                'token': client.auth_token.token_string,
+                'alt_token': alt_token.token_string if alt_token else None,
+                'created': created}
+            self._write_tokens(secret, tokens)
+
+    def get_client(self, email, password, source):
+        """
+        Return DocsClient authenticated as given user. Logs in only if there
+        is no valid token in memory or in token file.
+        :except: raises gdata.client.RequestError if login fails
+        """
+        key = self._key(self.secret, email, password, source)
+        with self._key_lock(key):
+            with self.lock:
+                if key in self.clients:
+                    client, created = self.clients[key]
+                    if self._is_valid(created):
+                        return client
+
+            client = gdata.docs.client.DocsClient(
+                source=source, http_client=PooledHttpClient())
+            created = self._restore_token(client, email, password, source)
+            if created is None:
+                client.ClientLogin(email, password, source)
+                created = time.time()
+                self._save_token(client, email, password, source, created)
+
+            with self.lock:
+                self.clients[key] = (client, created)
+            return client
+
+    def invalidate(self, email, password, source):
+        """
+        Forget client and token of given user, e.g. when token was rejected.
+        """
+        with self.lock:
+            self.clients.pop(self._key(self.secret, email, password, source),
+                             None)
+            secret, tokens = self._read_tokens()
+            if secret is not None and tokens.pop(
+                    self._key(secret, email, password, source),
+                    None) is not None:
+                self._write_tokens(secret, tokens)
+
+
+session_cache = SessionCache()
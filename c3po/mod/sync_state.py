@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import threading
+
+from c3po.conf import settings
+
+
+# State file is read and changed by synchronizations run in many threads
+_lock = threading.Lock()
+
+
+def local_fingerprint(languages, locale_root, po_files_path):
+    """
+    Return hash of names and content of all po files of given languages.
+    Assumes a directory structure:
+    <locale_root>/<lang>/<po_files_path>/<filename>.
+    """
+    fingerprint = hashlib.sha1()
+    for lang in languages:
+        lang_path = os.path.join(locale_root, lang, po_files_path)
+        if not os.path.isdir(lang_path):
+            continue
+        for po_filename in sorted(os.listdir(lang_path)):
+            if not po_filename.endswith('.po'):
+                continue
+            content_hash = hashlib.sha1()
+            with open(os.path.join(lang_path, po_filename), 'rb') as po_file:
+                for chunk in iter(lambda: po_file.read(64 * 1024), ''):
+                    content_hash.update(chunk)
+            fingerprint.update('%s/%s:%s\n' % (lang, po_filename,
+                                               content_hash.hexdigest()))
+    return fingerprint.hexdigest()
+
+
+def remote_revision(resource):
+    """
+    Return etag of spreadsheet resource entry, or its update time if
+    entry has no etag. None means revision is unknown.
+    """
+    etag = getattr(resource, 'etag', None)
+    if etag:
+        return etag
+    updated = getattr(resource, 'updated', None)
+    return updated.text if updated is not None else None
+
+
+class SyncState(object):
+    """
+    Fingerprints of last synchronized state of spreadsheets and locale
+    trees, stored in SYNC_STATE_PATH file. Every fingerprint consists of
+    remote revision of spreadsheet and hash of local po files.
+    """
+
+    @classmethod
+    def _key(cls, spreadsheet_key, locale_root):
+        return '%s|%s' % (spreadsheet_key, os.path.abspath(locale_root))
+
+    def _read_states(self):
+        state_path = settings.SYNC_STATE_PATH
+        if not state_path or not os.path.exists(state_path):
+            return {}
+        try:
+            with open(state_path, 'rb') as state_file:
+                return json.load(state_file)
+        except (IOError, ValueError):
+            return {}
+
+    def _write_states(self, states):
+        state_path = settings.SYNC_STATE_PATH
+        try:
+            state_dir = os.path.dirname(state_path)
+            if state_dir and not os.path.exists(state_dir):
+                os.makedirs(state_dir)
+            temp_path = '%s.%d.%d.tmp' % (state_path, os.getpid(),
+                                          threading.current_thread().ident)
+            try:
+                with open(temp_path, 'wb') as state_file:
+                    json.dump(states, state_file)
+                if os.name == 'nt' and os.path.exists(state_path):
+                    os.remove(state_path)
+                os.rename(temp_path, state_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        except (IOError, OSError):
+            # state is only used to skip synchronization
+            pass
+
+    def is_synchronized(self, spreadsheet_key, locale_root, fingerprint):
+        """
+        Check if fingerprint is the same as after last synchronization.
+        """
+        with _lock:
+            states = self._read_states()
+        return states.get(self._key(spreadsheet_key, locale_root)) \
+            == fingerprint
+
+    def save(self, spreadsheet_key, locale_root, fingerprint):
+        """
+        Remember fingerprint of synchronized state.
+        """
+        if not settings.SYNC_STATE_PATH:
+            return
+        with _lock:
+            states = self._read_states()
+            states[self._key(spreadsheet_key, locale_root)] = fingerprint
+            self._write_states(states)
+
+
+sync_state = SyncState()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+def _cpu_time():
+    """
+    Get user and system CPU time of the process and of its child processes
+    which exited, e.g. workers of converters pools.
+    """
+    user, system, children_user, children_system = os.times()[:4]
+    return user + system + children_user + children_system
+
+
+class Profiler(object):
+    """
+    Collects wall and CPU time of named stages and named counters (bytes
+    transferred, rows processed, files parsed or written) of communicator
+    operations and converters. Stages called many times or in several
+    threads are summed up. CPU time is measured for the whole process,
+    together with worker processes which finished during the stage.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all recorded stages and counters.
+        """
+        with self.lock:
+            self.started = time.time()
+            self.stages = {}
+            self.stages_order = []
+            self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure code run in with block as stage with given name.
+        """
+        wall_start = time.time()
+        cpu_start = _cpu_time()
+        try:
+            yield
+        finally:
+            wall = time.time() - wall_start
+            cpu = _cpu_time() - cpu_start
+            with self.lock:
+                if name not in self.stages:
+                    self.stages[name] = {'calls': 0, 'wall': 0.0, 'cpu': 0.0}
+                    self.stages_order.append(name)
+                stage = self.stages[name]
+                stage['calls'] += 1
+                stage['wall'] += wall
+                stage['cpu'] += cpu
+
+    def profiled(self, name):
+        """
+        Decorator measuring every call of function as stage.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, value=1):
+        """
+        Add value to counter with given name.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        """
+        Return recorded stages, in order of their first use, and counters
+        as dict which can be serialized to JSON.
+        """
+        with self.lock:
+            return {
+                'wall': time.time() - self.started,
+                'stages': [dict(self.stages[name], name=name)
+                           for name in self.stages_order],
+                'counters': dict(self.counters),
+            }
+
+    def write_report(self, path, **extra):
+        """
+        Write report as JSON into file, or to standard output if path
+        is '-'. Extra keyword arguments are added to the report.
+        """
+        report = self.report()
+        report.update(extra)
+        if path == '-':
+            json.dump(report, sys.stdout, indent=2, sort_keys=True)
+            sys.stdout.write('\n')
+        else:
+            with open(path, 'wb') as report_file:
+                json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+profiler = Profiler()
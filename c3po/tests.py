@@ -1,15 +1,50 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import cStringIO
 import csv
+import gettext
+import hashlib
+import json
 import os
+import resource
 import shutil
+import socket
+import threading
+import time
 import unittest
+import zipfile
+from multiprocessing.pool import ThreadPool
+from xml.etree import cElementTree
 
+import atom.data
+import gdata.client
 import gdata.data
-from c3po.converters.po_ods import csv_to_ods
+import gdata.docs.client
+import gdata.gauth
+import gdata.spreadsheets.data
+import polib
+from c3po.conf import settings
+from c3po.converters import po_csv
+from c3po.converters.catalog import ENTRY_FIELDS, Entry, PersistentCatalogCache, catalog_cache, get_catalog
+from c3po.converters.delta import sheet_delta
+from c3po.converters.metadata import METADATA_EMPTY, dump_metadata, load_metadata
+from c3po.converters.mo import mo_path
+from c3po.converters.po_csv import csv_to_po, po_to_csv_merge
+from c3po.converters.ods import NAMESPACES, ODSWriter, read_ods
+from c3po.converters.parallel import parallel_map
+from c3po.converters.po_ods import csv_to_ods, po_to_ods
+from c3po.converters.po_reader import iter_po_entries
+from c3po.converters.unicode import UnicodeReader, UnicodeWriter
+from c3po.profiler import profiler
 
-from mod.communicator import Communicator
+from mod.async_communicator import AsyncCommunicator
+from mod.backend import LocalHttpServer, LocalSpreadsheetBackend
+from mod.batch import load_manifest, run_batch
+from mod.communicator import Communicator, PODocsError
+from mod.http_pool import PooledHttpClient, connection_pool
+from mod.session import SessionCache, session_cache
+from mod.sync_state import sync_state
 
 
 TESTS_URL = 'https://docs.google.com/spreadsheet/ccc?key=0AnVOHClWGpLZdGFpQmpVUUx2eUg4Z0NVMGVQX3NrNkE#gid=0'
@@ -106,6 +141,1000 @@ msgstr ""
 ''']
 
 
+CSV_TRANS_MERGE = [
+    ['file', 'comment', 'msgid', 'en:msgstr', 'pl:msgstr', 'jp:msgstr'],
+    ['django.po', '', 'Translation1', 'Str1 gdocs', 'Str1 gdocs', 'Str1 gdocs'],
+    ['django.po', '', 'Translation3', 'Str3', 'Str3', 'Str3'],
+    ['custom.po', '', 'Custom1', 'Str1 gdocs', 'Str1 gdocs', 'Str1 gdocs'],
+    ['custom.po', '', 'Translation2', 'Str2', 'Str2', 'Str2'],
+]
+
+CSV_META_MERGE = [
+    ['metadata'],
+    ["{'occurrences': [(u'tpl/base_site.html', u'44')]}"],
+    ["{'occurrences': [(u'tpl/base_site.html', u'44')]}"],
+    ["{'occurrences': [(u'tpl/base_site.html', u'44')]}"],
+    ["{'occurrences': [(u'tpl/base_site.html', u'44')]}"],
+]
+
+
+def merge_sheets():
+    """
+    Get copy of worksheets CSV_TRANS_MERGE and CSV_META_MERGE, which can
+    be changed by tests.
+    """
+    return [[list(row) for row in CSV_TRANS_MERGE], [list(row) for row in CSV_META_MERGE]]
+
+
+class TestConverters(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = 'temp-converters'
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+        self.languages = ['en', 'pl', 'jp']
+        self.po_filenames = ['django.po', 'custom.po']
+        self.locale_root = os.path.join(self.temp_dir, 'locale')
+        self.po_files_path = 'LC_MESSAGES'
+        for lang in self.languages:
+            lang_path = os.path.join(self.locale_root, lang, self.po_files_path)
+            os.makedirs(lang_path)
+            for po_filename, po_content in zip(self.po_filenames, PO_CONTENT_LOCAL):
+                with open(os.path.join(lang_path, po_filename), 'wb') as po_file:
+                    po_file.write(po_content % lang)
+
+        self.gdocs_trans_csv = os.path.join(self.temp_dir, 'gdocs_trans.csv')
+        self.gdocs_meta_csv = os.path.join(self.temp_dir, 'gdocs_meta.csv')
+        self.local_trans_csv = os.path.join(self.temp_dir, 'local_trans.csv')
+        self.local_meta_csv = os.path.join(self.temp_dir, 'local_meta.csv')
+        with open(self.gdocs_trans_csv, 'wb') as csv_file:
+            csv.writer(csv_file).writerows(CSV_TRANS_MERGE)
+        with open(self.gdocs_meta_csv, 'wb') as csv_file:
+            csv.writer(csv_file).writerows(CSV_META_MERGE)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        catalog_cache.clear()
+
+    def _read_csv(self, csv_path):
+        reader = UnicodeReader(csv_path)
+        rows = list(reader)
+        reader.close()
+        return rows
+
+    def test_unicode_csv(self):
+        rows = [[u'django.po', u'', u'za\u017c\xf3\u0142\u0107 "g\u0119\u015bl\u0105"'],
+                [u'a,b', u'\u0142\n\u0142', u'']]
+        for encoding in ('utf-8', 'cp1250'):
+            csv_buffer = cStringIO.StringIO()
+            writer = UnicodeWriter(csv_buffer, encoding=encoding)
+            writer.writerow(rows[0])
+            writer.writerows(rows[1:])
+            writer.close()
+            self.assertIn(u'\u0142'.encode(encoding), csv_buffer.getvalue())
+
+            reader = UnicodeReader(cStringIO.StringIO(csv_buffer.getvalue()), encoding=encoding)
+            self.assertEqual(list(reader), rows)
+            reader.close()
+
+    def test_po_to_csv_merge_keys_by_file(self):
+        new_trans = po_to_csv_merge(self.languages, self.locale_root, self.po_files_path,
+                                    self.local_trans_csv, self.local_meta_csv,
+                                    self.gdocs_trans_csv, self.gdocs_meta_csv)
+        self.assertTrue(new_trans)
+
+        trans_rows = self._read_csv(self.local_trans_csv)
+        meta_rows = self._read_csv(self.local_meta_csv)
+        self.assertEqual(len(trans_rows), len(meta_rows))
+        self.assertEqual(trans_rows[:len(CSV_TRANS_MERGE)], CSV_TRANS_MERGE)
+
+        new_keys = [(row[0], row[2]) for row in trans_rows[len(CSV_TRANS_MERGE):]]
+        self.assertEqual(sorted(new_keys), [('custom.po', 'Custom2'), ('django.po', 'Translation2')])
+        for meta_row in meta_rows[len(CSV_META_MERGE):]:
+            self.assertEqual(load_metadata(meta_row[0]), {'occurrences': [('tpl/base_site.html', '44')]})
+
+    def test_po_to_csv_merge_streaming(self):
+        new_trans = po_to_csv_merge(self.languages, self.locale_root, self.po_files_path,
+                                    self.local_trans_csv, self.local_meta_csv,
+                                    self.gdocs_trans_csv, self.gdocs_meta_csv)
+        trans_rows = self._read_csv(self.local_trans_csv)
+        meta_rows = self._read_csv(self.local_meta_csv)
+
+        catalog_cache.clear()
+        self.assertEqual(po_to_csv_merge(self.languages, self.locale_root, self.po_files_path,
+                                         self.local_trans_csv, self.local_meta_csv,
+                                         self.gdocs_trans_csv, self.gdocs_meta_csv, streaming=True),
+                         new_trans)
+        self.assertEqual(self._read_csv(self.local_trans_csv), trans_rows)
+        self.assertEqual(self._read_csv(self.local_meta_csv), meta_rows)
+        self.assertEqual(catalog_cache.catalogs, {})
+
+    def test_po_to_csv_merge_streaming_collisions(self):
+        po_to_csv_merge(self.languages, self.locale_root, self.po_files_path,
+                        self.local_trans_csv, self.local_meta_csv, self.gdocs_trans_csv, self.gdocs_meta_csv)
+        trans_rows = self._read_csv(self.local_trans_csv)
+
+        # every key has the same hash
+        key_digest = po_csv._key_digest
+        po_csv._key_digest = lambda key: 0
+        try:
+            po_to_csv_merge(self.languages, self.locale_root, self.po_files_path,
+                            self.local_trans_csv, self.local_meta_csv,
+                            self.gdocs_trans_csv, self.gdocs_meta_csv, streaming=True)
+        finally:
+            po_csv._key_digest = key_digest
+        self.assertEqual(self._read_csv(self.local_trans_csv), trans_rows)
+
+    def test_iter_po_entries(self):
+        po_path = os.path.join(self.temp_dir, 'entries.po')
+        with open(po_path, 'wb') as po_file:
+            po_file.write('# header\n#, fuzzy\nmsgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n'
+                          '#. generated\n# translator\n#: a.py:1 b.py\n#, python-format\n#| msgid "old"\n'
+                          'msgctxt "ctx"\nmsgid "multi"\n"line \\"q\\"\\n"\nmsgstr ""\n"za\xc5\xbc\xc3\xb3\xc5\x82\xc4\x87"\n'
+                          'msgid "one"\nmsgid_plural "many"\nmsgstr[0] "a"\nmsgstr[1] "b"\n\n'
+                          '#~ msgid "obsolete"\n#~ msgstr "o"\n\nmsgid "untranslated"\n')
+        fields = lambda entry: [getattr(entry, field) for field in ENTRY_FIELDS]
+        entries = map(fields, iter_po_entries(po_path))
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(entries, map(fields, polib.pofile(po_path)))
+
+    def test_metadata_format(self):
+        entry = polib.POEntry(msgid=u'msgid', msgstr=u'msgstr', tcomment=u'tcomment',
+                              msgctxt=u'context', comment=u'zażółć', flags=[u'fuzzy'],
+                              occurrences=[(u'tpl/base_site.html', u'44')],
+                              msgid_plural=u'msgids', msgstr_plural={u'0': u'a', u'1': u'b'})
+        metadata = dump_metadata(entry)
+        self.assertTrue(metadata.startswith('v2:'))
+        self.assertNotIn('previous_msgid', metadata)
+
+        meta = load_metadata(metadata)
+        self.assertEqual(unicode(polib.POEntry(msgid=u'msgid', msgstr=u'msgstr',
+                                               tcomment=u'tcomment', **meta)),
+                         unicode(entry))
+
+        old_meta = dict(entry.__dict__)
+        for field in ('msgid', 'msgstr', 'tcomment'):
+            old_meta.pop(field)
+        self.assertEqual(load_metadata(str(old_meta)), old_meta)
+        self.assertEqual(dump_metadata(polib.POEntry()), METADATA_EMPTY)
+        self.assertEqual(load_metadata(METADATA_EMPTY), {})
+
+    def test_metadata_plural(self):
+        msgstr_plural = dict((i, u'%d plików' % i) for i in range(12))
+        entry = polib.POEntry(msgid=u'file', msgid_plural=u'files', msgstr_plural=msgstr_plural)
+        meta = load_metadata(dump_metadata(entry))
+        self.assertEqual(meta['msgstr_plural'], msgstr_plural)
+        self.assertEqual(unicode(polib.POEntry(msgid=u'file', **meta)), unicode(entry))
+        self.assertIn(u'msgstr[2] "2 plików"\nmsgstr[3]', unicode(polib.POEntry(msgid=u'file', **meta)))
+
+    def test_csv_to_po_incremental(self):
+        written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                            self.po_files_path, '# test\n', incremental=True)
+        self.assertEqual(len(written), len(self.languages) * len(self.po_filenames))
+
+        stale_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'stale.po')
+        open(stale_path, 'w').close()
+        written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                            self.po_files_path, '# test\n', incremental=True)
+        self.assertEqual(written, [])
+        self.assertFalse(os.path.exists(stale_path))
+
+        trans_rows = [list(row) for row in CSV_TRANS_MERGE]
+        trans_rows[1][4] = 'Str1 changed'
+        with open(self.gdocs_trans_csv, 'wb') as csv_file:
+            csv.writer(csv_file).writerows(trans_rows)
+        written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                            self.po_files_path, '# test\n', incremental=True)
+        self.assertEqual(written, [os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')])
+        with open(written[0], 'rb') as po_file:
+            self.assertIn('msgstr "Str1 changed"', po_file.read())
+
+    def test_csv_to_po_unicode_header(self):
+        for header in ('# Tłumaczenie: zażółć\n# test\n', u'# Tłumaczenie: zażółć\n# test\n'):
+            written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                                self.po_files_path, header)
+            self.assertEqual(len(written), len(self.languages) * len(self.po_filenames))
+            po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+            with open(po_path, 'rb') as po_file:
+                self.assertTrue(po_file.read().startswith('# Tłumaczenie: zażółć\n# test\nmsgid ""\n'))
+            po_file = polib.pofile(po_path)
+            self.assertEqual(po_file.header, u'Tłumaczenie: zażółć\ntest')
+            self.assertEqual(po_file.metadata['Language'], u'pl')
+            self.assertEqual(po_file.metadata['Content-Type'], u'text/plain; charset=UTF-8')
+
+    def test_csv_to_po_compile_mo(self):
+        written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                            self.po_files_path, '# test\n', incremental=True, compile_mo=True)
+        for po_path in written:
+            with open(mo_path(po_path), 'rb') as mo_file:
+                translations = gettext.GNUTranslations(mo_file)
+            entries = polib.pofile(po_path).translated_entries()
+            self.assertEqual(dict((key, value) for key, value in translations._catalog.items() if key),
+                             dict((entry.msgid, entry.msgstr) for entry in entries))
+
+        po_file_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+        mo_file_path = mo_path(po_file_path)
+        os.remove(mo_path(os.path.join(self.locale_root, 'en', self.po_files_path, 'django.po')))
+        mo_mtime = int(os.path.getmtime(po_file_path)) + 100
+        os.utime(mo_file_path, (mo_mtime, mo_mtime))
+        written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                            self.po_files_path, '# test\n', incremental=True, compile_mo=True)
+        self.assertEqual(written, [])
+        self.assertEqual(os.path.getmtime(mo_file_path), mo_mtime)
+        self.assertTrue(os.path.exists(mo_path(os.path.join(self.locale_root, 'en', self.po_files_path,
+                                                            'django.po'))))
+
+        # po files are rewritten, but mo files of unchanged ones are kept
+        written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                            self.po_files_path, '# test\n', compile_mo=True)
+        self.assertIn(po_file_path, written)
+        self.assertEqual(os.path.getmtime(mo_file_path), mo_mtime)
+
+        # mo file older than po file is compiled again
+        os.utime(mo_file_path, (0, 0))
+        csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                  self.po_files_path, '# test\n', incremental=True, compile_mo=True)
+        self.assertNotEqual(os.path.getmtime(mo_file_path), 0)
+
+        trans_rows = [list(row) for row in CSV_TRANS_MERGE]
+        trans_rows[1][4] = 'Str1 changed'
+        with open(self.gdocs_trans_csv, 'wb') as csv_file:
+            csv.writer(csv_file).writerows(trans_rows)
+        csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, self.locale_root,
+                  self.po_files_path, '# test\n', compile_mo=True)
+        with open(mo_file_path, 'rb') as mo_file:
+            self.assertEqual(gettext.GNUTranslations(mo_file).ugettext(trans_rows[1][2]), u'Str1 changed')
+
+    def test_csv_to_po_parallel(self):
+        contents = []
+        for jobs in (1, 3):
+            locale_root = os.path.join(self.temp_dir, 'locale-%d' % jobs)
+            settings.JOBS = jobs
+            try:
+                written = csv_to_po(self.gdocs_trans_csv, self.gdocs_meta_csv, locale_root,
+                                    self.po_files_path, '# test\n')
+            finally:
+                settings.JOBS = 1
+            self.assertEqual(len(written), len(self.languages) * len(self.po_filenames))
+            files = {}
+            for po_path in written:
+                with open(po_path, 'rb') as po_file:
+                    files[os.path.relpath(po_path, locale_root)] = po_file.read()
+            contents.append(files)
+        self.assertEqual(contents[0], contents[1])
+
+    def test_csv_to_po_many_files(self):
+        trans_csv = os.path.join(self.temp_dir, 'many_trans.csv')
+        meta_csv = os.path.join(self.temp_dir, 'many_meta.csv')
+        with open(trans_csv, 'wb') as csv_file:
+            csv.writer(csv_file).writerows([CSV_TRANS_MERGE[0]] + [
+                ['file%d.po' % (i % 200), '', 'Msgid%d' % i, 'en', 'pl', 'jp'] for i in range(1000)])
+        with open(meta_csv, 'wb') as csv_file:
+            csv.writer(csv_file).writerows([CSV_META_MERGE[0]])
+
+        # partitions of 600 po files don't stay open
+        limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (256, limits[1]))
+        try:
+            written = csv_to_po(trans_csv, meta_csv, self.locale_root, self.po_files_path, '# test\n')
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+        self.assertEqual(len(written), 200 * len(self.languages))
+        po_file = polib.pofile(os.path.join(self.locale_root, 'pl', self.po_files_path, 'file7.po'))
+        self.assertEqual([(entry.msgid, entry.msgstr) for entry in po_file],
+                         [('Msgid%d' % i, 'pl') for i in range(7, 1000, 200)])
+
+    def test_ods_export(self):
+        ods_path = os.path.join(self.temp_dir, 'local.ods')
+        csv_to_ods(self.gdocs_trans_csv, self.gdocs_meta_csv, ods_path)
+        self.assertEqual(read_ods(ods_path), [('Translations', CSV_TRANS_MERGE),
+                                              ('Meta options', CSV_META_MERGE)])
+
+        po_to_ods(self.languages, self.locale_root, self.po_files_path, ods_path)
+        (trans_name, trans_rows), (meta_name, meta_rows) = read_ods(ods_path)
+        self.assertEqual(trans_rows[0], ['file', 'comment', 'msgid', 'en:msgstr', 'pl:msgstr', 'jp:msgstr'])
+        self.assertEqual(sorted(row[:4] for row in trans_rows[1:]),
+                         [['custom.po', '', 'Custom1', 'Str1 local'],
+                          ['custom.po', '', 'Custom2'],
+                          ['django.po', '', 'Translation1', 'Str1 local'],
+                          ['django.po', '', 'Translation2']])
+        self.assertEqual(len(meta_rows), len(trans_rows))
+
+    def test_ods_styles(self):
+        ods_path = os.path.join(self.temp_dir, 'local.ods')
+        po_to_ods(self.languages, self.locale_root, self.po_files_path, ods_path)
+        ods = zipfile.ZipFile(ods_path)
+        content = cElementTree.fromstring(ods.read('content.xml'))
+        ods.close()
+
+        def attr(element, namespace, name):
+            return element.get('{%s}%s' % (NAMESPACES[namespace], name))
+
+        styles = dict((attr(style, 'style', 'name'), style)
+                      for style in content.iter('{%s}style' % NAMESPACES['style']))
+        for name, color in [('odd', settings.ODD_COLUMN_BG_COLOR), ('even', settings.EVEN_COLUMN_BG_COLOR),
+                            ('title', settings.TITLE_ROW_BG_COLOR)]:
+            properties = styles[name].find('{%s}table-cell-properties' % NAMESPACES['style'])
+            self.assertEqual(attr(properties, 'fo', 'background-color'), color)
+
+        table = content.find('.//{%s}table' % NAMESPACES['table'])
+        columns = table.findall('{%s}table-column' % NAMESPACES['table'])
+        self.assertEqual([attr(column, 'table', 'default-cell-style-name') for column in columns],
+                         ['odd', 'even', 'odd', 'even', 'odd', 'even'])
+
+        rows = table.findall('{%s}table-row' % NAMESPACES['table'])
+        self.assertEqual(set(attr(cell, 'table', 'style-name') for cell in rows[0]), set(['title']))
+        # regular cells use style of their column and runs of empty cells are collapsed
+        cells = [cell for row in rows[1:] for cell in row]
+        self.assertEqual([cell for cell in cells if attr(cell, 'table', 'style-name')], [])
+        for row in rows[1:]:
+            values = [bool(cell.findall('{%s}p' % NAMESPACES['text'])) for cell in row]
+            self.assertNotIn([False, False], [values[i:i + 2] for i in range(len(values) - 1)])
+
+        writer = ODSWriter(ods_path)
+        writer.add_sheet('Sheet', [('1in', 'odd')] * 5)
+        writer.writerow(0, ['a', '', '', 'b', ''])
+        writer.close()
+        ods = zipfile.ZipFile(ods_path)
+        row = cElementTree.fromstring(ods.read('content.xml')).find('.//{%s}table-row' % NAMESPACES['table'])
+        ods.close()
+        self.assertEqual([attr(cell, 'table', 'number-columns-repeated') for cell in row], [None, '2', None])
+        self.assertEqual(read_ods(ods_path), [('Sheet', [['a', '', '', 'b']])])
+
+    def test_parallel_parsing(self):
+        outputs = []
+        for jobs in (1, 3):
+            settings.JOBS = jobs
+            try:
+                catalog_cache.clear()
+                ods_path = os.path.join(self.temp_dir, 'local-%d.ods' % jobs)
+                po_to_ods(self.languages, self.locale_root, self.po_files_path, ods_path)
+                catalog_cache.clear()
+                po_to_csv_merge(self.languages, self.locale_root, self.po_files_path,
+                                self.local_trans_csv, self.local_meta_csv,
+                                self.gdocs_trans_csv, self.gdocs_meta_csv)
+            finally:
+                settings.JOBS = 1
+            with open(self.local_trans_csv, 'rb') as trans_csv, open(self.local_meta_csv, 'rb') as meta_csv:
+                outputs.append((read_ods(ods_path), trans_csv.read(), meta_csv.read()))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(len(catalog_cache.catalogs), len(self.languages) * len(self.po_filenames))
+
+    def test_sheet_delta(self):
+        changes, size = sheet_delta([['a', 'b'], ['c'], ['d', 'e']], [['a', 'x', 'y'], ['c', '']])
+        self.assertEqual(changes, [(1, 2, 'x'), (1, 3, 'y'), (3, 1, u''), (3, 2, u'')])
+        self.assertEqual(size, (2, 3))
+
+    def test_catalog_cache(self):
+        po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+        po_file = get_catalog(po_path)
+        self.assertIs(get_catalog(po_path), po_file)
+
+        with open(po_path, 'ab') as po_file_handle:
+            po_file_handle.write('msgid "Translation4"\nmsgstr ""\n')
+        self.assertIsNot(get_catalog(po_path), po_file)
+        self.assertEqual(len(get_catalog(po_path)), len(po_file) + 1)
+
+    def test_compact_catalog(self):
+        po_path = os.path.join(self.temp_dir, 'entries.po')
+        with open(po_path, 'wb') as po_file:
+            po_file.write('# header\nmsgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n\n'
+                          '#: a.py:1\n#, fuzzy\nmsgctxt "ctx"\nmsgid "one"\nmsgid_plural "many"\n'
+                          'msgstr[0] "a"\nmsgstr[1] "b"\n\nmsgid "plain"\nmsgstr "p"\n')
+        catalog = get_catalog(po_path)
+        po_file = polib.pofile(po_path)
+        self.assertIsInstance(catalog[0], Entry)
+        self.assertFalse(hasattr(catalog[0], '__dict__'))
+        self.assertEqual(map(dump_metadata, catalog), map(dump_metadata, po_file))
+        self.assertEqual(dump_metadata(catalog[1]), METADATA_EMPTY)
+        self.assertEqual(catalog.metadata, po_file.metadata)
+        self.assertEqual(unicode(catalog), unicode(po_file))
+
+    def test_persistent_catalog_cache(self):
+        cache_path = os.path.join(self.temp_dir, 'catalogs')
+        po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+        settings.CATALOG_CACHE_PATH = cache_path
+        try:
+            parsed = unicode(get_catalog(po_path))
+            self.assertEqual(len(os.listdir(cache_path)), 1)
+
+            catalog_cache.clear()
+            self.assertEqual(unicode(get_catalog(po_path)), parsed)
+            self.assertEqual(len(os.listdir(cache_path)), 1)
+
+            with open(po_path, 'ab') as po_file_handle:
+                po_file_handle.write('msgid "Translation4"\nmsgstr ""\n')
+            self.assertNotEqual(unicode(get_catalog(po_path)), parsed)
+            self.assertEqual(len(os.listdir(cache_path)), 2)
+        finally:
+            settings.CATALOG_CACHE_PATH = None
+
+    def test_persistent_catalog_cache_size(self):
+        cache_path = os.path.join(self.temp_dir, 'catalogs')
+        po_paths = [os.path.join(self.locale_root, lang, self.po_files_path, po_filename)
+                    for lang, po_filename in [('pl', 'django.po'), ('pl', 'custom.po'), ('en', 'django.po')]]
+        settings.CATALOG_CACHE_PATH = cache_path
+        settings.CATALOG_CACHE_SIZE = 2
+        try:
+            get_catalog(po_paths[0])
+            time.sleep(0.01)
+            get_catalog(po_paths[1])
+            time.sleep(0.01)
+            catalog_cache.clear()
+            # used catalog is kept
+            get_catalog(po_paths[0])
+            time.sleep(0.01)
+            get_catalog(po_paths[2])
+            cached = os.listdir(cache_path)
+            self.assertEqual(len(cached), 2)
+            self.assertNotIn(os.path.basename(PersistentCatalogCache(cache_path)._get_cached_path(po_paths[1])), cached)
+
+            # temp file isn't left when catalog can't be stored
+            os.makedirs(PersistentCatalogCache(cache_path)._get_cached_path(po_paths[1]))
+            catalog_cache.clear()
+            get_catalog(po_paths[1])
+            self.assertFalse([name for name in os.listdir(cache_path) if not name.endswith('.cat')])
+        finally:
+            settings.CATALOG_CACHE_PATH = None
+            settings.CATALOG_CACHE_SIZE = 1000
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = 'temp-session'
+        os.makedirs(self.temp_dir)
+        self.settings = settings.SESSION_TOKEN_PATH, settings.SESSION_EXPIRY
+        settings.SESSION_TOKEN_PATH = os.path.join(self.temp_dir, 'token')
+        self.logins = []
+
+        def client_login(client, email, password, source, *args, **kwargs):
+            self.logins.append(email)
+            client.auth_token = gdata.gauth.ClientLoginToken('token-%d' % len(self.logins))
+            client.alt_auth_token = gdata.gauth.ClientLoginToken('alt-token-%d' % len(self.logins))
+            return client.auth_token
+
+        self.client_login = gdata.docs.client.DocsClient.ClientLogin
+        gdata.docs.client.DocsClient.ClientLogin = client_login
+
+    def tearDown(self):
+        gdata.docs.client.DocsClient.ClientLogin = self.client_login
+        settings.SESSION_TOKEN_PATH, settings.SESSION_EXPIRY = self.settings
+        session_cache.clients = {}
+        shutil.rmtree(self.temp_dir)
+
+    def test_session_reused(self):
+        com1 = Communicator(email='user@example.com', temp_path=self.temp_dir)
+        com2 = Communicator(email='user@example.com', temp_path=self.temp_dir)
+        self.assertIs(com1.gd_client, com2.gd_client)
+        self.assertEqual(self.logins, ['user@example.com'])
+
+        # new process reads tokens of both services from file
+        client = SessionCache().get_client('user@example.com', settings.PASSWORD, settings.SOURCE)
+        self.assertEqual(client.auth_token.token_string, 'token-1')
+        self.assertEqual(client.alt_auth_token.token_string, 'alt-token-1')
+        self.assertEqual(len(self.logins), 1)
+
+        # token isn't reused with different password
+        client = SessionCache().get_client('user@example.com', 'other', settings.SOURCE)
+        self.assertEqual(client.auth_token.token_string, 'token-2')
+        with open(settings.SESSION_TOKEN_PATH, 'rb') as token_file:
+            content = token_file.read()
+        for password in ('other', settings.PASSWORD):
+            self.assertNotIn(password, content)
+            self.assertNotIn(hashlib.sha256(password).hexdigest(), content)
+        self.assertEqual(os.listdir(self.temp_dir), ['token'])
+
+        settings.SESSION_EXPIRY = 0
+        client = SessionCache().get_client('user@example.com', settings.PASSWORD, settings.SOURCE)
+        self.assertEqual(client.auth_token.token_string, 'token-3')
+
+    def test_session_invalidate(self):
+        session_cache.get_client('user@example.com', 'pass', settings.SOURCE)
+        session_cache.invalidate('user@example.com', 'pass', settings.SOURCE)
+        client = SessionCache().get_client('user@example.com', 'pass', settings.SOURCE)
+        self.assertEqual(client.auth_token.token_string, 'token-2')
+
+    def test_session_token_not_written(self):
+        # token file can't replace directory
+        os.makedirs(settings.SESSION_TOKEN_PATH)
+        client = SessionCache().get_client('user@example.com', 'pass', settings.SOURCE)
+        self.assertEqual(client.auth_token.token_string, 'token-1')
+        self.assertEqual(os.listdir(self.temp_dir), ['token'])
+
+    def test_session_login_per_account(self):
+        login_started = threading.Event()
+        other_logged_in = threading.Event()
+        client_login = gdata.docs.client.DocsClient.ClientLogin
+
+        def slow_client_login(client, email, password, source, *args, **kwargs):
+            if email == 'slow@example.com':
+                login_started.set()
+                # other account logs in meanwhile
+                other_logged_in.wait(5)
+            return client_login(client, email, password, source)
+
+        gdata.docs.client.DocsClient.ClientLogin = slow_client_login
+        cache = SessionCache()
+        thread = threading.Thread(target=cache.get_client, args=('slow@example.com', 'pass', settings.SOURCE))
+        thread.start()
+        login_started.wait(5)
+        cache.get_client('user@example.com', 'pass', settings.SOURCE)
+        other_logged_in.set()
+        thread.join()
+        self.assertEqual(self.logins, ['user@example.com', 'slow@example.com'])
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        connection_pool.clear()
+        self.server = LocalHttpServer('content')
+
+    def tearDown(self):
+        self.server.stop()
+        connection_pool.clear()
+
+    def _get(self, client):
+        return client.request('GET', self.server.url).read()
+
+    def test_connections_reused(self):
+        clients = [gdata.client.GDClient(http_client=PooledHttpClient()) for i in range(2)]
+        for i in range(3):
+            for client in clients:
+                self.assertEqual(self._get(client), 'content')
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual((connection_pool.opened, connection_pool.reused), (1, 5))
+
+        # unread response keeps its connection
+        response = clients[0].request('GET', self.server.url)
+        self.assertEqual(self._get(clients[1]), 'content')
+        self.assertEqual(response.read(), 'content')
+        self.assertEqual(self.server.connections, 2)
+
+        settings.HTTP_POOL_SIZE = 0
+        try:
+            self._get(clients[0])
+            self._get(clients[0])
+        finally:
+            settings.HTTP_POOL_SIZE = 4
+        self.assertEqual(self.server.connections, 4)
+
+    def test_connections_closed_by_server(self):
+        client = gdata.client.GDClient(http_client=PooledHttpClient())
+        self.server.close_connections = True
+        self._get(client)
+        self._get(client)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(connection_pool.reused, 0)
+
+        self.server.close_connections = False
+        self.server.idle_timeout = 0.1
+        self._get(client)
+        time.sleep(0.3)
+        self.assertEqual(self._get(client), 'content')
+        self.assertEqual(self.server.connections, 4)
+
+    def test_connection_refused(self):
+        client = gdata.client.GDClient(http_client=PooledHttpClient())
+        self._get(client)
+        closed_socket = socket.socket()
+        closed_socket.bind(('127.0.0.1', 0))
+        os.environ['https_proxy'] = 'http://127.0.0.1:%d' % closed_socket.getsockname()[1]
+        closed_socket.close()
+        try:
+            # connection of previous request, kept in pool, isn't closed when proxy refuses connection
+            self.assertRaises(socket.error, client.request, 'GET', 'https://example.com/')
+        finally:
+            del os.environ['https_proxy']
+        self.assertEqual(self._get(client), 'content')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_gzip_transfer(self):
+        self.server.content = 'file,comment,msgid,en:msgstr\n' + 'django.po,,Translation,Str\n' * 1000
+        self.server.gzip = True
+        client = gdata.client.GDClient(http_client=PooledHttpClient())
+        sizes = []
+        for gzip in (False, True):
+            settings.GZIP_TRANSFER = gzip
+            profiler.reset()
+            try:
+                response = client.request('GET', self.server.url)
+                self.assertEqual(response.getheader('Content-Encoding'), None)
+                self.assertEqual(response.read(), self.server.content)
+            finally:
+                settings.GZIP_TRANSFER = True
+            sizes.append(profiler.report()['counters']['wire_bytes_received'])
+        self.assertEqual(sizes[0], len(self.server.content))
+        self.assertLess(sizes[1] * 10, sizes[0])
+        self.assertEqual(self.server.connections, 1)
+
+
+class TestCommunicatorRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = 'temp-requests'
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+        self.languages = ['en', 'pl', 'jp']
+        self.locale_root = os.path.join(self.temp_dir, 'locale')
+        self.po_files_path = 'LC_MESSAGES'
+        for lang in self.languages:
+            lang_path = os.path.join(self.locale_root, lang, self.po_files_path)
+            os.makedirs(lang_path)
+            for po_filename, po_content in zip(['django.po', 'custom.po'], PO_CONTENT_LOCAL):
+                with open(os.path.join(lang_path, po_filename), 'wb') as po_file:
+                    po_file.write(po_content % lang)
+
+        self.client = LocalSpreadsheetBackend(merge_sheets())
+        self.com = Communicator(url=TESTS_URL, temp_path=self.temp_dir, languages=self.languages,
+                                locale_root=self.locale_root, po_files_path=self.po_files_path,
+                                header='# test\n', backend=self.client)
+
+    def tearDown(self):
+        catalog_cache.clear()
+        shutil.rmtree(self.temp_dir)
+
+    def test_synchronize_requests(self):
+        self.client.latency = 0.2
+        self.com.synchronize()
+        self.assertEqual(self.client.requests,
+                         ['GetResourceById', 'DownloadResource', 'DownloadResource', 'UpdateResource'])
+
+        downloads = [(start, end) for name, start, end in self.com.network_timings
+                     if name.startswith('DownloadResource')]
+        self.assertEqual(len(downloads), 2)
+        self.assertLess(self.com.network_wall_time(),
+                        sum(end - start for name, start, end in self.com.network_timings))
+
+        self.assertEqual(sorted(row[2] for row in self.client.sheets[0][1:]),
+                         ['Custom1', 'Custom2', 'Translation1', 'Translation2', 'Translation2', 'Translation3'])
+
+    def test_synchronize_delta(self):
+        self.com.synchronize()
+        sheets = self.client.sheets
+
+        self.client.sheets = merge_sheets()
+        self.client.requests = []
+        self.com.delta_upload = True
+        self.com.synchronize()
+        self.assertNotIn('UpdateResource', self.client.requests)
+        self.assertEqual(self.client.requests.count('Batch'), 2)
+        # file and msgid of two new rows and their metadata
+        self.assertEqual(self.client.cells_updated, 2 * 2 + 2)
+        self.assertEqual([[[value for value in row if value] for row in rows] for rows in self.client.sheets],
+                         [[[value for value in row if value] for row in rows] for rows in sheets])
+
+    def test_upload_delta(self):
+        self.com.delta_upload = True
+        self.com.upload()
+        self.assertIn('Batch', self.client.requests)
+        self.assertEqual(len(self.client.sheets[0]), 5)
+        self.assertEqual(len(self.client.sheets[1]), 5)
+
+        self.client.requests = []
+        self.com.upload()
+        self.assertEqual(self.client.requests, ['GetResourceById', 'DownloadResource', 'DownloadResource',
+                                                'GetWorksheets'])
+
+    def test_sheets_client_token(self):
+        docs_client = gdata.docs.client.DocsClient()
+        docs_client.auth_token = gdata.gauth.ClientLoginToken('writely')
+        self.com.gd_client = docs_client
+        self.com.sheets_client = None
+        self.assertIsNone(self.com._get_sheets_client())
+
+        docs_client.alt_auth_token = gdata.gauth.ClientLoginToken('wise')
+        self.assertEqual(self.com._get_sheets_client().auth_token.token_string, 'wise')
+
+    def test_upload_delta_without_sheets_client(self):
+        # backend without spreadsheets token can only replace whole spreadsheet
+        self.com.sheets_client = None
+        self.com.delta_upload = True
+        self.com.upload()
+        self.assertEqual(self.client.requests, ['GetResourceById', 'UpdateResource'])
+
+    def test_synchronize_unchanged(self):
+        settings.SYNC_STATE_PATH = os.path.join(self.temp_dir, 'sync_state')
+        try:
+            self.com.synchronize()
+            self.client.requests = []
+            self.com.synchronize()
+            self.assertEqual(self.client.requests, ['GetResourceById'])
+
+            po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+            with open(po_path, 'ab') as po_file:
+                po_file.write('\nmsgid "Translation5"\nmsgstr ""\n')
+            self.client.requests = []
+            self.com.synchronize()
+            self.assertIn('DownloadResource', self.client.requests)
+            self.client.requests = []
+            self.com.synchronize()
+            self.assertEqual(self.client.requests, ['GetResourceById'])
+
+            row = [row[2] for row in self.client.sheets[0]].index('Translation1')
+            self.client.sheets[0][row][4] = u'Zmienione'
+            self.client.revision += 1
+            self.com.synchronize()
+            self.assertIn(u'Zmienione', [entry.msgstr for entry in polib.pofile(po_path)])
+            self.client.requests = []
+            self.com.synchronize()
+            self.assertEqual(self.client.requests, ['GetResourceById'])
+        finally:
+            settings.SYNC_STATE_PATH = None
+
+    def test_synchronize_edited_after_download(self):
+        settings.SYNC_STATE_PATH = os.path.join(self.temp_dir, 'sync_state')
+        po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+
+        def edit_sheet(upload):
+            def upload_and_edit(*args, **kwargs):
+                result = upload(*args, **kwargs)
+                row = [row[2] for row in self.client.sheets[0]].index('Translation1')
+                self.client.sheets[0][row][4] = u'Zmienione %d' % self.client.revision
+                self.client.revision += 1
+                return result
+            return upload_and_edit
+
+        try:
+            for delta_upload, method in [(False, 'UpdateResource'), (True, 'batch')]:
+                for lang in self.languages:
+                    with open(os.path.join(self.locale_root, lang, self.po_files_path, 'django.po'), 'ab') as po_file:
+                        po_file.write('\nmsgid "New %s"\nmsgstr ""\n' % method)
+                self.com.delta_upload = delta_upload
+                setattr(self.client, method, edit_sheet(getattr(self.client, method)))
+                self.com.synchronize()
+                delattr(self.client, method)
+
+                edited = u'Zmienione %d' % (self.client.revision - 1)
+                self.assertNotIn(edited, [entry.msgstr for entry in polib.pofile(po_path)])
+                self.client.requests = []
+                self.com.synchronize()
+                self.assertIn('DownloadResource', self.client.requests)
+                self.assertIn(edited, [entry.msgstr for entry in polib.pofile(po_path)])
+        finally:
+            settings.SYNC_STATE_PATH = None
+
+    def test_sync_state_threads(self):
+        settings.SYNC_STATE_PATH = os.path.join(self.temp_dir, 'state', 'sync_state')
+        try:
+            threads = [threading.Thread(target=sync_state.save, args=('key%d' % i, self.locale_root, ['1', str(i)]))
+                       for i in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for i in range(20):
+                self.assertTrue(sync_state.is_synchronized('key%d' % i, self.locale_root, ['1', str(i)]))
+            self.assertEqual(os.listdir(os.path.join(self.temp_dir, 'state')), ['sync_state'])
+        finally:
+            settings.SYNC_STATE_PATH = None
+
+    def test_download_not_modified(self):
+        settings.EXPORT_CACHE_PATH = os.path.join(self.temp_dir, 'exports')
+        try:
+            self.com.download()
+            po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+            with open(po_path, 'rb') as po_file:
+                po_content = po_file.read()
+            self.assertEqual(len(os.listdir(settings.EXPORT_CACHE_PATH)), 4)
+
+            bytes_sent = self.client.bytes_sent
+            self.client.requests = []
+            os.remove(po_path)
+            self.com.download()
+            self.assertEqual(self.client.bytes_sent, bytes_sent)
+            self.assertEqual(self.client.requests.count('DownloadResource'), 2)
+            with open(po_path, 'rb') as po_file:
+                self.assertEqual(po_file.read(), po_content)
+
+            row = [row[2] for row in self.client.sheets[0]].index('Translation1')
+            self.client.sheets[0][row][4] = u'Zmienione'
+            self.client.revision += 1
+            self.com.download()
+            self.assertGreater(self.client.bytes_sent, bytes_sent)
+            self.assertIn(u'Zmienione', [entry.msgstr for entry in polib.pofile(po_path)])
+        finally:
+            settings.EXPORT_CACHE_PATH = None
+
+    def test_export_auth_token(self):
+        self.client.auth_token = gdata.gauth.ClientLoginToken('writely')
+        self.client.alt_auth_token = gdata.gauth.ClientLoginToken('wise')
+        settings.EXPORT_CACHE_PATH = os.path.join(self.temp_dir, 'exports')
+        try:
+            self.com.download()
+        finally:
+            settings.EXPORT_CACHE_PATH = None
+        self.assertEqual([token.token_string for token in self.client.auth_tokens], ['wise', 'wise'])
+
+    def test_batch_synchronize(self):
+        shutil.copytree(self.locale_root, os.path.join(self.temp_dir, 'locale2'))
+        manifest_path = os.path.join(self.temp_dir, 'manifest.json')
+        with open(manifest_path, 'wb') as manifest_file:
+            json.dump([{'url': TESTS_URL, 'locale_root': 'locale', 'po_files_path': self.po_files_path,
+                        'languages': self.languages, 'header': '# test\n'},
+                       {'url': TESTS_URL, 'locale_root': 'locale2', 'po_files_path': self.po_files_path,
+                        'languages': self.languages, 'header': '# test\n'},
+                       {'url': 'http://example.com/', 'command': 'download'}], manifest_file)
+        jobs = load_manifest(manifest_path)
+        self.assertEqual(jobs[1]['locale_root'], os.path.join(os.path.abspath(self.temp_dir), 'locale2'))
+
+        backends = [LocalSpreadsheetBackend(merge_sheets(), latency=0.1) for job in jobs]
+        start = time.time()
+        results = run_batch(jobs, workers=2, backends=backends)
+        self.assertLess(time.time() - start, sum(result['wall'] for result in results))
+        self.assertEqual([result['status'] for result in results], ['ok', 'ok', 'failed'])
+        self.assertEqual([result['command'] for result in results], ['synchronize', 'synchronize', 'download'])
+        self.assertEqual(results[0]['requests'], 4)
+        self.assertIn('PODocsError', results[2]['error'])
+        self.assertNotIn('requests', results[2])
+
+        self.com.synchronize()
+        self.assertEqual(backends[0].sheets, self.client.sheets)
+        self.assertEqual(backends[1].sheets, self.client.sheets)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['locale', 'locale2', 'manifest.json'])
+
+        with open(manifest_path, 'wb') as manifest_file:
+            json.dump([{'url': TESTS_URL, 'command': 'push'}], manifest_file)
+        self.assertRaises(PODocsError, load_manifest, manifest_path)
+
+    def test_async_synchronize(self):
+        locale_roots = [self.locale_root]
+        for i in range(2):
+            locale_roots.append(os.path.join(self.temp_dir, 'locale%d' % i))
+            shutil.copytree(self.locale_root, locale_roots[-1])
+        backends = [LocalSpreadsheetBackend(merge_sheets(), latency=0.1)
+                    for locale_root in locale_roots]
+        coms = [AsyncCommunicator(url=TESTS_URL, temp_path=self.temp_dir, languages=self.languages,
+                                  locale_root=locale_root, po_files_path=self.po_files_path,
+                                  header='# test\n', backend=backend)
+                for locale_root, backend in zip(locale_roots, backends)]
+        # communicators in in-memory mode don't touch temp files
+        trans_csv_path = os.path.join(self.temp_dir, 'c3po_gdocs_trans.csv')
+        with open(trans_csv_path, 'wb') as trans_csv:
+            trans_csv.write('other')
+
+        finished = []
+        start = time.time()
+        results = [com.synchronize(callback=finished.append) for com in coms]
+        self.assertFalse(all(result.ready() for result in results))
+        self.assertEqual([result.get(10) for result in results], [None] * len(coms))
+        self.assertLess(time.time() - start, 0.4 * len(coms))
+        self.assertEqual(finished, [None] * len(coms))
+        with open(trans_csv_path, 'rb') as trans_csv:
+            self.assertEqual(trans_csv.read(), 'other')
+
+        self.com.synchronize()
+        for backend in backends:
+            self.assertEqual(backend.sheets, self.client.sheets)
+
+        # commands of one communicator don't overlap
+        results = [coms[0].clear(), coms[0].upload(), coms[0].download()]
+        for result in results:
+            result.get(10)
+        self.assertEqual(backends[0].requests[-4:],
+                         ['UpdateResource', 'GetResourceById', 'DownloadResource', 'DownloadResource'])
+        self.assertRaises(PODocsError, AsyncCommunicator(url='http://example.com/', backend=backends[0]).upload().get, 10)
+
+    def test_async_queued_commands(self):
+        executor = ThreadPool(2)
+        try:
+            slow_backend = LocalSpreadsheetBackend(merge_sheets(), latency=0.2)
+            fast_backend = LocalSpreadsheetBackend(merge_sheets(), latency=0.05)
+            slow_com, fast_com = [AsyncCommunicator(url=TESTS_URL, languages=self.languages,
+                                                    locale_root=self.locale_root, po_files_path=self.po_files_path,
+                                                    backend=backend, executor=executor)
+                                  for backend in [slow_backend, fast_backend]]
+
+            finished = []
+            results = [slow_com.upload(callback=lambda value: finished.append('slow')) for i in range(3)]
+            results.append(fast_com.clear(callback=lambda value: finished.append('fast')))
+            # queued commands of one communicator don't keep other worker thread waiting
+            results[-1].get(10)
+            self.assertEqual(finished, ['fast'])
+            self.assertFalse(results[0].ready())
+            for result in results:
+                result.get(10)
+            self.assertEqual(finished, ['fast', 'slow', 'slow', 'slow'])
+            self.assertTrue(all(result.successful() for result in results))
+            self.assertEqual(slow_backend.requests.count('UpdateResource'), 3)
+        finally:
+            executor.close()
+            executor.join()
+
+    def test_async_closed_executor(self):
+        executor = ThreadPool(1)
+        com = AsyncCommunicator(url=TESTS_URL, languages=self.languages, locale_root=self.locale_root,
+                                po_files_path=self.po_files_path, executor=executor,
+                                backend=LocalSpreadsheetBackend(merge_sheets(), latency=0.2))
+        # command queued behind running one can't be scheduled when pool is closed meanwhile
+        results = [com.upload(), com.upload()]
+        executor.close()
+        results[0].get(10)
+        self.assertRaises(ValueError, results[1].get, 10)
+        executor.join()
+
+        self.assertRaises(ValueError, com.upload().get, 10)
+        self.assertFalse(com.running)
+        self.assertEqual(len(com.queue), 0)
+
+    def test_clear_and_synchronize(self):
+        self.com.clear()
+        self.assertEqual(self.client.sheets, [[['', '']]])
+
+        self.com.synchronize()
+        self.assertEqual(self.client.requests.count('UpdateResource'), 2)
+        self.assertEqual(len(self.client.sheets), 2)
+        self.assertEqual(len(self.client.sheets[0]), len(self.client.sheets[1]))
+
+        self.com.download()
+        po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'custom.po')
+        self.assertEqual([entry.msgid for entry in polib.pofile(po_path)], ['Custom1', 'Custom2'])
+
+    def test_synchronize_in_memory(self):
+        self.com.synchronize()
+        sheets = self.client.sheets
+        po_path = os.path.join(self.locale_root, 'pl', self.po_files_path, 'django.po')
+        with open(po_path, 'rb') as po_file:
+            po_content = po_file.read()
+
+        self.client.sheets = merge_sheets()
+        self.com.in_memory = True
+        # writing any temp file would fail
+        self.com.temp_path = os.path.join(self.temp_dir, 'missing')
+        self.com.synchronize()
+        self.assertEqual(self.client.sheets, sheets)
+        with open(po_path, 'rb') as po_file:
+            self.assertEqual(po_file.read(), po_content)
+        self.assertEqual(os.listdir(self.temp_dir), ['locale'])
+
+        # files and catalogs of other runs are left untouched
+        other_locale = os.path.join(self.temp_dir, 'other')
+        shutil.copytree(self.locale_root, other_locale)
+        other_po_path = os.path.join(other_locale, 'pl', self.po_files_path, 'django.po')
+        other_catalog = get_catalog(other_po_path)
+        gdocs_csv_path = os.path.join(self.temp_dir, 'c3po_gdocs_trans.csv')
+        open(gdocs_csv_path, 'w').close()
+        self.com.temp_path = self.temp_dir
+        self.com.synchronize()
+        self.assertTrue(os.path.exists(gdocs_csv_path))
+        self.assertIs(get_catalog(other_po_path), other_catalog)
+
+    def test_profile_synchronize(self):
+        profiler.reset()
+        self.com.synchronize()
+        report = profiler.report()
+        stages = dict((stage['name'], stage) for stage in report['stages'])
+        for name in ('synchronize', 'request:GetResourceById', 'request:DownloadResource', 'po_to_csv_merge',
+                     'parse', 'csv_to_ods', 'request:UpdateResource', 'csv_to_po'):
+            self.assertIn(name, stages)
+        self.assertEqual(stages['synchronize']['calls'], 1)
+        self.assertEqual(stages['request:DownloadResource']['calls'], 2)
+        self.assertGreaterEqual(stages['synchronize']['wall'], stages['csv_to_po']['wall'])
+        counters = report['counters']
+        self.assertEqual(counters['requests'], len(self.client.requests))
+        self.assertEqual(counters['bytes_downloaded'], self.client.bytes_sent)
+        self.assertEqual(counters['bytes_uploaded'], self.client.bytes_received)
+        self.assertEqual(counters['po_files_parsed'], 2 * len(self.languages))
+        self.assertEqual(counters['po_files_written'], 2 * len(self.languages))
+        self.assertEqual(counters['ods_rows_written'], counters['csv_rows_written'])
+
+        report_path = os.path.join(self.temp_dir, 'profile.json')
+        profiler.write_report(report_path, command='synchronize')
+        with open(report_path) as report_file:
+            self.assertEqual(json.load(report_file)['command'], 'synchronize')
+
+    def test_profile_worker_processes(self):
+        profiler.reset()
+        with profiler.stage('workers'):
+            start = os.times()
+            parallel_map(sum, [xrange(4 * 10 ** 7)] * 2, jobs=2)
+            end = os.times()
+        # work is done only by worker processes
+        self.assertLess(end[0] - start[0], 0.1)
+        self.assertGreater(profiler.report()['stages'][0]['cpu'], 0.2)
+
+
 class TestCommunicator(unittest.TestCase):
 
     def setUp(self):
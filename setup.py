@@ -17,7 +17,7 @@ can translate expression included there.\n
 This module provides Communicator which deals with uploading, downloading these translations and synchronizing whole
 content by merging it. Package contains basic methods for converting po files into csv, ods formats and back. It also
 provides methods for git push and git checkout po files into repository.''',
-    install_requires=['gdata==2.0.18', 'polib==1.0.3', 'odslib==1.0.1'],
+    install_requires=['gdata==2.0.18', 'polib==1.0.3'],
     entry_points={
         'console_scripts': [
             'c3po = c3po.c3po_cmd:main'